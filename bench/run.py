@@ -0,0 +1,285 @@
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import asyncio
+import argparse
+import resource
+import tempfile
+import subprocess
+import urllib.request
+from typing import Any, Dict, List, Optional
+
+# Banc d'essai de l'orchestrateur, sans GPU ni réseau :
+#   python -m bench.run --items 100 1000 10000 100000 --out bench_report.json
+#
+# - démarre les services de substitution (bench/standins.py) dans un process à part
+# - génère des raw_dir synthétiques (images factices + textes)
+# - fait tourner Orchestrator dessus (sans cache ni reprise)
+# - rapporte items/s, latence par item p50/p95/p99, CPU et RSS de l'orchestrateur
+#
+# À lancer depuis la racine du dépôt (services.yml est lu en chemin relatif).
+
+CONFIG_PATH = "./config/services.yml"
+_PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 56
+
+
+def _fake_service_hosts():
+    """
+    services.yml référence ${X_CONTAINER_NAME} : on les définit avant
+    d'importer le registre, les URLs sont ensuite redirigées vers les stand-ins.
+    """
+    with open(CONFIG_PATH, "r", encoding="utf-8") as f:
+        for var in re.findall(r"\$\{(\w+_CONTAINER_NAME)\}", f.read()):
+            os.environ.setdefault(var, "127.0.0.1")
+
+
+# ---------------------------------------------------------
+# MESURES
+# ---------------------------------------------------------
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * q
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def cpu_seconds() -> float:
+    ru = resource.getrusage(resource.RUSAGE_SELF)
+    return ru.ru_utime + ru.ru_stime
+
+
+def rss_mb() -> float:
+    """RSS courant (Linux : /proc), à défaut le pic du process."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, IndexError):
+        return peak_rss_mb()
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss : kilo-octets sous Linux, octets sous macOS
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+class RssSampler:
+    """Relève le RSS toutes les `interval` secondes pendant un run."""
+
+    def __init__(self, interval: float = 0.2):
+        self.interval = interval
+        self.peak = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _loop(self):
+        while True:
+            self.peak = max(self.peak, rss_mb())
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        self.peak = rss_mb()
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self.peak = max(self.peak, rss_mb())
+
+
+# ---------------------------------------------------------
+# DONNÉES SYNTHÉTIQUES
+# ---------------------------------------------------------
+def make_raw_dir(path: str, n_items: int, image_ratio: float = 0.5):
+    """n_items fichiers : une image factice ou un texte court par item."""
+    os.makedirs(path, exist_ok=True)
+    n_images = round(n_items * image_ratio)
+    for i in range(n_items):
+        if i < n_images:
+            # contenu distinct par item : pas de collision dans un éventuel cache
+            with open(os.path.join(path, f"img_{i:06d}.png"), "wb") as f:
+                f.write(_PNG + i.to_bytes(4, "big"))
+        else:
+            with open(os.path.join(path, f"txt_{i:06d}.txt"), "w", encoding="utf-8") as f:
+                f.write(f"Texte de test {i}. Un homme est assis sur une chaise dans une pièce calme.")
+
+
+# ---------------------------------------------------------
+# STAND-INS
+# ---------------------------------------------------------
+def start_standins(port: int, profile: str, time_scale: float, seed: Optional[int], log_level: str):
+    cmd = [
+        sys.executable, "-m", "bench.standins",
+        "--port", str(port), "--profile", profile, "--time-scale", str(time_scale),
+    ]
+    if seed is not None:
+        cmd += ["--seed", str(seed)]
+    env = {**os.environ, "LOG_LEVEL": log_level}
+    proc = subprocess.Popen(cmd, env=env)
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"stand-ins exited with code {proc.returncode}")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1):
+                return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("stand-ins did not become healthy within 30s")
+
+
+def point_registry_at(base_url: str):
+    from services.registry import service_registry
+
+    for name, service in service_registry.items():
+        service.pool.set_urls([f"{base_url}/{name}/run"])
+
+
+# ---------------------------------------------------------
+# RUN
+# ---------------------------------------------------------
+async def bench_once(n_items: int, workdir: str, args) -> Dict[str, Any]:
+    from orchestrator.orchestrator import Orchestrator
+    from services.all_services_specs import service_specs
+
+    class BenchOrchestrator(Orchestrator):
+        # latence de bout en bout de chaque item (lecture → manifest.jsonl)
+        def __init__(self, *a, **kw):
+            super().__init__(*a, **kw)
+            self.item_latencies: List[float] = []
+
+        async def _process_state(self, state):
+            t0 = time.perf_counter()
+            ok = await super()._process_state(state)
+            self.item_latencies.append(time.perf_counter() - t0)
+            return ok
+
+    raw_dir = os.path.join(workdir, f"raw_{n_items}")
+    processed_dir = os.path.join(workdir, f"processed_{n_items}")
+    make_raw_dir(raw_dir, n_items, args.image_ratio)
+
+    orch = BenchOrchestrator(
+        raw_dir=raw_dir,
+        processed_dir=processed_dir,
+        service_specs=service_specs,
+        max_in_flight=args.max_in_flight,
+        resume=False,
+        cache_dir=os.path.join(workdir, "cache") if args.cache else "",
+        finalize_manifest=args.finalize_manifest,
+    )
+
+    sampler = RssSampler()
+    sampler.start()
+    rss_start = sampler.peak
+    cpu0, t0 = cpu_seconds(), time.perf_counter()
+    try:
+        await orch.run()
+    finally:
+        wall = time.perf_counter() - t0
+        cpu = cpu_seconds() - cpu0
+        await sampler.stop()
+
+    lat = orch.item_latencies
+    snap = orch.progress.snapshot()
+    report = {
+        "items": n_items,
+        "items_done": len(lat),
+        "items_failed": snap["items"]["failed"],
+        "wall_s": round(wall, 3),
+        "items_per_s": round(len(lat) / wall, 2) if wall else None,
+        "latency_s": {
+            "p50": _round(percentile(lat, 0.50)),
+            "p95": _round(percentile(lat, 0.95)),
+            "p99": _round(percentile(lat, 0.99)),
+            "max": _round(max(lat) if lat else None),
+        },
+        "cpu_s": round(cpu, 3),
+        "cpu_ms_per_item": round(1000 * cpu / n_items, 3) if n_items else None,
+        "rss_mb": {"start": round(rss_start, 1), "peak": round(sampler.peak, 1)},
+        "services": snap.get("services"),
+    }
+
+    if not args.keep:
+        shutil.rmtree(raw_dir, ignore_errors=True)
+        shutil.rmtree(processed_dir, ignore_errors=True)
+    return report
+
+
+def _round(v: Optional[float]) -> Optional[float]:
+    return round(v, 4) if v is not None else None
+
+
+def print_summary(reports: List[Dict[str, Any]]):
+    header = f"{'items':>8} {'items/s':>9} {'p50 s':>8} {'p95 s':>8} {'p99 s':>8} {'cpu s':>8} {'cpu ms/it':>10} {'rss MB':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in reports:
+        lat = r["latency_s"]
+        print(
+            f"{r['items']:>8} {r['items_per_s']:>9} {lat['p50']:>8} {lat['p95']:>8} {lat['p99']:>8} "
+            f"{r['cpu_s']:>8} {r['cpu_ms_per_item']:>10} {r['rss_mb']['peak']:>8}"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Banc d'essai de l'orchestrateur (services de substitution)")
+    parser.add_argument("--items", type=int, nargs="+", default=[100, 1000],
+                        help="tailles de raw_dir à tester (100 à 100000)")
+    parser.add_argument("--image-ratio", type=float, default=0.5, help="part d'images (le reste : textes)")
+    parser.add_argument("--max-in-flight", type=int, default=None, help="défaut : services.yml")
+    parser.add_argument("--profile", default=os.path.join(os.path.dirname(__file__), "profile.yml"))
+    parser.add_argument("--time-scale", type=float, default=1.0, help="multiplie les latences du profil")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--cache", action="store_true", help="active le cache de résultats (dossier temporaire)")
+    parser.add_argument("--finalize-manifest", action="store_true", help="reconstruit aussi manifest.json")
+    parser.add_argument("--workdir", default=None, help="défaut : dossier temporaire")
+    parser.add_argument("--keep", action="store_true", help="garde raw_dir / processed_dir")
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("--out", default=None, help="rapport JSON")
+    args = parser.parse_args(argv)
+
+    # logs par item / par service : trop bavards (et coûteux) pour un banc
+    os.environ.setdefault("LOG_LEVEL", args.log_level)
+    _fake_service_hosts()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="raffinerie-bench-")
+    proc = start_standins(args.port, args.profile, args.time_scale, args.seed, args.log_level)
+    try:
+        point_registry_at(f"http://127.0.0.1:{args.port}")
+        reports = []
+        for n in sorted(args.items):
+            reports.append(asyncio.run(bench_once(n, workdir, args)))
+            print(json.dumps(reports[-1]), flush=True)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+        if not args.workdir and not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    result = {
+        "params": {
+            "image_ratio": args.image_ratio,
+            "max_in_flight": args.max_in_flight,
+            "profile": args.profile,
+            "time_scale": args.time_scale,
+            "cache": args.cache,
+        },
+        "runs": reports,
+    }
+    print_summary(reports)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
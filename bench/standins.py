@@ -0,0 +1,253 @@
+import os
+import sys
+import json
+import math
+import time
+import random
+import argparse
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Any, Dict, Optional
+
+import yaml
+from fastapi import FastAPI
+
+from services.docker_api_server import InProcessModel, create_service_app
+from services.mapping import SERVICE_MAPPING
+
+# Services de substitution pour le banc d'essai : même create_service_app que
+# les vrais conteneurs (file de travail, /run_batch, métriques, traces), mais
+# le « modèle » dort une durée tirée au hasard puis écrit les fichiers
+# attendus par SERVICE_MAPPING. Pas de GPU, pas de réseau (127.0.0.1).
+#
+# Tous les services tournent dans UN process, chacun sous /<service> :
+#   python -m bench.standins --port 8765 --profile bench/profile.yml
+
+PROFILE_PATH = os.path.join(os.path.dirname(__file__), "profile.yml")
+
+# services dont la sortie n'a pas d'entrée propre dans SERVICE_MAPPING
+MAPPING_ALIASES = {
+    "description": "base_text",
+    "image_generation": "base_image",
+}
+
+# services qui remplissent plusieurs champs (req.extra["fields"]) en un appel
+MULTI_FIELD = {"semantic_bundle"}
+
+# contenu plausible (valide pour EnrichedData) des sorties json / text
+_SAMPLE_OBJECTS = [
+    {"id": "obj_000", "label": "person", "bbox": [12, 20, 140, 310]},
+    {"id": "obj_001", "label": "chair", "bbox": [200, 180, 320, 330]},
+]
+SAMPLE_OUTPUTS: Dict[str, Any] = {
+    "object_detection": _SAMPLE_OBJECTS,
+    "focal": {"estimated_mm": 35.0, "confidence": 0.6, "method": "focal"},
+    "vanishing_points": [{"x": 0.5, "y": 0.4, "confidence": 0.7}],
+    "lights": [{
+        "id": "light_0", "position": [0.0, 2.0, 1.0], "orientation": [0.0, -1.0, 0.0],
+        "color": [255, 244, 229], "intensity": 0.8, "confidence": 0.5, "method": "lights",
+    }],
+    "dominant_colors": ["#a0522d", "#f5f5dc", "#2f4f4f"],
+    "translations": [{"language": "en", "text": "A man sits on a chair."}],
+    "topic_classification": ["daily life"],
+    "key_entities": {"persons": ["man"], "objects": ["chair"], "locations": []},
+    "emotions": ["calm"],
+    "keywords": ["man", "chair", "room"],
+    "related_texts": [],
+    "related_images": [],
+    "confidence_scores": {"overall": 0.5},
+    "processing_history": [],
+    "base_text": "A man sits on a chair in a quiet room.",
+    "language": "en",
+    "summary": "A man sitting on a chair.",
+    "narrative_type": "descriptive",
+    "style": "neutral",
+    "generated_from": "",
+    "creation_date": "2024-01-01",
+    "author": "bench",
+}
+
+
+# ---------------------------------------------------------
+# LATENCES
+# ---------------------------------------------------------
+class Latency:
+    """Tire des durées (en secondes) selon la config `latency` du profil."""
+
+    def __init__(self, conf: Dict[str, Any], time_scale: float = 1.0, rng: Optional[random.Random] = None):
+        self.dist = conf.get("dist", "lognormal")
+        self.conf = conf
+        self.scale = time_scale / 1000
+        self.batch_scaling = float(conf.get("batch_scaling", 1.0))
+        self.rng = rng or random.Random()
+        if self.dist not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"unknown latency distribution '{self.dist}'")
+
+    def sample(self) -> float:
+        c = self.conf
+        if self.dist == "fixed":
+            ms = c.get("ms", 0)
+        elif self.dist == "uniform":
+            ms = self.rng.uniform(c.get("low_ms", 0), c.get("high_ms", 0))
+        else:
+            ms = self.rng.lognormvariate(math.log(c.get("median_ms", 1)), c.get("sigma", 0.0))
+        return ms * self.scale
+
+    def sample_batch(self, size: int) -> float:
+        # un lot coûte un appel + batch_scaling par item supplémentaire
+        return self.sample() * (1 + self.batch_scaling * (size - 1))
+
+
+# ---------------------------------------------------------
+# MODÈLE DE SUBSTITUTION
+# ---------------------------------------------------------
+class StandInModel(InProcessModel):
+    def __init__(self, name: str, latency: Latency, failure_rate: float = 0.0, rng: Optional[random.Random] = None):
+        self.name = name
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.rng = rng or random.Random()
+        self.mapping = SERVICE_MAPPING.get(MAPPING_ALIASES.get(name, name))
+        if self.mapping is None and name not in MULTI_FIELD:
+            raise ValueError(f"{name}: no SERVICE_MAPPING entry to imitate")
+
+    def _failed(self) -> bool:
+        return self.failure_rate > 0 and self.rng.random() < self.failure_rate
+
+    @staticmethod
+    def _sample_output(key: str, req) -> Any:
+        if key == "mesh_3d":
+            # un .obj factice par objet sous outdir, chemin absolu comme les autres sorties
+            objects = []
+            for o in _SAMPLE_OBJECTS:
+                mesh_path = os.path.abspath(os.path.join(req.outdir, f"{o['id']}_mesh.obj"))
+                with open(mesh_path, "w", encoding="utf-8") as f:
+                    f.write("# bench placeholder\nv 0 0 0\n")
+                objects.append({**o, "mesh_3d": {"path": mesh_path.replace("\\", "/"), "method": "tripoSR"}})
+            return objects
+        return SAMPLE_OUTPUTS.get(key)
+
+    def _write_outputs(self, req):
+        if self.name in MULTI_FIELD:
+            # fragment des champs demandés (ex: "semantic.emotions")
+            out: Dict[str, Any] = {}
+            for fld in (req.extra or {}).get("fields") or []:
+                section, key = fld.split(".", 1)
+                out.setdefault(section, {})[key] = SAMPLE_OUTPUTS.get(key)
+            return out
+
+        key = MAPPING_ALIASES.get(self.name, self.name)
+        loader = self.mapping["json_loader"]
+        path = os.path.join(req.outdir, self.mapping["files"][0])
+
+        if loader == "binary_path":
+            with open(path, "wb") as f:
+                f.write(b"\x89BENCH\n")
+        elif loader == "json":
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(self._sample_output(key, req), f)
+        else:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(str(SAMPLE_OUTPUTS.get(key, "")))
+
+        if self.name in MAPPING_ALIASES:
+            # pas de fichier relu par SERVICE_MAPPING : fragment renvoyé directement
+            section, fld = self.mapping["enriched_path"]
+            value = path.replace("\\", "/") if loader == "binary_path" else SAMPLE_OUTPUTS.get(key)
+            return {section: {fld: value}}
+        return None
+
+    def infer(self, req):
+        time.sleep(self.latency.sample())
+        if self._failed():
+            raise RuntimeError(f"{self.name}: simulated failure")
+        return self._write_outputs(req)
+
+    def infer_batch(self, reqs):
+        time.sleep(self.latency.sample_batch(len(reqs)))
+        results = []
+        for req in reqs:
+            if self._failed():
+                results.append(RuntimeError(f"{self.name}: simulated failure"))
+                continue
+            try:
+                results.append(self._write_outputs(req))
+            except Exception as e:
+                results.append(e)
+        return results
+
+
+# ---------------------------------------------------------
+# APPLICATION
+# ---------------------------------------------------------
+def load_profile(path: str = PROFILE_PATH) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        return yaml.safe_load(f) or {}
+
+
+def service_conf(profile: Dict[str, Any], name: str) -> Dict[str, Any]:
+    defaults = profile.get("defaults") or {}
+    own = (profile.get("services") or {}).get(name) or {}
+    return {**defaults, **own}
+
+
+def create_standins_app(services, profile: Dict[str, Any], time_scale: float = 1.0, seed: Optional[int] = None) -> FastAPI:
+    """
+    Une app create_service_app par service, montée sous /<service>.
+    Les lifespans des sous-apps (chargement du modèle, micro-batcher) sont
+    enchaînés dans celui de l'app parente.
+    """
+    rng = random.Random(seed)
+    apps = {}
+    for name in services:
+        conf = service_conf(profile, name)
+        model = StandInModel(
+            name,
+            Latency(conf.get("latency") or {}, time_scale, random.Random(rng.random())),
+            failure_rate=float(conf.get("failure_rate", 0.0)),
+            rng=random.Random(rng.random()),
+        )
+        apps[name] = create_service_app(
+            name,
+            model=model,
+            slots=int(conf.get("slots", 1)),
+            max_queue=int(conf.get("max_queue", 4096)),
+        )
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        async with AsyncExitStack() as stack:
+            for sub in apps.values():
+                await stack.enter_async_context(sub.router.lifespan_context(sub))
+            yield
+
+    parent = FastAPI(title="bench stand-ins", lifespan=lifespan)
+    for name, sub in apps.items():
+        parent.mount(f"/{name}", sub)
+
+    @parent.get("/health")
+    def health():
+        return {"status": "ok", "services": sorted(apps)}
+
+    return parent
+
+
+def main(argv=None):
+    import uvicorn
+    from services.all_services_specs import service_specs
+
+    parser = argparse.ArgumentParser(description="Services de substitution du banc d'essai")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--profile", default=PROFILE_PATH)
+    parser.add_argument("--time-scale", type=float, default=1.0, help="multiplie toutes les latences")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    app = create_standins_app(
+        [s.name for s in service_specs], load_profile(args.profile), args.time_scale, args.seed,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning", access_log=False)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
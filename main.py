@@ -1,16 +1,46 @@
-from typing import List
-from fastapi import FastAPI
+import json
+import asyncio
+from contextlib import asynccontextmanager
+from typing import List, Optional
+from fastapi import FastAPI, HTTPException, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 import uvicorn
 
 from orchestrator.orchestrator import Orchestrator
+from orchestrator.jobs import JobManager, JobQueueFull, QUEUED, RUNNING
+from services.log import setup_logging
+from services.metrics import CONTENT_TYPE, Gauge, render
+from services.registry import ORCHESTRATOR_CONFIG, LOGGING_CONFIG
 from services.service_spec import ServiceSpec
 
+setup_logging(**LOGGING_CONFIG)
+
+JOBS_CONFIG = ORCHESTRATOR_CONFIG.get("jobs") or {}
+
+# runs de l'orchestrateur exécutés en arrière-plan (POST /jobs)
+jobs = JobManager(
+    max_queued=JOBS_CONFIG.get("max_queued", 8),
+    workers=JOBS_CONFIG.get("workers", 1),
+    history=JOBS_CONFIG.get("history", 100),
+)
+
+JOBS_GAUGE = Gauge("orchestrator_jobs", "Jobs en file ou en cours", ["status"])
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    await jobs.start()
+    yield
+    await jobs.stop()
+
+
 # Instanciation de l'application FastAPI
 app = FastAPI(
     title="Raffinerie Data API",
     version="1.0",
-    description="API de la Raffinerie de données (image + texte)"
+    description="API de la Raffinerie de données (image + texte)",
+    lifespan=lifespan,
 )
 
 # ---- AJOUT ----
@@ -19,18 +49,94 @@ class OrchestratorRequest(BaseModel):
     raw_dir: str
     processed_dir: str
     service_specs: List[ServiceSpec]
+    max_in_flight: Optional[int] = None  # défaut : services.yml
+    resume: Optional[bool] = None  # reprise depuis les checkpoints (défaut : services.yml)
+    finalize_manifest: Optional[bool] = None  # manifest.json en plus de manifest.jsonl
 
 @app.post("/test-orchestrator")
 async def test_orchestrator_image_only(req: OrchestratorRequest):
     orch = Orchestrator(
         raw_dir=req.raw_dir,
         processed_dir=req.processed_dir,
-        service_specs=req.service_specs  # Vous pouvez ajouter des spécifications de service si nécessaire
+        service_specs=req.service_specs,  # Vous pouvez ajouter des spécifications de service si nécessaire
+        max_in_flight=req.max_in_flight,
+        resume=req.resume,
+        finalize_manifest=req.finalize_manifest,
     )
     await orch.run()
     return {"status": "ok", "processed_dir": req.processed_dir}
 
 
+# ---- JOBS ----
+# POST /jobs rend la main tout de suite ; le run tourne en arrière-plan
+
+def _get_job(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    return job
+
+
+@app.post("/jobs", status_code=202)
+async def create_job(req: OrchestratorRequest):
+    params = {
+        "raw_dir": req.raw_dir,
+        "processed_dir": req.processed_dir,
+        "service_specs": req.service_specs,
+        "max_in_flight": req.max_in_flight,
+        "resume": req.resume,
+        "finalize_manifest": req.finalize_manifest,
+    }
+    try:
+        job = jobs.submit(params)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return {"id": job.id, "status": job.status}
+
+
+@app.get("/jobs")
+async def list_jobs():
+    return [job.snapshot() for job in jobs.jobs.values()]
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    return _get_job(job_id).snapshot()
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, interval: float = 1.0):
+    """Flux server-sent events : un état du job par intervalle, jusqu'à sa fin."""
+    job = _get_job(job_id)
+    interval = max(interval, 0.1)
+
+    async def stream():
+        while True:
+            yield f"event: progress\ndata: {json.dumps(job.snapshot())}\n\n"
+            if job.finished:
+                yield f"event: end\ndata: {json.dumps({'status': job.status})}\n\n"
+                return
+            await asyncio.sleep(interval)
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    job = jobs.cancel(_get_job(job_id).id)
+    return {"id": job.id, "status": job.status}
+
+
+# ---- MÉTRIQUES ----
+
+@app.get("/metrics")
+def metrics():
+    """Métriques au format texte Prometheus (appels par service, latences, items, jobs)."""
+    for status in (QUEUED, RUNNING):
+        JOBS_GAUGE.labels(status).set(sum(1 for j in jobs.jobs.values() if j.status == status))
+    return Response(render(), media_type=CONTENT_TYPE)
+
+
 # ---- FIN AJOUT ----
 
 @app.get("/")
@@ -0,0 +1,80 @@
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class BatchDispatcher:
+    """
+    Regroupe les appels d'items prêts vers un même service en lots /run_batch.
+
+    Un lot part dès qu'il atteint max_size requêtes, ou au plus tard
+    max_wait secondes après l'arrivée de sa première requête. Chaque appelant
+    récupère son propre fragment (ou l'erreur de son item).
+    `slot` (optionnel) limite le nombre de LOTS simultanés vers le service.
+    """
+
+    def __init__(self, service, max_size: int, max_wait: float, slot: Optional[asyncio.Semaphore] = None):
+        self.service = service
+        self.max_size = max(1, max_size)
+        self.max_wait = max_wait
+        self.slot = slot
+
+        self._pending: List[Tuple[Dict[str, Any], asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+
+    # ---------------------------------------------------------
+    async def submit(
+        self, input_path: str, outdir: str, extra: Optional[dict] = None, traceparent: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        payload = {"input_path": input_path, "outdir": outdir, "extra": extra, "traceparent": traceparent}
+        self._pending.append((payload, fut))
+
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return await fut
+
+    # ---------------------------------------------------------
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        # les appelants annulés entre-temps ne sont pas envoyés
+        batch = [(p, f) for p, f in self._pending if not f.done()]
+        self._pending = []
+        if not batch:
+            return
+
+        task = asyncio.get_running_loop().create_task(self._send(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch: List[Tuple[Dict[str, Any], asyncio.Future]]):
+        payloads = [p for p, _ in batch]
+        try:
+            if self.slot is None:
+                results = await self.service.arun_batch(payloads)
+            else:
+                async with self.slot:
+                    results = await self.service.arun_batch(payloads)
+        except Exception as e:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+
+        for (_, fut), res in zip(batch, results):
+            if not fut.done():
+                fut.set_result(res)
+
+    # ---------------------------------------------------------
+    async def close(self):
+        """Envoie ce qui reste en attente et attend les lots en cours."""
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
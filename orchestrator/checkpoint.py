@@ -0,0 +1,111 @@
+import os
+import json
+from typing import Any, Dict, Iterable, List, Optional
+
+# sauvegarde de l'état d'un item, à côté de ses sorties : <item_dir>/state.json
+CHECKPOINT_FILE = "state.json"
+
+
+def write_json_atomic(path: str, data: Any, indent: Optional[int] = 2):
+    """Écrit un JSON via un fichier temporaire + os.replace (jamais de fichier tronqué)."""
+    tmp_path = path + ".part"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=indent, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def checkpoint_path(item_dir: str) -> str:
+    return os.path.join(item_dir, CHECKPOINT_FILE)
+
+
+def save_checkpoint(state) -> None:
+    write_json_atomic(checkpoint_path(state.item_dir), state.model_dump())
+
+
+def load_checkpoint(item_dir: str) -> Optional[Dict[str, Any]]:
+    path = checkpoint_path(item_dir)
+    if not os.path.isfile(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        # checkpoint illisible → on repart de zéro pour cet item
+        return None
+
+
+# ---------------------------------------------------------
+# VALIDATION DES CHAMPS RESTAURÉS
+# ---------------------------------------------------------
+def get_field_values(enriched: Dict[str, Any], field: str) -> List[Any]:
+    """
+    Valeurs d'un champ pointé ("visual.object_detection.mesh_3d").
+    Les listes sont parcourues élément par élément (un mesh par objet).
+    """
+    values = [enriched]
+    for key in field.split("."):
+        nxt = []
+        for v in values:
+            items = v if isinstance(v, list) else [v]
+            for it in items:
+                if isinstance(it, dict) and it.get(key) is not None:
+                    nxt.append(it[key])
+        values = nxt
+    return values
+
+
+def _artifact_paths(value: Any, skip_keys: Iterable[str]) -> List[str]:
+    """Chemins de fichiers référencés ("path", "mask_path", ...) dans une valeur."""
+    paths = []
+    if isinstance(value, list):
+        for v in value:
+            paths.extend(_artifact_paths(v, skip_keys))
+    elif isinstance(value, dict):
+        for k, v in value.items():
+            if k in skip_keys:
+                continue
+            if isinstance(v, str) and (k == "path" or k.endswith("_path")):
+                paths.append(v)
+            else:
+                paths.extend(_artifact_paths(v, skip_keys))
+    return paths
+
+
+def field_is_complete(enriched: Dict[str, Any], field: str, known_fields: Iterable[str]) -> bool:
+    """
+    Un champ restauré n'est considéré comme fait que si sa valeur existe et
+    que tous les fichiers qu'il référence existent encore sur disque
+    (généralisation du test "le mesh existe déjà" de mesh_3d).
+    Les sous-champs remplis par d'autres services (ex: mesh_3d sous
+    object_detection) sont vérifiés séparément.
+    """
+    values = get_field_values(enriched, field)
+    if not values:
+        return False
+
+    prefix = field + "."
+    skip_keys = {f[len(prefix):].split(".")[0] for f in known_fields if f.startswith(prefix)}
+
+    for value in values:
+        for p in _artifact_paths(value, skip_keys):
+            if not os.path.isfile(p):
+                return False
+    return True
+
+
+def restorable_fields(state, data: Dict[str, Any]) -> List[str]:
+    """
+    Champs d'un checkpoint qui n'ont pas à être refaits pour ce State.
+    Les services en échec ou dont les sorties ont disparu seront relancés.
+    """
+    enriched = data.get("enriched") or {}
+    ready = data.get("fields_ready") or {}
+    known = [f for f, ok in ready.items() if ok]
+
+    restored = []
+    for field in known:
+        if state.fields_ready.get(field):
+            continue
+        if field_is_complete(enriched, field, known):
+            restored.append(field)
+    return restored
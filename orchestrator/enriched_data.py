@@ -115,10 +115,10 @@ class Links(BaseModel):
 # --- METADATA ---------------------------------------------------------------
 
 class Metadata(BaseModel):
-    creation_date: Optional[str]
-    author: Optional[str]
-    confidence_scores: Optional[Dict[str, float]]
-    processing_history: Optional[List[Dict[str, str]]]
+    creation_date: Optional[str] = None
+    author: Optional[str] = None
+    confidence_scores: Optional[Dict[str, float]] = None
+    processing_history: Optional[List[Dict[str, str]]] = None
 
 
 # --- ROOT MODEL -------------------------------------------------------------
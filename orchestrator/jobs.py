@@ -0,0 +1,162 @@
+import time
+import uuid
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from orchestrator.orchestrator import Orchestrator
+from orchestrator.progress import RunProgress
+from services.log import fields
+
+log = logging.getLogger(__name__)
+
+# statuts possibles d'un job
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINAL_STATUSES = (DONE, FAILED, CANCELLED)
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, params: Dict[str, Any]):
+        self.id = uuid.uuid4().hex
+        # arguments passés tels quels à Orchestrator(...)
+        self.params = params
+        self.status = QUEUED
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.progress = RunProgress()
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINAL_STATUSES
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "error": self.error,
+            "raw_dir": self.params.get("raw_dir"),
+            "processed_dir": self.params.get("processed_dir"),
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "progress": self.progress.snapshot(),
+        }
+
+
+class JobManager:
+    """
+    Exécute les runs de l'orchestrateur en arrière-plan.
+
+    - file d'attente bornée (max_queued) : submit() lève JobQueueFull au-delà
+    - `workers` runs en parallèle (1 par défaut : les limites par service de
+      services.yml s'appliquent run par run, plusieurs runs simultanés
+      les additionneraient)
+    - seuls les `history` derniers jobs terminés sont conservés
+    """
+
+    def __init__(self, max_queued: int = 8, workers: int = 1, history: int = 100):
+        self.max_queued = max_queued
+        self.n_workers = workers
+        self.history = history
+
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._stopping = False
+
+    # ---------------------------------------------------------
+    async def start(self):
+        self._stopping = False
+        self._queue = asyncio.Queue(maxsize=self.max_queued)
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.n_workers)]
+
+    async def stop(self):
+        self._stopping = True
+        for job in self.jobs.values():
+            if not job.finished:
+                self.cancel(job.id)
+        for w in self._workers:
+            w.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    # ---------------------------------------------------------
+    def submit(self, params: Dict[str, Any]) -> Job:
+        job = Job(params)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise JobQueueFull(f"job queue is full ({self.max_queued} queued)")
+        self.jobs[job.id] = job
+        self._prune()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        job = self.jobs.get(job_id)
+        if job is None or job.finished:
+            return job
+
+        if job.status == QUEUED:
+            # le worker l'ignorera en le sortant de la file
+            job.status = CANCELLED
+            job.finished_at = time.time()
+        elif job.task is not None:
+            job.task.cancel()
+        return job
+
+    # ---------------------------------------------------------
+    def _prune(self):
+        finished = [j.id for j in self.jobs.values() if j.finished]
+        for job_id in finished[: max(0, len(finished) - self.history)]:
+            del self.jobs[job_id]
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                if job.status == CANCELLED:
+                    continue
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: Job):
+        job.status = RUNNING
+        job.started_at = time.time()
+
+        try:
+            orch = Orchestrator(**job.params, progress=job.progress)
+            job.task = asyncio.create_task(orch.run())
+            await job.task
+            job.status = DONE
+        except asyncio.CancelledError:
+            job.status = CANCELLED
+            if self._stopping:
+                # c'est le worker lui-même qui est annulé (arrêt de l'API)
+                raise
+        except Exception as e:
+            job.status = FAILED
+            job.error = repr(e)
+            log.exception("job failed", extra=fields(job=job.id))
+        finally:
+            job.finished_at = time.time()
+            log.info("job finished", extra=fields(
+                job=job.id, status=job.status, duration_s=round(job.finished_at - job.started_at, 3),
+            ))
+            self._prune()
@@ -0,0 +1,137 @@
+import os
+import json
+from typing import Any, Dict, Iterator, Optional, TextIO
+
+from orchestrator.enriched_data import EnrichedData
+
+
+class ManifestWriter:
+    """
+    Manifest en streaming : une ligne JSON compacte par item, ajoutée dès que
+    l'item est terminé (manifest.jsonl). On peut donc suivre les résultats
+    en direct (tail -f) sans garder tout le corpus en mémoire.
+
+    finalize() reconstruit le manifest.json historique (tableau JSON) à partir
+    du JSONL, ligne par ligne.
+    """
+
+    def __init__(self, processed_dir: str, filename: str = "manifest.jsonl"):
+        self.processed_dir = processed_dir
+        self.path = os.path.join(processed_dir, filename)
+        self.count = 0
+        self._f: Optional[TextIO] = None
+
+    # ---------------------------------------------------------
+    def open(self):
+        os.makedirs(self.processed_dir, exist_ok=True)
+        # un run repart d'un JSONL vide : avec la reprise, les items déjà faits
+        # repassent dans le pipeline et sont réécrits
+        self._f = open(self.path, "w", encoding="utf-8")
+        self.count = 0
+
+    def close(self):
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+    # ---------------------------------------------------------
+    def write(self, state):
+        enriched = EnrichedData(
+            id=state.id,
+            source_file=state.image_path or state.id,
+            text=state.text,
+            **state.enriched
+        )
+        self._f.write(enriched.model_dump_json() + "\n")
+        self._f.flush()
+        self.count += 1
+
+    # ---------------------------------------------------------
+    def finalize(self, filename: str = "manifest.json") -> str:
+        """Construit le manifest.json (tableau) depuis le JSONL, sans tout charger."""
+        out_path = os.path.join(self.processed_dir, filename)
+        tmp_path = out_path + ".part"
+
+        with open(self.path, "r", encoding="utf-8") as src, \
+                open(tmp_path, "w", encoding="utf-8") as dst:
+            dst.write("[")
+            first = True
+            for line in src:
+                line = line.strip()
+                if not line:
+                    continue
+                dst.write("\n" if first else ",\n")
+                dst.write(line)
+                first = False
+            dst.write("\n]\n")
+
+        os.replace(tmp_path, out_path)
+        return out_path
+
+
+# ---------------------------------------------------------
+# MANIFEST D'ENTRÉE (raw_dir)
+# ---------------------------------------------------------
+INPUT_MANIFESTS = ("manifest.jsonl", "manifest.json")
+
+
+def iter_input_manifest(raw_dir: str) -> Iterator[Dict[str, Any]]:
+    """
+    Entrées du manifest de raw_dir, lues une à une : manifest.jsonl (une
+    entrée par ligne) s'il existe, sinon manifest.json (tableau JSON lu par
+    morceaux). Rien n'est chargé en entier.
+    """
+    jsonl_path = os.path.join(raw_dir, "manifest.jsonl")
+    if os.path.isfile(jsonl_path):
+        with open(jsonl_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+        return
+
+    json_path = os.path.join(raw_dir, "manifest.json")
+    if os.path.isfile(json_path):
+        yield from iter_json_array(json_path)
+
+
+def iter_json_array(path: str, chunk_size: int = 1 << 16) -> Iterator[Any]:
+    """Éléments d'un tableau JSON, décodés au fil de la lecture (un morceau en mémoire)."""
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8-sig") as f:
+        buf, pos = "", 0
+        expect = "["
+        while True:
+            # espaces / séparateurs, en relisant quand le morceau est épuisé
+            while pos < len(buf) and buf[pos] in " \t\r\n" + ("," if expect is None else ""):
+                pos += 1
+            if pos == len(buf):
+                more = f.read(chunk_size)
+                if not more:
+                    if expect == "[" and not buf.strip():
+                        return  # fichier vide
+                    raise ValueError(f"{path}: truncated JSON array")
+                buf, pos = more, 0
+                continue
+
+            if expect == "[":
+                if buf[pos] != "[":
+                    raise ValueError(f"{path}: expected a JSON array")
+                pos += 1
+                expect = None
+                continue
+            if buf[pos] == "]":
+                return
+
+            while True:
+                try:
+                    item, end = decoder.raw_decode(buf, pos)
+                    break
+                except json.JSONDecodeError:
+                    # élément à cheval sur deux morceaux
+                    more = f.read(chunk_size)
+                    if not more:
+                        raise
+                    buf, pos = buf[pos:] + more, 0
+            yield item
+            pos = end
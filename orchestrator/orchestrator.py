@@ -1,11 +1,51 @@
 import os
 import json
-from typing import Dict, Any, List, Optional
-
-from pydantic import BaseModel
-from orchestrator.enriched_data import EnrichedData
-from services.registry import get_service
+import time
+import asyncio
+import logging
+import itertools
+from typing import AsyncIterator, Dict, Any, Iterator, List, Optional, Tuple
+
+from pydantic import BaseModel, PrivateAttr
+from services.registry import get_service, service_sessions, ORCHESTRATOR_CONFIG, LOGGING_CONFIG, TRACING_CONFIG
+from services.external_service import ServiceError
+from services.log import ITEM_ID, fields, setup_logging
+from services.tracing import CLIENT, TRACE_FILE, Tracer
 from services.service_spec import ServiceSpec
+from services.metrics import Counter, Gauge, Histogram
+from orchestrator.scheduler import DependencyGraph, LatencyEstimator, PrioritySemaphore
+from orchestrator.checkpoint import (
+    load_checkpoint,
+    restorable_fields,
+    save_checkpoint,
+    write_json_atomic,
+    get_field_values,
+)
+from orchestrator.batching import BatchDispatcher
+from orchestrator.manifest import INPUT_MANIFESTS, ManifestWriter, iter_input_manifest
+from orchestrator.progress import RunProgress
+from orchestrator.result_cache import ITEM_DIR_TOKEN, ResultCache, hash_file, hash_json
+log = logging.getLogger(__name__)
+
+# ---------------------------------------------------------
+# MÉTRIQUES (GET /metrics de main.py)
+# ---------------------------------------------------------
+SERVICE_CALLS = Counter(
+    "orchestrator_service_calls_total",
+    "Appels de service par issue (ok, error, cache_hit)",
+    ["service", "outcome"],
+)
+SERVICE_LATENCY = Histogram(
+    "orchestrator_service_call_duration_seconds",
+    "Durée d'un appel de service vue de l'orchestrateur (attente de créneau comprise)",
+    ["service"],
+)
+SERVICE_IN_FLIGHT = Gauge("orchestrator_service_in_flight", "Appels de service en cours", ["service"])
+ITEMS = Counter("orchestrator_items_total", "Items terminés par statut (ok, failed)", ["status"])
+
+# durée moyenne d'un appel par service (hors attente de créneau), partagée
+# par les runs du process : sert à estimer les chemins critiques
+LATENCIES = LatencyEstimator()
 
 
 def merge_dicts(a: Dict, b: Dict):
@@ -24,108 +64,172 @@ class State(BaseModel):
     text: Optional[str] = None
     enriched: Dict[str, Any] = {}
     fields_ready: Dict[str, bool] = {}
+    failed: Dict[str, str] = {}  # service -> erreur du dernier essai
+
+    # hash du contenu d'entrée (image + texte), calculé une fois pour le cache
+    _content_digest: Optional[str] = PrivateAttr(default=None)
 
 
 
 class Orchestrator:
 
-    def __init__(self, raw_dir: str, processed_dir: str, service_specs: List[ServiceSpec]):
+    def __init__(
+        self,
+        raw_dir: str,
+        processed_dir: str,
+        service_specs: List[ServiceSpec],
+        max_in_flight: Optional[int] = None,
+        resume: Optional[bool] = None,
+        cache_dir: Optional[str] = None,
+        finalize_manifest: Optional[bool] = None,
+        progress: Optional[RunProgress] = None,
+        trace_file: Optional[str] = None,
+    ):
         self.raw_dir = raw_dir
         self.processed_dir = processed_dir
         self.service_specs = service_specs
+        # construit une seule fois : champ prêt -> services à réévaluer
+        self.graph = DependencyGraph(service_specs)
+        # nombre d'items traités en parallèle
+        self.max_in_flight = max_in_flight or ORCHESTRATOR_CONFIG.get("max_in_flight", 16)
+        # reprise depuis les checkpoints <item_dir>/state.json d'un run précédent
+        self.resume = ORCHESTRATOR_CONFIG.get("resume", True) if resume is None else resume
+        # cache de résultats partagé entre runs (désactivé si aucun dossier ;
+        # cache_dir="" le désactive même si services.yml en configure un ;
+        # chemin relatif : sous processed_dir)
+        cache_conf = ORCHESTRATOR_CONFIG.get("cache") or {}
+        cache_dir = cache_conf.get("dir") if cache_dir is None else cache_dir
+        self.cache: Optional[ResultCache] = None
+        if cache_dir:
+            cache_dir = os.path.join(processed_dir, cache_dir)
+            max_bytes = int(cache_conf.get("max_size_mb", 10240)) * 1024 * 1024
+            try:
+                self.cache = ResultCache(cache_dir, max_bytes)
+            except OSError as e:
+                # dossier non accessible (hors conteneur...) : le run continue sans cache
+                log.warning("result cache disabled", extra=fields(dir=cache_dir, error=repr(e)))
+        # manifest.jsonl écrit au fil de l'eau ; manifest.json reconstruit en fin de run
+        self.finalize_manifest = (
+            ORCHESTRATOR_CONFIG.get("finalize_manifest", True)
+            if finalize_manifest is None else finalize_manifest
+        )
+        self._manifest = ManifestWriter(processed_dir)
+        # compteurs d'avancement (lus par l'API /jobs)
+        self.progress = progress or RunProgress()
+        # une trace par item, un span par appel de service (propagé aux services)
+        self.tracer = Tracer("orchestrator", trace_file or TRACE_FILE or TRACING_CONFIG.get("file"))
+        # un sémaphore par service limité (max_concurrency dans services.yml),
+        # créé dans run() pour être lié à la boucle asyncio courante ;
+        # les appels en attente passent par marge croissante (chemin critique d'abord)
+        self._service_slots: Dict[str, PrioritySemaphore] = {}
+        # coût restant par service, recalculé quand LATENCIES a changé
+        self._costs: Dict[str, float] = {}
+        self._costs_version = -1
+        # regroupement en lots /run_batch pour les services configurés (batch dans services.yml)
+        self._batchers: Dict[str, BatchDispatcher] = {}
 
     # ---------------------------------------------------------
-    def _load_raw(self) -> List[State]:
-        states = []
-        manifest_path = None
-        for filename in os.listdir(self.raw_dir):
-            fpath = os.path.join(self.raw_dir, filename)
-            if not os.path.isfile(fpath):
-                continue
+    def _new_state(self, name: str, **kwargs) -> State:
+        item_dir = os.path.join(self.processed_dir, name)
+        os.makedirs(item_dir, exist_ok=True)
+        return State(id=name, item_dir=item_dir, **kwargs)
 
-            name, ext = os.path.splitext(filename)
-            
+    # ---------------------------------------------------------
+    def _index_manifest(self) -> Dict[str, int]:
+        """
+        Pré-passe sur le manifest de raw_dir : nombre d'entrées par image.
+        Seuls les chemins et les compteurs sont gardés, pas les entrées.
+        """
+        counts: Dict[str, int] = {}
+        for item in iter_input_manifest(self.raw_dir):
+            img = item.get("image_path")
+            if img:
+                counts[img] = counts.get(img, 0) + 1
+        return counts
 
-            if filename == "manifest.json":
-                manifest_path = fpath
+    # ---------------------------------------------------------
+    def _iter_manifest_groups(self, counts: Dict[str, int]) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+        """
+        (image_path, entrées) du manifest de raw_dir, relu en streaming.
+        Une image est produite dès que toutes ses entrées (counts) ont été lues :
+        seules les entrées d'images citées en plusieurs endroits restent en
+        attente, le temps d'arriver à leur dernière occurrence.
+        """
+        waiting: Dict[str, List[Dict[str, Any]]] = {}
+        entries = iter_input_manifest(self.raw_dir)
+        for img, group in itertools.groupby(entries, key=lambda item: item.get("image_path")):
+            if not img:
+                log.warning("manifest entry without image_path ignored")
+                continue
+            items = waiting.pop(img, []) + list(group)
+            if len(items) < counts.get(img, 0):
+                waiting[img] = items
                 continue
+            yield img, items
 
-            if ext.lower() in [".png", ".jpg", ".jpeg", ".bmp"]:
-                item_dir = os.path.join(self.processed_dir, name)
-                os.makedirs(item_dir, exist_ok=True)
-                states.append(
-                        State(
-                            id=name,
-                            item_dir=item_dir,
-                            image_path=fpath,
-                            enriched={},
-                            fields_ready={
-                                "visual.base_image": True
-                            }
-                        )
-                    )
-            elif ext.lower() in [".txt"]:
-                with open(fpath, "r", encoding="utf-8") as f:
-                    txt = f.read().strip()
-                item_dir = os.path.join(self.processed_dir, name)
-                os.makedirs(item_dir, exist_ok=True)
-                states.append(
-                    State(
-                        id=name,
-                        item_dir=item_dir,
-                        text=txt,
+        # manifest modifié entre les deux passes : on produit ce qui a été lu
+        yield from waiting.items()
+
+    # ---------------------------------------------------------
+    @staticmethod
+    def _apply_manifest(st: State, entries: List[Dict[str, Any]]) -> State:
+        # Mise à jour des champs imposés par le manifest
+        for item in entries:
+            desc = item.get("description")
+            extra = {k: v for k, v in item.items() if k not in ["image_path", "description"]}
+
+            st.text = desc
+            st.fields_ready["semantic.base_texte"] = True
+            st.fields_ready["visual.base_image"] = True
+
+            merge_dicts(st.enriched, extra)
+        return st
+
+    # ---------------------------------------------------------
+    async def _iter_raw(self) -> AsyncIterator[State]:
+        """
+        Produit les items un par un, sans rien charger en entier : d'abord les
+        images du manifest de raw_dir (lu en streaming), puis les fichiers de
+        raw_dir (os.scandir) qu'il ne cite pas. Les entrées d'une même image
+        sont fusionnées en un seul item, même si elles ne se suivent pas.
+        """
+        counts = self._index_manifest()
+        for img, items in self._iter_manifest_groups(counts):
+            await asyncio.sleep(0)
+            mid = os.path.splitext(os.path.basename(img))[0]
+            st = self._new_state(mid, image_path=img, enriched={}, fields_ready={"visual.base_image": True})
+            yield self._apply_manifest(st, items)
+
+        with os.scandir(self.raw_dir) as entries:
+            for entry in entries:
+                # rend la main à la boucle, même sur de longues séries de fichiers ignorés
+                await asyncio.sleep(0)
+
+                if not entry.is_file() or entry.name in INPUT_MANIFESTS:
+                    continue
+
+                fpath = entry.path
+                name, ext = os.path.splitext(entry.name)
+
+                if ext.lower() in [".png", ".jpg", ".jpeg", ".bmp"]:
+                    if fpath in counts:
+                        continue
+                    yield self._new_state(
+                        name,
+                        image_path=fpath,
                         enriched={},
-                        fields_ready={"semantic.base_text": True}
+                        fields_ready={"visual.base_image": True},
                     )
-                )
-        if manifest_path:
-            # chargement du manifest pour compléter/ajouter des States 
-            with open(manifest_path, "r", encoding="utf-8") as f:
-                manifest = json.load(f)
-
-            # dictionnaire temporaire pour retrouver les States par image_path
-            state_by_path = {s.image_path: s for s in states if s.image_path}
-
-            for item in manifest:
-                img = item.get("image_path")
-                desc = item.get("description")
-                extra = {k: v for k, v in item.items() if k not in ["image_path", "description"]}
-
-                # ----------------------------------------
-                # CAS 1 : l'image existe déjà dans state_by_path
-                # ----------------------------------------
-                if img in state_by_path:
-                    st = state_by_path[img]
-                else:
-                # ----------------------------------------
-                # CAS 2 : on n'a pas encore croisé l'image → créer un State minimal
-                # ----------------------------------------
-                    mid = os.path.splitext(os.path.basename(img))[0]
-                    idir = os.path.join(self.processed_dir, mid)
-                    os.makedirs(idir, exist_ok=True)
-
-                    st = State(
-                        id=mid,
-                        item_dir=idir,
-                        image_path=img,
-                        text=None,
+
+                elif ext.lower() in [".txt"]:
+                    with open(fpath, "r", encoding="utf-8") as f:
+                        txt = f.read().strip()
+                    yield self._new_state(
+                        name,
+                        text=txt,
                         enriched={},
-                        fields_ready={}
+                        fields_ready={"semantic.base_text": True},
                     )
-                    states.append(st)
-                    state_by_path[img] = st
-
-                # ----------------------------------------
-                # Mise à jour des champs imposés par le manifest
-                # ----------------------------------------
-                st.text = desc
-                st.fields_ready["semantic.base_texte"] = True
-                st.fields_ready["visual.base_image"] = True
-
-                merge_dicts(st.enriched, extra)
-                
-
-        return states
 
     # ---------------------------------------------------------
     def _ensure_file(self, state: State) -> str:
@@ -139,8 +243,9 @@ class Orchestrator:
             **state.enriched
             }
 
-        with open(temp_json, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2)
+        # écriture atomique : d'autres services peuvent être en train de lire
+        # tmp.json pendant qu'on le régénère pour le service suivant
+        write_json_atomic(temp_json, data)
         return temp_json
 
     # ---------------------------------------------------------
@@ -169,89 +274,445 @@ class Orchestrator:
         return True
 
     # ---------------------------------------------------------
-    async def _run_service(self, state: State, spec: ServiceSpec):
+    @staticmethod
+    def _request_extra(state: State, spec: ServiceSpec) -> Optional[Dict[str, Any]]:
+        """
+        Service groupé (plusieurs fills, ex: semantic_bundle) : on ne lui
+        demande que les champs qui ne sont pas encore prêts.
+        """
+        if len(spec.fills) < 2:
+            return None
+        return {"fields": [f for f in spec.fills if not state.fields_ready.get(f)]}
+
+    @staticmethod
+    def _filled_by(spec: ServiceSpec, result: Dict[str, Any]) -> List[str]:
+        """
+        Champs rendus prêts par le fragment. Un service groupé peut ne
+        remplir qu'une partie de ses fills : les autres restent à faire
+        (services par champ relancés ensuite).
+        """
+        if len(spec.fills) < 2:
+            return list(spec.fills)
+        filled = []
+        for fld in spec.fills:
+            node: Any = result
+            for part in fld.split("."):
+                node = node.get(part) if isinstance(node, dict) else None
+            if node is not None:
+                filled.append(fld)
+        return filled
+
+    # ---------------------------------------------------------
+    @staticmethod
+    def _hash_content(state: State) -> str:
+        image_digest = None
+        if state.image_path and os.path.isfile(state.image_path):
+            image_digest = hash_file(state.image_path)
+        return hash_json([image_digest, state.text])
+
+    async def _ensure_content_digest(self, state: State) -> str:
+        """Hash du contenu d'entrée, calculé une fois par item hors de la boucle asyncio."""
+        if state._content_digest is None:
+            state._content_digest = await asyncio.to_thread(self._hash_content, state)
+        return state._content_digest
+
+    async def _input_digest(self, state: State, spec: ServiceSpec) -> str:
+        """
+        Hash de ce que le service consomme réellement : contenu de l'image et
+        texte de l'item, plus les champs needs_fields (chemins rendus relatifs
+        à item_dir pour que deux items identiques aient la même clé).
+        """
+        content_digest = await self._ensure_content_digest(state)
+
+        needed = {fld: get_field_values(state.enriched, fld) for fld in spec.needs_fields}
+        needed_raw = json.dumps(needed, sort_keys=True, default=str)
+        needed_raw = needed_raw.replace(state.item_dir.replace("\\", "/"), ITEM_DIR_TOKEN)
+        return hash_json([content_digest, needed_raw])
+
+    # ---------------------------------------------------------
+    @staticmethod
+    def _record_history(state: State, entry: Dict[str, str]):
+        metadata = state.enriched.setdefault("metadata", {})
+        history = metadata.get("processing_history") or []
+        history.append(entry)
+        metadata["processing_history"] = history
+
+    # ---------------------------------------------------------
+    def _remaining_costs(self) -> Dict[str, float]:
+        if self._costs_version != LATENCIES.version:
+            self._costs = self.graph.remaining_costs(LATENCIES.get)
+            self._costs_version = LATENCIES.version
+        return self._costs
+
+    # ---------------------------------------------------------
+    async def _call_service(
+        self, state: State, spec: ServiceSpec, outdir: str, traceparent: str, slack: float = 0.0,
+        extra: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
         service = get_service(spec.name)
 
-        source = self._ensure_file(state)
+        batcher = self._batchers.get(spec.name)
+        if batcher is not None:
+            # la limite de concurrence s'applique aux lots, pas aux items
+            t0 = time.monotonic()
+            result = await batcher.submit(self._ensure_file(state), outdir, extra=extra, traceparent=traceparent)
+            LATENCIES.observe(spec.name, time.monotonic() - t0)
+            return result
+
+        slot = self._service_slots.get(spec.name)
+        if slot is not None:
+            # attente d'un créneau du service : span à part pour la voir dans la trace
+            # échéance = maintenant + marge : le chemin critique passe d'abord,
+            # sans affamer les appels en attente depuis plus longtemps que leur marge
+            with self.tracer.span("slot.wait", attributes={"service": spec.name, "slack_s": round(slack, 3)}):
+                await slot.acquire(time.monotonic() + slack)
+        try:
+            # tmp.json généré au dernier moment, une fois le créneau obtenu
+            source = self._ensure_file(state)
+            t0 = time.monotonic()
+            result = await service.arun(source, outdir, extra=extra, traceparent=traceparent, slot=slot)
+            LATENCIES.observe(spec.name, time.monotonic() - t0)
+            return result
+        finally:
+            if slot is not None:
+                slot.release()
+
+    # ---------------------------------------------------------
+    async def _run_service(self, state: State, spec: ServiceSpec, slack: float = 0.0):
+        with self.tracer.span(f"service {spec.name}", kind=CLIENT, attributes={"service": spec.name}) as span:
+            await self._run_service_traced(state, spec, span, slack)
+
+    async def _run_service_traced(self, state: State, spec: ServiceSpec, span, slack: float = 0.0):
         outdir = os.path.join(state.item_dir, spec.name)
         os.makedirs(outdir, exist_ok=True)
 
-        result = await service.arun(source, outdir)
+        result = None
+        key = None
+        extra = self._request_extra(state, spec)
+        if self.cache is not None:
+            # même contenu déjà traité (autre nom de fichier, autre batch) → pas d'appel
+            version = get_service(spec.name).version
+            key = ResultCache.make_key(
+                spec.name, await self._input_digest(state, spec), extra, version
+            )
+            result = await asyncio.to_thread(self.cache.get, key, state.item_dir)
+            span.set_attribute("cache", "hit" if result is not None else "miss")
+            self._record_history(state, {
+                "service": spec.name,
+                "cache": "hit" if result is not None else "miss",
+            })
+
+        if result is not None:
+            SERVICE_CALLS.labels(spec.name, "cache_hit").inc()
+            log.info("service finished", extra=fields(service=spec.name, cache="hit"))
+        else:
+            self.progress.service_started(spec.name)
+            t0 = time.monotonic()
+            try:
+                with SERVICE_IN_FLIGHT.labels(spec.name).track_inprogress():
+                    result = await self._call_service(state, spec, outdir, span.traceparent, slack, extra)
+            except BaseException as e:
+                self.progress.service_finished(spec.name, ok=False)
+                SERVICE_CALLS.labels(spec.name, "error").inc()
+                log.warning("service failed", extra=fields(
+                    service=spec.name, duration_s=round(time.monotonic() - t0, 3), error=repr(e),
+                ))
+                raise
+            duration = time.monotonic() - t0
+            SERVICE_LATENCY.labels(spec.name).observe(duration)
+            has_error = isinstance(result, dict) and "error" in result
+            self.progress.service_finished(spec.name, ok=not has_error)
+            if has_error:
+                span.set_error(str(result["error"]))
+            SERVICE_CALLS.labels(spec.name, "error" if has_error else "ok").inc()
+            log.info("service finished", extra=fields(
+                service=spec.name,
+                cache="miss" if key is not None else None,
+                duration_s=round(duration, 3),
+                error=result.get("error") if has_error else None,
+            ))
+            if has_error:
+                # fragment d'erreur : rien à fusionner, les champs ne sont pas prêts
+                raise ServiceError(f"{spec.name}: {result['error']}")
+            if key is not None and isinstance(result, dict):
+                await asyncio.to_thread(self.cache.put, key, result, state.item_dir)
 
         merge_dicts(state.enriched, result)
 
-        for fld in spec.fills:
+        for fld in self._filled_by(spec, result):
             state.fields_ready[fld] = True
 
     # ---------------------------------------------------------
-    async def run(self):
+    def _restore(self, state: State):
+        """
+        Reprend l'item là où un run précédent s'est arrêté : seuls les champs
+        dont la valeur et les fichiers existent encore sont considérés faits.
+        """
+        data = load_checkpoint(state.item_dir)
+        if not data:
+            return
+
+        restored = restorable_fields(state, data)
+        # valeurs du checkpoint d'abord, celles du chargement (manifest) par-dessus
+        state.enriched = merge_dicts(data.get("enriched") or {}, state.enriched)
+        for fld in restored:
+            state.fields_ready[fld] = True
 
-        print("\n========== ORCHESTRATOR RUN START ==========\n")
-        print(f"RAW DIR: {self.raw_dir}")
-        print(f"PROCESSED DIR: {self.processed_dir}")
-        print(f"SERVICE SPECS: {[s.name for s in self.service_specs]}\n")
-
-        states = self._load_raw()
-
-        print("---- STATES LOADED ----")
-        for s in states:
-            print(f"State: id={s.id}")
-            print(f"  image_path = {s.image_path}")
-            print(f"  text       = {s.text}")
-            print(f"  item_dir   = {s.item_dir}")
-            print(f"  enriched   = {s.enriched}")
-            print(f"  fields_ready = {s.fields_ready}")
-        print("------------------------\n")
-        iteration = 0
-        while True: #très dangereux, mais je ne sais pas comment faire autrement pour l'instant, ptet ajouter un compteur max d'itérations
-            
-            iteration += 1
-            print(f"\n---- ITERATION {iteration} ----")
-            
-            progress = False
-
-            for state in states:
-                print(f"\nChecking state '{state.id}'")
-                for spec in self.service_specs:
-                    print(f"  -> trying service '{spec.name}'")
-                    if not self._inputs_available(state, spec):
-                        print("     [skip] inputs not available")
-                        continue
+        log.info("item resumed from checkpoint", extra=fields(restored=len(restored)))
+
+    # ---------------------------------------------------------
+    def _ready(self, state: State, spec: ServiceSpec) -> bool:
+        if not self._inputs_available(state, spec):
+            log.debug("service skipped: inputs not available", extra=fields(service=spec.name))
+            return False
 
-                    if self._already_filled(state, spec):
-                        print(f"     [skip] already filled: {spec.fills}")
+        if self._already_filled(state, spec):
+            log.debug("service skipped: already filled", extra=fields(service=spec.name, fills=spec.fills))
+            return False
+
+        return True
+
+    # ---------------------------------------------------------
+    async def _process_state(self, state: State) -> bool:
+        # une trace par item : les spans des services (et des serveurs appelés) en dépendent
+        with self.tracer.span("item", new_trace=True, attributes={"item.id": state.id}) as span:
+            ok = await self._process_item(state)
+            if not ok:
+                span.set_error(f"failed services: {', '.join(sorted(state.failed))}")
+            return ok
+
+    async def _process_item(self, state: State) -> bool:
+        """
+        Exécute tous les services applicables à un item, pilotés par le graphe :
+        - au départ, on lance tous les services dont les entrées sont prêtes
+        - quand un service termine, on ne réévalue que les services qui
+          dépendent des champs qu'il vient de remplir
+        Les services indépendants tournent en parallèle, la durée d'un item
+        est donc celle de son chemin critique (ex: object_detection -> mesh_3d).
+        Les services prêts sont lancés par coût restant décroissant et attendent
+        leur créneau avec leur marge (0 = sur le chemin critique de l'item) :
+        entre items, un service limité sert d'abord ceux qu'il retarde vraiment.
+        Un service en échec (après ses nouvelles tentatives) est noté dans
+        state.failed et l'historique ; les autres services et items continuent.
+        Un service dont tous les champs sont déjà pris par un service en cours
+        (ex: emotions pendant semantic_bundle) est mis de côté, puis réévalué à
+        chaque fin de service : il ne part que si un champ reste à remplir.
+        Renvoie False si au moins un service a échoué.
+        """
+        # id de corrélation recopié dans tous les logs de cet item (et de ses services)
+        ITEM_ID.set(state.id)
+        t0 = time.monotonic()
+        log.debug("item started")
+
+        if self.resume:
+            self._restore(state)
+        if self.cache is not None:
+            # une seule lecture de l'image par item, avant que ses services ne partent en parallèle
+            await self._ensure_content_digest(state)
+
+        running: Dict[asyncio.Task, ServiceSpec] = {}
+        started = set()
+        deferred: Dict[str, ServiceSpec] = {}
+
+        def launch(candidates: List[ServiceSpec]):
+            ready = [s for s in candidates if s.name not in started and self._ready(state, s)]
+            if not ready:
+                return
+            # services groupés d'abord : ils prennent les champs des services par champ
+            claimed = {f for s in running.values() for f in s.fills}
+            claiming = []
+            for spec in sorted(ready, key=lambda s: -len(s.fills)):
+                pending = [f for f in spec.fills if not state.fields_ready.get(f)]
+                if claimed.issuperset(pending):
+                    deferred[spec.name] = spec
+                    log.debug("service deferred: fields claimed", extra=fields(service=spec.name))
+                    continue
+                deferred.pop(spec.name, None)
+                claimed.update(pending)
+                claiming.append(spec)
+            ready = claiming
+            if not ready:
+                return
+            costs = self._remaining_costs()
+            ready.sort(key=lambda s: -costs[s.name])
+            # durée restante de l'item = plus long chemin parmi les services en cours
+            item_cost = max(costs[s.name] for s in [*ready, *running.values()])
+            for spec in ready:
+                started.add(spec.name)
+                log.debug("service started", extra=fields(service=spec.name, remaining_cost=round(costs[spec.name], 3)))
+                task = asyncio.create_task(self._run_service(state, spec, item_cost - costs[spec.name]))
+                running[task] = spec
+
+        launch(self.graph.specs)
+
+        try:
+            while running:
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    spec = running.pop(task)
+                    if task.exception() is not None:
+                        # échec isolé à ce service : noté dans le checkpoint (un run
+                        # suivant le relancera) ; ses dépendants ne seront pas lancés
+                        state.failed[spec.name] = repr(task.exception())
+                        self._record_history(state, {"service": spec.name, "error": repr(task.exception())})
+                        save_checkpoint(state)
+                        # champs qu'il laissait aux services mis de côté : ils repartent
+                        launch(list(deferred.values()))
                         continue
-                    
-                    print(f"     [RUN] executing service '{spec.name}'")
-                    print(f"     using source: {self._ensure_file(state)}")
-
-                    await self._run_service(state, spec)
-
-                    print(f"     [OK] service '{spec.name}' finished")
-                    print(f"     updated enriched: {state.enriched}")
-                    print(f"     updated fields_ready: {state.fields_ready}")
-                    progress = True
-
-            if not progress:
-                print("\nNo more progress. Stopping loop.\n")
-                break
-
-        
-        print("\n---- FINAL ENRICHMENT ----")
-        manifest = []
-        for st in states:
-            print(f"Assembling enriched data for '{st.id}' ...")
-            enriched = EnrichedData(
-                id=st.id,
-                source_file=st.image_path or st.id,
-                text=st.text,
-                **st.enriched
-            )
-            manifest.append(enriched.model_dump())
 
-        out_manifest = os.path.join(self.processed_dir, "manifest.json")
-        print(f"\nWriting final manifest to: {out_manifest}")
-        with open(out_manifest, "w", encoding="utf-8") as f:
-            json.dump(manifest, f, indent=2)
+                    state.failed.pop(spec.name, None)
+                    save_checkpoint(state)
+                    if log.isEnabledFor(logging.DEBUG):
+                        # dump complet de l'état : coûteux, DEBUG uniquement
+                        log.debug("state updated", extra=fields(
+                            fields_ready=state.fields_ready,
+                            enriched=json.dumps(state.enriched, default=str),
+                        ))
+                    launch([*deferred.values(), *self.graph.triggered_by(spec.fills)])
+        finally:
+            # en cas d'erreur, on n'abandonne pas des tâches en arrière-plan
+            for task in running:
+                task.cancel()
+
+        # service groupé en échec, mais tous ses champs remplis par les services
+        # par champ : l'item est complet (l'erreur reste dans l'historique)
+        recovered = [
+            spec.name for spec in self.graph.specs
+            if spec.name in state.failed and len(spec.fills) > 1 and self._already_filled(state, spec)
+        ]
+        if recovered:
+            for name in recovered:
+                state.failed.pop(name)
+            save_checkpoint(state)
+
+        # l'item est terminé : il part tout de suite dans manifest.jsonl
+        try:
+            self._manifest.write(state)
+        except (ValueError, OSError) as e:
+            # fragment de service hors schéma EnrichedData (ValidationError) ou
+            # écriture impossible : l'item échoue, pas le run
+            state.failed["manifest"] = repr(e)
+            self._record_history(state, {"service": "manifest", "error": repr(e)})
+            save_checkpoint(state)
+
+        log.info("item finished", extra=fields(
+            services=len(started),
+            failed=sorted(state.failed) or None,
+            duration_s=round(time.monotonic() - t0, 3),
+        ))
+        return not state.failed
 
-        print("\n========== ORCHESTRATOR RUN END ==========\n")
+    # ---------------------------------------------------------
+    def _init_service_slots(self):
+        self._service_slots = {}
+        self._batchers = {}
+        for spec in self.service_specs:
+            service = get_service(spec.name)
+            if service.max_concurrency:
+                self._service_slots[spec.name] = PrioritySemaphore(service.max_concurrency)
+            if service.batching:
+                self._batchers[spec.name] = BatchDispatcher(
+                    service,
+                    max_size=service.batch_max_size,
+                    max_wait=service.batch_max_wait,
+                    slot=self._service_slots.get(spec.name),
+                )
+
+    # ---------------------------------------------------------
+    async def _process_all(self) -> int:
+        """
+        Alimente le pipeline depuis _iter_raw avec une fenêtre bornée :
+        au plus max_in_flight items sont en cours, et l'item suivant n'est lu
+        que lorsqu'une place se libère (backpressure). Les premiers résultats
+        arrivent donc immédiatement et la mémoire reste constante, quelle que
+        soit la taille de raw_dir. Les limites par service (_service_slots)
+        protègent les conteneurs GPU de la surcharge.
+        """
+        window = asyncio.Semaphore(self.max_in_flight)
+        pending = set()
+        errors: List[BaseException] = []
+        count = 0
+
+        def on_done(task: asyncio.Task):
+            window.release()
+            pending.discard(task)
+            if task.cancelled():
+                return
+            if task.exception() is not None:
+                # erreur inattendue (hors échec de service) : le run s'arrête
+                errors.append(task.exception())
+            ok = task.exception() is None and task.result() is not False
+            self.progress.item_finished(ok=ok)
+            ITEMS.labels("ok" if ok else "failed").inc()
+
+        raw = self._iter_raw()
+        try:
+            while True:
+                await window.acquire()
+                if errors:
+                    window.release()
+                    raise errors[0]
+                try:
+                    state = await raw.__anext__()
+                except StopAsyncIteration:
+                    window.release()
+                    self.progress.discovery_done = True
+                    break
+
+                log.debug("item loaded", extra=fields(
+                    item=state.id, image_path=state.image_path, item_dir=state.item_dir,
+                ))
+                task = asyncio.create_task(self._process_state(state))
+                pending.add(task)
+                task.add_done_callback(on_done)
+                self.progress.item_discovered()
+                count += 1
+
+            if pending:
+                await asyncio.gather(*list(pending))
+        finally:
+            for task in list(pending):
+                task.cancel()
+            # on attend la fin des items annulés avant que run() ne ferme les sessions
+            await asyncio.gather(*list(pending), return_exceptions=True)
+            await raw.aclose()
+
+        return count
+
+    # ---------------------------------------------------------
+    async def run(self):
+        setup_logging(**LOGGING_CONFIG)
+        log.info("run started", extra=fields(
+            raw_dir=self.raw_dir,
+            processed_dir=self.processed_dir,
+            services=[s.name for s in self.service_specs],
+            max_in_flight=self.max_in_flight,
+        ))
+
+        self._init_service_slots()
+
+        self._manifest.open()
+        self.progress.run_started()
+        try:
+            # sessions HTTP keep-alive ouvertes le temps du run
+            async with service_sessions():
+                try:
+                    count = await self._process_all()
+                finally:
+                    for batcher in self._batchers.values():
+                        await batcher.close()
+        finally:
+            self._manifest.close()
+            self.progress.run_finished()
+            self.tracer.flush()
+
+        log.info("run finished", extra=fields(
+            items=count,
+            manifest=self._manifest.path,
+            elapsed_s=round(self.progress.elapsed(), 3),
+            cache_hits=self.cache.hits if self.cache is not None else None,
+        ))
+
+        if self.finalize_manifest:
+            out_manifest = self._manifest.finalize()
+            log.info("final manifest built", extra=fields(path=out_manifest))
@@ -0,0 +1,88 @@
+import time
+from typing import Any, Dict, Optional
+
+
+class RunProgress:
+    """
+    Compteurs d'avancement d'un run, mis à jour par l'orchestrateur :
+    - items découverts / terminés / en échec
+    - par service : en cours, terminés, en échec
+    snapshot() renvoie un dict sérialisable (API /jobs, flux SSE).
+    """
+
+    def __init__(self):
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.discovery_done = False
+
+        self.items_discovered = 0
+        self.items_done = 0
+        self.items_failed = 0
+        self.services: Dict[str, Dict[str, int]] = {}
+
+    # ---------------------------------------------------------
+    def run_started(self):
+        self.started_at = time.time()
+
+    def run_finished(self):
+        self.finished_at = time.time()
+
+    # ---------------------------------------------------------
+    def item_discovered(self):
+        self.items_discovered += 1
+
+    def item_finished(self, ok: bool = True):
+        if ok:
+            self.items_done += 1
+        else:
+            self.items_failed += 1
+
+    # ---------------------------------------------------------
+    def _service(self, name: str) -> Dict[str, int]:
+        return self.services.setdefault(name, {"running": 0, "done": 0, "failed": 0})
+
+    def service_started(self, name: str):
+        self._service(name)["running"] += 1
+
+    def service_finished(self, name: str, ok: bool = True):
+        counters = self._service(name)
+        counters["running"] -= 1
+        counters["done" if ok else "failed"] += 1
+
+    # ---------------------------------------------------------
+    def elapsed(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    def eta_seconds(self) -> Optional[float]:
+        """
+        Estimation du temps restant au débit observé. Tant que raw_dir n'a pas
+        été entièrement parcouru, c'est une borne basse (items connus seulement).
+        """
+        finished = self.items_done + self.items_failed
+        if self.finished_at is not None:
+            return 0.0
+        if finished == 0:
+            return None
+        rate = finished / max(self.elapsed(), 1e-6)
+        remaining = self.items_discovered - finished
+        return remaining / rate
+
+    # ---------------------------------------------------------
+    def snapshot(self) -> Dict[str, Any]:
+        finished = self.items_done + self.items_failed
+        elapsed = self.elapsed()
+        return {
+            "elapsed_s": round(elapsed, 3),
+            "eta_s": None if self.eta_seconds() is None else round(self.eta_seconds(), 3),
+            "eta_is_lower_bound": not self.discovery_done,
+            "items": {
+                "discovered": self.items_discovered,
+                "in_flight": self.items_discovered - finished,
+                "done": self.items_done,
+                "failed": self.items_failed,
+                "per_second": round(finished / elapsed, 3) if elapsed > 0 else 0.0,
+            },
+            "services": {name: dict(c) for name, c in self.services.items()},
+        }
@@ -0,0 +1,185 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+# marqueur qui remplace <item_dir> dans les fragments stockés :
+# un résultat mis en cache pour un item est rejoué dans le dossier d'un autre
+ITEM_DIR_TOKEN = "{{ITEM_DIR}}"
+
+FRAGMENT_FILE = "fragment.json"
+FILES_DIR = "files"
+
+
+def hash_file(path: str, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def hash_json(data: Any) -> str:
+    raw = json.dumps(data, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _dirs, files in os.walk(path):
+        for f in files:
+            try:
+                total += os.path.getsize(os.path.join(root, f))
+            except OSError:
+                pass
+    return total
+
+
+def _map_strings(value: Any, fn):
+    if isinstance(value, dict):
+        return {k: _map_strings(v, fn) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_map_strings(v, fn) for v in value]
+    if isinstance(value, str):
+        return fn(value)
+    return value
+
+
+class ResultCache:
+    """
+    Cache disque des fragments renvoyés par les services, adressé par contenu.
+
+    Clé = (nom du service, hash du contenu d'entrée, extra, version du service).
+    Une entrée contient le fragment + les fichiers qu'il référence sous
+    <item_dir> (cartes, masques, meshes...). Sur un hit, les fichiers sont
+    recopiés dans le dossier du nouvel item et les chemins réécrits.
+
+    Éviction LRU quand la taille totale dépasse max_bytes.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # clé -> taille, du plus ancien au plus récent
+        self._total = 0
+
+        os.makedirs(root, exist_ok=True)
+        self._load_index()
+
+    # ---------------------------------------------------------
+    @staticmethod
+    def make_key(service: str, input_digest: str, extra: Optional[dict], version: Optional[str]) -> str:
+        return hash_json([service, input_digest, extra or {}, version or ""])
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key)
+
+    # ---------------------------------------------------------
+    def _load_index(self):
+        """Reconstruit l'ordre LRU depuis le disque (mtime des entrées)."""
+        found = []
+        for shard in os.listdir(self.root):
+            shard_dir = os.path.join(self.root, shard)
+            if not os.path.isdir(shard_dir):
+                continue
+            for key in os.listdir(shard_dir):
+                entry = os.path.join(shard_dir, key)
+                if key.endswith(".tmp") or not os.path.isfile(os.path.join(entry, FRAGMENT_FILE)):
+                    # entrée incomplète (crash pendant un put)
+                    shutil.rmtree(entry, ignore_errors=True)
+                    continue
+                found.append((os.path.getmtime(entry), key, _dir_size(entry)))
+
+        for _mtime, key, size in sorted(found):
+            self._entries[key] = size
+            self._total += size
+
+    # ---------------------------------------------------------
+    def get(self, key: str, item_dir: str) -> Optional[Dict[str, Any]]:
+        entry = self._entry_dir(key)
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+
+        try:
+            with open(os.path.join(entry, FRAGMENT_FILE), "r", encoding="utf-8") as f:
+                fragment = json.load(f)
+
+            files_dir = os.path.join(entry, FILES_DIR)
+            if os.path.isdir(files_dir):
+                shutil.copytree(files_dir, item_dir, dirs_exist_ok=True)
+            os.utime(entry, (time.time(), time.time()))
+        except OSError:
+            # entrée supprimée entre-temps → simple miss
+            with self._lock:
+                self._forget(key)
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        item_dir = item_dir.replace("\\", "/")
+        return _map_strings(fragment, lambda s: s.replace(ITEM_DIR_TOKEN, item_dir))
+
+    # ---------------------------------------------------------
+    def put(self, key: str, fragment: Dict[str, Any], item_dir: str):
+        prefix = item_dir.replace("\\", "/").rstrip("/") + "/"
+        artifacts = []
+
+        def relativize(s: str) -> str:
+            norm = s.replace("\\", "/")
+            if norm.startswith(prefix) and os.path.isfile(norm):
+                rel = norm[len(prefix):]
+                artifacts.append(rel)
+                return ITEM_DIR_TOKEN + "/" + rel
+            return s
+
+        stored = _map_strings(fragment, relativize)
+
+        entry = self._entry_dir(key)
+        tmp_entry = f"{entry}.{os.getpid()}.{threading.get_ident()}.tmp"
+        shutil.rmtree(tmp_entry, ignore_errors=True)
+        os.makedirs(tmp_entry)
+
+        for rel in artifacts:
+            dst = os.path.join(tmp_entry, FILES_DIR, rel)
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            shutil.copy2(os.path.join(prefix, rel), dst)
+
+        with open(os.path.join(tmp_entry, FRAGMENT_FILE), "w", encoding="utf-8") as f:
+            json.dump(stored, f, ensure_ascii=False)
+
+        size = _dir_size(tmp_entry)
+        with self._lock:
+            if key in self._entries:
+                # déjà stocké par un autre item pendant ce temps
+                shutil.rmtree(tmp_entry, ignore_errors=True)
+                self._entries.move_to_end(key)
+                return
+            shutil.rmtree(entry, ignore_errors=True)
+            os.replace(tmp_entry, entry)
+            self._entries[key] = size
+            self._total += size
+            self._evict()
+
+    # ---------------------------------------------------------
+    def _forget(self, key: str):
+        size = self._entries.pop(key, None)
+        if size is not None:
+            self._total -= size
+
+    def _evict(self):
+        while self._total > self.max_bytes and len(self._entries) > 1:
+            key, _size = next(iter(self._entries.items()))
+            self._forget(key)
+            shutil.rmtree(self._entry_dir(key), ignore_errors=True)
@@ -0,0 +1,173 @@
+import heapq
+import asyncio
+import itertools
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from services.service_spec import ServiceSpec
+
+# champs "implicites" : needs_image / needs_text sont vus comme des dépendances
+# sur ces champs, pour que le graphe ne manipule que des noms de champs
+IMAGE_FIELD = "visual.base_image"
+TEXT_FIELD = "semantic.base_text"
+
+
+class DependencyGraph:
+    """
+    Graphe de dépendances entre ServiceSpec, construit une seule fois par run.
+
+    - requirements(spec) : champs dont le service a besoin
+    - dependents[champ]  : services à réévaluer quand ce champ devient prêt
+
+    - remaining_costs(estimate) : durée restante du plus long chemin qui
+      part de chaque service (priorité « chemin critique » de l'orchestrateur)
+
+    L'ordre de service_specs est conservé par triggered_by ; l'orchestrateur
+    trie ensuite les services prêts par coût restant décroissant.
+    """
+
+    def __init__(self, specs: Iterable[ServiceSpec]):
+        self.specs: List[ServiceSpec] = list(specs)
+        self.dependents: Dict[str, List[ServiceSpec]] = {}
+        self._order = {s.name: i for i, s in enumerate(self.specs)}
+
+        for spec in self.specs:
+            for fld in self.requirements(spec):
+                self.dependents.setdefault(fld, []).append(spec)
+
+    # ---------------------------------------------------------
+    @staticmethod
+    def requirements(spec: ServiceSpec) -> List[str]:
+        reqs = list(spec.needs_fields)
+        if spec.needs_image:
+            reqs.append(IMAGE_FIELD)
+        if spec.needs_text:
+            reqs.append(TEXT_FIELD)
+        return reqs
+
+    # ---------------------------------------------------------
+    def triggered_by(self, fields: Iterable[str]) -> List[ServiceSpec]:
+        """Services qui dépendent d'au moins un des champs donnés (sans doublon)."""
+        seen = set()
+        triggered = []
+        for fld in fields:
+            for spec in self.dependents.get(fld, []):
+                if spec.name in seen:
+                    continue
+                seen.add(spec.name)
+                triggered.append(spec)
+
+        # remet dans l'ordre de service_specs
+        return sorted(triggered, key=lambda s: self._order[s.name])
+
+    # ---------------------------------------------------------
+    def remaining_costs(self, estimate: Callable[[str], float]) -> Dict[str, float]:
+        """
+        Coût restant de chaque service jusqu'à la fin de l'item : sa propre
+        durée estimée + le plus long chemin parmi les services qu'il déclenche
+        (ex: object_detection → mesh_3d, description → summary → image_generation).
+        """
+        costs: Dict[str, float] = {}
+
+        def cost(spec: ServiceSpec, visiting: frozenset) -> float:
+            if spec.name in costs:
+                return costs[spec.name]
+            downstream = [
+                cost(d, visiting | {spec.name})
+                for d in self.triggered_by(spec.fills)
+                if d.name not in visiting and d.name != spec.name
+            ]
+            costs[spec.name] = estimate(spec.name) + max(downstream, default=0.0)
+            return costs[spec.name]
+
+        for spec in self.specs:
+            cost(spec, frozenset())
+        return costs
+
+
+# ---------------------------------------------------------
+# ESTIMATION DES LATENCES
+# ---------------------------------------------------------
+class LatencyEstimator:
+    """
+    Durée moyenne (EWMA) d'un appel par service, mise à jour à chaque appel
+    réussi. Partagée par tous les runs du process : un nouveau job profite
+    des latences mesurées par les précédents.
+    """
+
+    def __init__(self, default: float = 1.0, alpha: float = 0.2):
+        self.default = default
+        self.alpha = alpha
+        self._values: Dict[str, float] = {}
+        self.version = 0  # incrémenté à chaque mesure (invalide les caches)
+
+    def observe(self, name: str, seconds: float):
+        prev = self._values.get(name)
+        self._values[name] = seconds if prev is None else prev + self.alpha * (seconds - prev)
+        self.version += 1
+
+    def get(self, name: str) -> float:
+        return self._values.get(name, self.default)
+
+    def snapshot(self) -> Dict[str, float]:
+        return {k: round(v, 3) for k, v in self._values.items()}
+
+
+# ---------------------------------------------------------
+# CRÉNEAUX PAR PRIORITÉ
+# ---------------------------------------------------------
+class PrioritySemaphore:
+    """
+    asyncio.Semaphore dont les appelants en attente sont servis par priorité
+    croissante (puis dans l'ordre d'arrivée), au lieu du simple FIFO.
+    `async with` prend un créneau avec la priorité par défaut (0).
+    """
+
+    def __init__(self, value: int = 1):
+        self._value = value
+        self._waiters: List[Tuple[float, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+
+    def locked(self) -> bool:
+        return self._value == 0
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for _, _, f in self._waiters if not f.done())
+
+    async def acquire(self, priority: float = 0.0):
+        if self._value > 0 and not self.waiting:
+            self._value -= 1
+            return True
+
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), fut))
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # créneau accordé pendant l'annulation : on le rend
+                self.release()
+            raise
+        return True
+
+    def try_acquire(self) -> bool:
+        """Créneau libre pris tout de suite, sans doubler les appelants en attente."""
+        if self._value > 0 and not self.waiting:
+            self._value -= 1
+            return True
+        return False
+
+    def release(self):
+        # le créneau passe directement au premier appelant encore en attente
+        while self._waiters:
+            _, _, fut = heapq.heappop(self._waiters)
+            if not fut.done():
+                fut.set_result(None)
+                return
+        self._value += 1
+
+    async def __aenter__(self):
+        await self.acquire()
+
+    async def __aexit__(self, *exc):
+        self.release()
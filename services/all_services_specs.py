@@ -42,6 +42,22 @@ service_specs = [
         fills=["semantic.base_text"], #ce service sert à générer une description textuelle de l'image
         needs_image=True
     ),
+    # un appel LLM pour tous les champs ci-dessous ; chaque service par champ
+    # ne part que si son champ n'est ni rempli ni pris par semantic_bundle
+    ServiceSpec(
+        name="semantic_bundle",
+        fills=[
+            "semantic.emotions",
+            "semantic.key_entities",
+            "semantic.keywords",
+            "semantic.language",
+            "semantic.narrative_type",
+            "semantic.style",
+            "semantic.summary",
+            "semantic.topic_classification",
+        ],
+        needs_text=True
+    ),
     ServiceSpec(
         name="emotions",
         fills=["semantic.emotions"],
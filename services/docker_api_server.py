@@ -1,25 +1,360 @@
 import sys
-from typing import Optional
-from fastapi import FastAPI
+import math
+import time
+import asyncio
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from typing import Callable, List, Optional
+from fastapi import FastAPI, HTTPException, Response
 from pydantic import BaseModel
 import subprocess
 import os
 import json
+import logging
 
 from services.mapping import SERVICE_MAPPING
+from services.log import fields, setup_logging
+from services.tracing import SERVER, TRACE_FILE, Tracer, current_span
+from services.metrics import CONTENT_TYPE, Counter, Gauge, Histogram, render
+
+# mode d'exécution forcé par variable d'environnement :
+#   "inprocess"  : modèle résident (défaut si un model est fourni)
+#   "subprocess" : un script python lancé par requête (comportement historique)
+SERVICE_MODE = os.environ.get("SERVICE_MODE")
+
+# file de travail : nombre d'exécutions simultanées et taille max de la file
+SERVICE_EXEC_SLOTS = os.environ.get("SERVICE_EXEC_SLOTS")
+SERVICE_MAX_QUEUE = os.environ.get("SERVICE_MAX_QUEUE")
+
+# micro-batching (opt-in) : MICROBATCH_MAX_SIZE > 1 active le regroupement
+MICROBATCH_WINDOW_MS = os.environ.get("MICROBATCH_WINDOW_MS")
+MICROBATCH_MAX_SIZE = os.environ.get("MICROBATCH_MAX_SIZE")
+
+log = logging.getLogger("service")
+
+# ---------------------------------------------------------
+# MÉTRIQUES (/metrics, labellisées par service)
+# ---------------------------------------------------------
+REQUESTS = Counter(
+    "service_requests_total", "Requêtes reçues, par endpoint et statut (ok, error, rejected)",
+    ["service", "endpoint", "status"],
+)
+REQUEST_LATENCY = Histogram(
+    "service_request_duration_seconds", "Durée totale d'une requête", ["service", "endpoint"],
+)
+PHASE_LATENCY = Histogram(
+    "service_phase_duration_seconds",
+    "Durée par phase : queue (attente), exec (subprocess ou infer), build_output (lecture des sorties)",
+    ["service", "phase"],
+)
+ERRORS = Counter("service_errors_total", "Erreurs par phase", ["service", "phase"])
+IN_FLIGHT = Gauge("service_in_flight", "Requêtes admises (en attente + en cours)", ["service"])
+QUEUE_DEPTH = Gauge("service_queue_depth", "Requêtes en attente d'exécution", ["service"])
+MICROBATCH_SIZE = Histogram(
+    "service_microbatch_size", "Taille des lots du micro-batcher", ["service"],
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+MICROBATCH_WAIT = Histogram(
+    "service_microbatch_queue_wait_seconds", "Attente d'une requête avant le départ de son lot", ["service"],
+    buckets=(0.001, 0.005, 0.01, 0.02, 0.05, 0.1, 0.25, 0.5, 1, 5),
+)
+
+
+class InProcessModel:
+    """
+    Contrat « modèle résident » pour create_service_app :
+    - load() est appelé UNE fois au démarrage du serveur (poids chargés en mémoire/GPU)
+    - infer(req) est appelé à chaque requête et écrit ses sorties dans
+      req.outdir, exactement comme le script CLI équivalent ; le fragment est
+      ensuite construit depuis SERVICE_MAPPING. infer peut aussi renvoyer
+      directement un fragment (dict).
+    - infer_batch(reqs) traite un lot ; renvoie un résultat par requête,
+      une Exception pour une requête en échec.
+
+    Modèle asynchrone (is_async = True, ex. client HTTP vers un backend LLM) :
+    ainfer / ainfer_batch sont appelés directement sur la boucle, sans thread
+    ni verrou ; la concurrence est bornée par la file de travail (slots).
+    """
+
+    is_async = False
+
+    def load(self):
+        pass
+
+    async def ainfer(self, req):
+        raise NotImplementedError
+
+    async def ainfer_batch(self, reqs):
+        return list(await asyncio.gather(*(self.ainfer(r) for r in reqs), return_exceptions=True))
+
+    def infer(self, req):
+        raise NotImplementedError
+
+    def infer_batch(self, reqs):
+        results = []
+        for req in reqs:
+            try:
+                results.append(self.infer(req))
+            except Exception as e:
+                results.append(e)
+        return results
+
+
+class Overloaded(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__(f"queue full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class WorkQueue:
+    """
+    File de travail explicite d'un service :
+    - `slots` exécutions simultanées au plus (1 par défaut : un GPU)
+    - au-delà, les requêtes attendent, jusqu'à `max_queue` en attente
+    - file pleine → Overloaded (429 + Retry-After côté HTTP)
+
+    Retry-After est estimé depuis la durée moyenne observée d'une requête.
+    """
+
+    def __init__(self, slots: int = 1, max_queue: int = 32):
+        self.slots = max(1, slots)
+        self.max_queue = max_queue
+        self.depth = 0     # requêtes admises (en attente + en cours)
+        self.running = 0
+        self.rejected = 0
+        self._sem = asyncio.Semaphore(self.slots)
+        self._avg_latency: Optional[float] = None
+
+    @property
+    def waiting(self) -> int:
+        return self.depth - self.running
+
+    def retry_after(self) -> int:
+        avg = self._avg_latency or 1.0
+        return max(1, math.ceil(avg * (self.waiting + 1) / self.slots))
+
+    @asynccontextmanager
+    async def admit(self):
+        if self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise Overloaded(self.retry_after())
+        self.depth += 1
+        t0 = time.monotonic()
+        try:
+            yield
+        finally:
+            self.depth -= 1
+            latency = time.monotonic() - t0
+            # moyenne glissante exponentielle
+            self._avg_latency = latency if self._avg_latency is None else 0.8 * self._avg_latency + 0.2 * latency
+
+    @asynccontextmanager
+    async def slot(self):
+        async with self._sem:
+            self.running += 1
+            try:
+                yield
+            finally:
+                self.running -= 1
+
+    def stats(self):
+        return {
+            "slots": self.slots,
+            "max_queue": self.max_queue,
+            "queue_depth": self.waiting,
+            "running": self.running,
+            "rejected": self.rejected,
+        }
+
+
+class MicroBatcher:
+    """
+    Regroupe les requêtes /run qui arrivent dans une fenêtre de window_s
+    (ou jusqu'à max_size) et les exécute en un seul appel à run_batch
+    (un forward pour tout le lot). Chaque appelant reçoit son propre fragment.
+
+    Un seul lot s'exécute à la fois : les requêtes qui arrivent pendant
+    l'inférence forment naturellement le lot suivant.
+    """
+
+    def __init__(self, run_batch: Callable[[list], list], window_s: float, max_size: int, service: str = ""):
+        self.run_batch = run_batch
+        self.window_s = window_s
+        self.max_size = max_size
+
+        self.batch_size = MICROBATCH_SIZE.labels(service)
+        self.queue_wait = MICROBATCH_WAIT.labels(service)
+        # l'attente dans le micro-batcher est la phase "queue" de la requête
+        self.queue_phase = PHASE_LATENCY.labels(service, "queue")
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    # ---------------------------------------------------------
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def submit(self, req):
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((req, fut, time.monotonic()))
+        return await fut
+
+    # ---------------------------------------------------------
+    async def _collect(self):
+        first = await self._queue.get()
+        batch = [first]
+        deadline = first[2] + self.window_s
+
+        while len(batch) < self.max_size:
+            # requêtes déjà en attente (arrivées pendant le lot précédent)
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _loop(self):
+        while True:
+            batch = await self._collect()
+            # requêtes dont le client est parti entre-temps
+            batch = [b for b in batch if not b[1].done()]
+            if not batch:
+                continue
+
+            now = time.monotonic()
+            self.batch_size.observe(len(batch))
+            for _req, _fut, enqueued in batch:
+                self.queue_wait.observe(now - enqueued)
+                self.queue_phase.observe(now - enqueued)
+
+            try:
+                results = list(await asyncio.to_thread(self.run_batch, [b[0] for b in batch]))
+            except Exception as e:
+                results = [{"error": repr(e)}] * len(batch)
+            if len(results) != len(batch):
+                # pas de zip tronqué : aucune requête ne doit rester sans réponse
+                error = f"batch returned {len(results)} results for {len(batch)} requests"
+                results = [{"error": error}] * len(batch)
+
+            for (_req, fut, _t), res in zip(batch, results):
+                if not fut.done():
+                    fut.set_result(res)
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def stats(self):
+        return {
+            "window_ms": self.window_s * 1000,
+            "max_size": self.max_size,
+            "pending": self.pending,
+            "batch_size": self.batch_size.snapshot(),
+            "queue_wait_s": self.queue_wait.snapshot(),
+        }
 
 
-def create_service_app(name, command_builder):
+def create_service_app(
+    name,
+    command_builder=None,
+    batch_command_builder=None,
+    model: Optional[InProcessModel] = None,
+    microbatch: Optional[dict] = None,
+    slots: int = 1,
+    max_queue: int = 32,
+):
     """
     API FastAPI pour un service dockerisé.
     Ce serveur :
-    - exécute une commande locale (subprocess)
+    - exécute le modèle résident (model) ou une commande locale (subprocess)
     - regarde le dossier de sortie outdir
     - récupère les fichiers définis par SERVICE_MAPPING[name]
     - construit un fragment EnrichedData partiel
     - renvoie ce fragment au lieu du stdout brut
+
+    Si model est fourni, il est chargé au démarrage et sert toutes les
+    requêtes ; command_builder reste le repli si le chargement échoue
+    (ou si SERVICE_MODE=subprocess).
+
+    /run_batch traite une liste de requêtes. Si batch_command_builder est
+    fourni, il construit UNE commande pour tout le lot (modèle chargé une
+    seule fois) ; sinon les requêtes sont exécutées une par une.
+
+    microbatch = {"window_ms": 20, "max_size": 8} (ou MICROBATCH_WINDOW_MS /
+    MICROBATCH_MAX_SIZE) regroupe les /run concurrents en lots ; histogrammes
+    de taille de lot et d'attente exposés sur /stats et /metrics.
+
+    slots / max_queue (ou SERVICE_EXEC_SLOTS / SERVICE_MAX_QUEUE) bornent la
+    file de travail : file pleine → 429 + Retry-After. Profondeur sur /health.
     """
-    app = FastAPI(title=name)
+    if model is None and command_builder is None:
+        raise ValueError(f"{name}: model or command_builder is required")
+
+    setup_logging()
+    # spans request / queue / exec / build_output, exportés si TRACE_FILE est défini
+    tracer = Tracer(name, TRACE_FILE)
+
+    microbatch = dict(microbatch or {})
+    if MICROBATCH_WINDOW_MS:
+        microbatch["window_ms"] = float(MICROBATCH_WINDOW_MS)
+    if MICROBATCH_MAX_SIZE:
+        microbatch["max_size"] = int(MICROBATCH_MAX_SIZE)
+
+    work_queue = WorkQueue(
+        slots=int(SERVICE_EXEC_SLOTS) if SERVICE_EXEC_SLOTS else slots,
+        max_queue=int(SERVICE_MAX_QUEUE) if SERVICE_MAX_QUEUE else max_queue,
+    )
+
+    batcher = None
+    # un modèle asynchrone sert déjà les requêtes concurrentes sans micro-batching
+    if microbatch.get("max_size", 1) > 1 and not (model is not None and model.is_async):
+        batcher = MicroBatcher(
+            lambda reqs: process_batch(reqs),
+            window_s=microbatch.get("window_ms", 20) / 1000,
+            max_size=microbatch["max_size"],
+            service=name,
+        )
+
+    # modèle effectivement chargé (None → chemin subprocess)
+    state = {"model": None}
+    # un seul forward à la fois sur le modèle résident (GPU partagé)
+    infer_lock = threading.Lock()
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        if model is not None and SERVICE_MODE != "subprocess":
+            try:
+                model.load()
+                state["model"] = model
+                log.info("model loaded, serving in-process", extra=fields(service=name))
+            except Exception as e:
+                if command_builder is None:
+                    raise
+                log.warning("model load failed, falling back to subprocess", extra=fields(service=name, error=repr(e)))
+
+        if batcher is not None:
+            await batcher.start()
+        try:
+            yield
+        finally:
+            if batcher is not None:
+                await batcher.stop()
+            tracer.flush()
+
+    app = FastAPI(title=name, lifespan=lifespan)
 
     # ---------------------------------------------------------
     # MODEL DE LA REQUÊTE
@@ -28,6 +363,8 @@ def create_service_app(name, command_builder):
         input_path: str
         outdir: str = "output"
         extra: Optional[dict] = None
+        # contexte de trace W3C de l'appelant (services/tracing.py)
+        traceparent: Optional[str] = None
 
     # ---------------------------------------------------------
     # LOADER UTILITAIRES
@@ -196,33 +533,259 @@ def create_service_app(name, command_builder):
         }
 
     # ---------------------------------------------------------
-    # ENDPOINT /run
+    # EXÉCUTION
     # ---------------------------------------------------------
-    @app.post("/run")
-    def run_service(req: RunRequest):
-        # exécute le module python/cli/dialog interne
-        cmd = command_builder(req)
-
+    @contextmanager
+    def timed(phase):
+        t0 = time.monotonic()
+        # span enfant de la requête en cours (aucun hors requête, ex. micro-batcher)
+        span = tracer.start_span(phase) if current_span() is not None else None
+        try:
+            yield
+        except Exception as e:
+            ERRORS.labels(name, phase).inc()
+            if span is not None:
+                span.set_error(repr(e))
+            raise
+        finally:
+            PHASE_LATENCY.labels(name, phase).observe(time.monotonic() - t0)
+            if span is not None:
+                span.end()
+
+    def run_command(cmd):
         # Si le command_builder renvoie une str → on utilise un shell (pour &&, etc.)
         # Si c'est une liste → comportement historique (pose, depth, etc.)
         use_shell = isinstance(cmd, str)
 
-        result = subprocess.run(
-            cmd,
-            stdout=sys.stdout,
-            stderr=sys.stderr,
-            shell=use_shell,
-            check=False,
-        )
-        
+        with timed("exec"):
+            result = subprocess.run(
+                cmd,
+                stdout=sys.stdout,
+                stderr=sys.stderr,
+                shell=use_shell,
+                check=False,
+            )
         if result.returncode != 0:
-            return {"error": result.stderr.strip()}
-        
-        # Normalise les noms de fichiers produits dans outdir
-        normalize_output_files(name, req.outdir)
+            ERRORS.labels(name, "exec").inc()
+        return result.returncode
+
+    def collect_fragment(req):
+        with timed("build_output"):
+            # Normalise les noms de fichiers produits dans outdir
+            normalize_output_files(name, req.outdir)
+
+            # construit le JSON partiel attendu par l'orchestrateur
+            return build_output_dict(name, req.outdir)
+
+    def to_fragment(req, result):
+        if isinstance(result, Exception):
+            ERRORS.labels(name, "exec").inc()
+            return {"error": repr(result)}
+        if isinstance(result, dict):
+            return result
+        return collect_fragment(req)
+
+    def execute(req):
+        loaded = state["model"]
+        if loaded is not None:
+            os.makedirs(req.outdir, exist_ok=True)
+            with infer_lock:
+                try:
+                    with timed("exec"):
+                        result = loaded.infer(req)
+                except Exception as e:
+                    return {"error": repr(e)}
+            return to_fragment(req, result)
 
-        # construit le JSON partiel attendu par l’orchestrateur
-        fragment = build_output_dict(name, req.outdir)
-        return fragment
+        # exécute le module python/cli/dialog interne
+        returncode = run_command(command_builder(req))
+        if returncode != 0:
+            return {"error": f"command exited with code {returncode}"}
+        return collect_fragment(req)
+
+    async def aexecute(req):
+        os.makedirs(req.outdir, exist_ok=True)
+        try:
+            with timed("exec"):
+                result = await state["model"].ainfer(req)
+        except Exception as e:
+            return {"error": repr(e)}
+        return await asyncio.to_thread(to_fragment, req, result)
+
+    def collect_all(reqs, results):
+        results = list(results)
+        if len(results) != len(reqs):
+            # résultats impossibles à rattacher aux requêtes : toutes en erreur
+            error = f"{name}: infer_batch returned {len(results)} results for {len(reqs)} requests"
+            return [{"error": error} for _ in reqs]
+        fragments = []
+        for req, res in zip(reqs, results):
+            try:
+                fragments.append(to_fragment(req, res))
+            except Exception as e:
+                fragments.append({"error": repr(e)})
+        return fragments
+
+    def process_batch(reqs):
+        loaded = state["model"]
+        if loaded is not None:
+            for req in reqs:
+                os.makedirs(req.outdir, exist_ok=True)
+            with infer_lock, timed("exec"):
+                results = loaded.infer_batch(reqs)
+            return collect_all(reqs, results)
+
+        if batch_command_builder is None:
+            return [execute(req) for req in reqs]
+
+        returncode = run_command(batch_command_builder(reqs))
+        if returncode != 0:
+            return [{"error": f"batch command exited with code {returncode}"} for _ in reqs]
+
+        return collect_all(reqs, [None] * len(reqs))
+
+    async def aprocess_batch(reqs):
+        for req in reqs:
+            os.makedirs(req.outdir, exist_ok=True)
+        with timed("exec"):
+            results = await state["model"].ainfer_batch(reqs)
+        return await asyncio.to_thread(collect_all, reqs, results)
+
+    async def call(fn, arg):
+        loaded = state["model"]
+        if loaded is not None and loaded.is_async:
+            return await (aexecute(arg) if fn is execute else aprocess_batch(arg))
+        return await asyncio.to_thread(fn, arg)
+
+    # ---------------------------------------------------------
+    # ADMISSION + MESURES COMMUNES À /run ET /run_batch
+    # ---------------------------------------------------------
+    def overloaded(e: Overloaded):
+        return HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+    def has_error(result) -> bool:
+        if isinstance(result, list):
+            return any(has_error(r) for r in result)
+        return isinstance(result, dict) and "error" in result
+
+    async def handle(endpoint: str, fn, arg):
+        batch = isinstance(arg, list)
+        with tracer.span(
+            f"{name} {endpoint}",
+            # un lot mélange plusieurs traces : il a la sienne, reliée item par item plus bas
+            parent=None if batch else arg.traceparent,
+            kind=SERVER,
+            attributes={"service": name, "batch.size": len(arg) if batch else None},
+        ) as span:
+            result = await handle_traced(endpoint, fn, arg, span)
+
+        if batch:
+            for req in arg:
+                if req.traceparent:
+                    tracer.start_span(
+                        f"{name} {endpoint} item",
+                        parent=req.traceparent,
+                        kind=SERVER,
+                        attributes={"service": name, "batch.trace_id": span.trace_id, "batch.size": len(arg)},
+                        start_ns=span.start_ns,
+                    ).end(span.end_ns)
+        return result
+
+    async def handle_traced(endpoint: str, fn, arg, span):
+        t0 = time.monotonic()
+        queue_s = None
+        try:
+            async with work_queue.admit():
+                with IN_FLIGHT.labels(name).track_inprogress():
+                    if fn is execute and batcher is not None:
+                        # le micro-batcher exécute déjà un lot à la fois
+                        result = await batcher.submit(arg)
+                    else:
+                        async with work_queue.slot():
+                            queue_s = time.monotonic() - t0
+                            PHASE_LATENCY.labels(name, "queue").observe(queue_s)
+                            tracer.start_span("queue", start_ns=span.start_ns).end()
+                            result = await call(fn, arg)
+        except Overloaded as e:
+            REQUESTS.labels(name, endpoint, "rejected").inc()
+            log.warning("request rejected, queue full", extra=fields(
+                service=name, endpoint=endpoint, retry_after=e.retry_after,
+            ))
+            raise overloaded(e)
+        except Exception as e:
+            REQUESTS.labels(name, endpoint, "error").inc()
+            log.exception("request failed", extra=fields(service=name, endpoint=endpoint, error=repr(e)))
+            raise
+
+        duration = time.monotonic() - t0
+        status = "error" if has_error(result) else "ok"
+        if status == "error":
+            span.set_error("error fragment")
+        REQUEST_LATENCY.labels(name, endpoint).observe(duration)
+        REQUESTS.labels(name, endpoint, status).inc()
+        log.info("request done", extra=fields(
+            service=name,
+            endpoint=endpoint,
+            status=status,
+            size=len(arg) if isinstance(arg, list) else None,
+            queue_s=round(queue_s, 3) if queue_s is not None else None,
+            duration_s=round(duration, 3),
+            trace_id=span.trace_id,
+        ))
+        return result
+
+    # ---------------------------------------------------------
+    # ENDPOINT /run
+    # ---------------------------------------------------------
+    @app.post("/run")
+    async def run_service(req: RunRequest):
+        return await handle("/run", execute, req)
+
+    # ---------------------------------------------------------
+    # ENDPOINT /run_batch
+    # ---------------------------------------------------------
+    @app.post("/run_batch")
+    async def run_batch(reqs: List[RunRequest]):
+        """
+        Un fragment par requête, dans le même ordre. Une requête en échec
+        renvoie {"error": ...} sans faire échouer le reste du lot.
+        """
+        return await handle("/run_batch", process_batch, reqs)
+
+    # ---------------------------------------------------------
+    # ENDPOINT /health
+    # ---------------------------------------------------------
+    @app.get("/health")
+    def health():
+        return {
+            "status": "ok",
+            "service": name,
+            **work_queue.stats(),
+        }
+
+    # ---------------------------------------------------------
+    # ENDPOINT /stats
+    # ---------------------------------------------------------
+    @app.get("/stats")
+    def stats():
+        return {
+            "service": name,
+            "mode": "inprocess" if state["model"] is not None else "subprocess",
+            "queue": work_queue.stats(),
+            "microbatch": batcher.stats() if batcher is not None else None,
+        }
+
+    # ---------------------------------------------------------
+    # ENDPOINT /metrics (format texte Prometheus)
+    # ---------------------------------------------------------
+    @app.get("/metrics")
+    def metrics():
+        # avec le micro-batcher, l'attente se fait dans sa file
+        QUEUE_DEPTH.labels(name).set(batcher.pending if batcher is not None else work_queue.waiting)
+        return Response(render(), media_type=CONTENT_TYPE)
 
     return app
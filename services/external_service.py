@@ -1,32 +1,625 @@
+import time
+import random
+import itertools
+from collections import deque
+from contextlib import contextmanager
+import asyncio
+import logging
 import requests
 import aiohttp
+from requests.adapters import HTTPAdapter
 from services.base_service import BaseService
+from services.log import fields
+from services.metrics import Counter, Gauge
 
 #transforms a service call into an external HTTP request to the service URL
 
-class ExternalService(BaseService):
-    def __init__(self, name: str, url: str):
+DEFAULT_TIMEOUT = 300  # secondes
+
+# service saturé (429) : nombre de nouvelles tentatives et attente max entre deux
+OVERLOAD_RETRIES = 10
+MAX_RETRY_AFTER = 30  # secondes
+
+
+def parse_retry_after(value: str | None) -> float:
+    """Retry-After en secondes (la forme date HTTP est ramenée à 1 s)."""
+    try:
+        delay = float(value)
+    except (TypeError, ValueError):
+        delay = 1.0
+    return min(max(delay, 0.0), MAX_RETRY_AFTER)
+
+
+log = logging.getLogger(__name__)
+
+# nouvelles tentatives / disjoncteur (section resilience de services.yml)
+DEFAULT_RETRY = {"attempts": 3, "backoff_ms": 500, "max_backoff_ms": 10000}
+DEFAULT_CIRCUIT_BREAKER = {"failures": 5, "reset_s": 30}
+
+# requêtes dupliquées (section hedge d'un service)
+DEFAULT_HEDGE = {"percentile": 95, "max_ratio": 0.1, "burst": 10, "min_samples": 20, "min_delay_ms": 50}
+
+RETRIES = Counter("orchestrator_service_retries_total", "Nouvelles tentatives d'appel, par service", ["service"])
+REPLICA_HEALTHY = Gauge(
+    "orchestrator_replica_healthy", "Réplique saine (1) ou écartée par la sonde /health (0)", ["service", "replica"],
+)
+HEDGES = Counter(
+    "orchestrator_hedged_requests_total",
+    "Requêtes dupliquées vers une autre réplique, par gagnante (primary, hedge, none = toutes deux en échec)",
+    ["service", "winner"],
+)
+CIRCUIT_OPEN = Gauge("orchestrator_circuit_open", "Disjoncteur ouvert (1) ou fermé (0), par service", ["service"])
+
+
+class CircuitOpen(Exception):
+    """Disjoncteur ouvert : l'appel est refusé sans être envoyé."""
+
+
+class DeadlineExceeded(Exception):
+    """Plus de temps pour un nouvel essai avant l'échéance de l'appel."""
+
+
+class ServiceError(Exception):
+    """Le service a répondu, mais avec un fragment {"error": ...}."""
+
+
+def check_fragment(name: str, result):
+    """Lève ServiceError si le service a répondu par un fragment d'erreur."""
+    if isinstance(result, dict) and "error" in result:
+        raise ServiceError(f"{name}: {result['error']}")
+    return result
+
+
+def is_retryable(e: BaseException) -> bool:
+    """
+    Erreur réseau, timeout ou 5xx : le service peut répondre au prochain essai.
+    Fragment {"error": ...} (ServiceError) : relancé aussi ; les services
+    renvoient ainsi leurs pannes (process ou modèle en échec) avec un 200.
+    """
+    if isinstance(e, ServiceError):
+        return True
+    if isinstance(e, aiohttp.ClientResponseError):
+        return e.status >= 500
+    if isinstance(e, requests.HTTPError):
+        return e.response is not None and e.response.status_code >= 500
+    return isinstance(e, (
+        asyncio.TimeoutError, aiohttp.ClientError, requests.ConnectionError, requests.Timeout,
+    ))
+
+
+# ---------------------------------------------------------
+# DISJONCTEUR
+# ---------------------------------------------------------
+class CircuitBreaker:
+    """
+    closed → open après `failures` échecs consécutifs (erreurs réseau, timeouts, 5xx).
+    open : tout appel est refusé (CircuitOpen) pendant reset_s secondes.
+    half_open ensuite : un seul appel d'essai passe ; succès → closed, échec → open.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name: str, failures: int = 5, reset_s: float = 30.0):
         self.name = name
+        self.failures = max(1, int(failures))
+        self.reset_s = float(reset_s)
+        self.consecutive = 0
+        self.opened_at: float | None = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self.opened_at < self.reset_s:
+            return self.OPEN
+        return self.HALF_OPEN
+
+    def retry_in(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.reset_s - (time.monotonic() - self.opened_at))
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self):
+        if self.opened_at is not None:
+            log.info("circuit closed", extra=fields(service=self.name))
+            CIRCUIT_OPEN.labels(self.name).set(0)
+        self.consecutive = 0
+        self.opened_at = None
+        self._probing = False
+
+    def abandon(self):
+        # appel d'essai annulé avant sa réponse : un autre pourra le remplacer
+        self._probing = False
+
+    def record_failure(self):
+        self.consecutive += 1
+        if self._probing or (self.opened_at is None and self.consecutive >= self.failures):
+            log.warning("circuit opened", extra=fields(
+                service=self.name, failures=self.consecutive, reset_s=self.reset_s,
+            ))
+            CIRCUIT_OPEN.labels(self.name).set(1)
+            self.opened_at = time.monotonic()
+        self._probing = False
+
+
+# ---------------------------------------------------------
+# HEDGING
+# ---------------------------------------------------------
+class HedgePolicy:
+    """
+    Quand dupliquer un appel : après le percentile observé (p95 par défaut)
+    des dernières durées d'appel, et dans la limite d'un budget (seau de
+    jetons : chaque appel rapporte max_ratio jeton, un doublon en coûte un,
+    au plus `burst` en réserve).
+    """
+
+    def __init__(self, percentile: float = 95, max_ratio: float = 0.1, burst: float = 10,
+                 min_samples: int = 20, min_delay_ms: float = 50, window: int = 256):
+        self.percentile = percentile
+        self.max_ratio = max_ratio
+        self.burst = burst
+        self.min_samples = min_samples
+        self.min_delay = min_delay_ms / 1000
+        self.durations: deque = deque(maxlen=window)
+        self.tokens = burst
+
+    def observe(self, seconds: float):
+        self.durations.append(seconds)
+
+    def delay(self) -> float | None:
+        """Attente avant le doublon, None tant qu'il n'y a pas assez de mesures."""
+        if len(self.durations) < self.min_samples:
+            return None
+        ordered = sorted(self.durations)
+        k = min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))
+        return max(self.min_delay, ordered[k])
+
+    def earn(self):
+        self.tokens = min(self.burst, self.tokens + self.max_ratio)
+
+    def spend(self) -> bool:
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+# ---------------------------------------------------------
+# RÉPLIQUES
+# ---------------------------------------------------------
+def default_batch_url(url: str) -> str:
+    # http://host:8080/run -> http://host:8080/run_batch
+    if url.endswith("/run"):
+        return url + "_batch"
+    return url.rstrip("/") + "/run_batch"
+
+
+def health_url(url: str) -> str:
+    # http://host:8080/run -> http://host:8080/health
+    base = url[: -len("/run")] if url.endswith("/run") else url.rstrip("/")
+    return base + "/health"
+
+
+class Replica:
+    def __init__(self, url: str, batch_url: str | None = None):
         self.url = url
+        self.batch_url = batch_url or default_batch_url(url)
+        self.health_url = health_url(url)
+        self.in_flight = 0
+        self.healthy = True
+        self.last_pick = 0
+
+
+class ReplicaPool:
+    """
+    Répliques d'un service. Chaque appel va à la réplique saine qui a le moins
+    de requêtes en cours (à égalité, la moins récemment choisie). Si aucune
+    n'est saine, toutes redeviennent candidates : c'est alors au disjoncteur
+    de couper les appels.
+    """
 
-    def run(self, input_path: str, outdir: str = "output", extra: dict | None = None):
+    def __init__(self, urls: list[str], batch_url: str | None = None):
+        self.replicas: list[Replica] = []
+        self.batch_url: str | None = None
+        self._picks = itertools.count(1)
+        self.set_urls(urls, batch_url)
+
+    def set_urls(self, urls: list[str], batch_url: str | None = None):
+        """Remplace la liste des répliques ; celles qui restent gardent leur état."""
+        # URL /run_batch imposée (batch.url de services.yml), sinon dérivée de chaque réplique
+        self.batch_url = batch_url
+        existing = {r.url: r for r in self.replicas}
+        replicas = []
+        for url in dict.fromkeys(urls):
+            replica = existing.get(url) or Replica(url)
+            replica.batch_url = batch_url or default_batch_url(url)
+            replicas.append(replica)
+        if not replicas:
+            raise ValueError("a service needs at least one replica url")
+        self.replicas = replicas
+
+    def pick(self, exclude: Replica | None = None) -> Replica:
+        others = [r for r in self.replicas if r is not exclude] or self.replicas
+        candidates = [r for r in others if r.healthy] or others
+        best = min(candidates, key=lambda r: (r.in_flight, r.last_pick))
+        best.last_pick = next(self._picks)
+        return best
+
+    @contextmanager
+    def track(self, replica: Replica):
+        replica.in_flight += 1
+        try:
+            yield replica
+        finally:
+            replica.in_flight -= 1
+
+    def snapshot(self) -> list[dict]:
+        return [{"url": r.url, "healthy": r.healthy, "in_flight": r.in_flight} for r in self.replicas]
+
+
+class ExternalService(BaseService):
+    def __init__(
+        self,
+        name: str,
+        url: str | list[str],
+        max_concurrency: int | None = None,
+        version: str | None = None,
+        timeout: float | None = None,
+        batch: dict | None = None,
+        retry: dict | None = None,
+        circuit_breaker: dict | None = None,
+        deadline: float | None = None,
+        replicas: list[str] | None = None,
+        hedge: dict | None = None,
+    ):
+        self.name = name
+        # répliques du service (url peut déjà être une liste) :
+        # chaque appel va à la moins chargée, voir ReplicaPool
+        urls = ([url] if isinstance(url, str) else list(url)) + list(replicas or [])
+        self.pool = ReplicaPool(urls, (batch or {}).get("url"))
+        # tag modèle/version : fait partie de la clé du cache de résultats
+        self.version = version
+        # nombre max d'appels simultanés (None = pas de limite),
+        # respecté par l'orchestrateur
+        self.max_concurrency = max_concurrency
+        # timeout d'un essai (services.yml) ; deadline : tous essais compris (None = sans)
+        self.timeout = timeout or DEFAULT_TIMEOUT
+        self.deadline = deadline
+
+        # nouvelles tentatives avec attente exponentielle à jitter complet
+        retry = {**DEFAULT_RETRY, **(retry or {})}
+        self.attempts = max(1, int(retry["attempts"]))
+        self.backoff = retry["backoff_ms"] / 1000
+        self.max_backoff = retry["max_backoff_ms"] / 1000
+
+        self.breaker = CircuitBreaker(name, **{**DEFAULT_CIRCUIT_BREAKER, **(circuit_breaker or {})})
+
+        # doublon vers une autre réplique si la réponse tarde (désactivé si hedge absent)
+        self.hedge = HedgePolicy(**{**DEFAULT_HEDGE, **hedge}) if hedge else None
+
+        # envoi groupé vers /run_batch (désactivé si batch absent de services.yml)
+        batch = batch or {}
+        self.batch_max_size = batch.get("max_size")
+        self.batch_max_wait = batch.get("max_wait_ms", 50) / 1000
+
+        # sessions HTTP longue durée (keep-alive), voir open() / close()
+        self._session: aiohttp.ClientSession | None = None
+        self._sync_session: requests.Session | None = None
+
+    @property
+    def url(self) -> str:
+        # première réplique (compatibilité : un service = une URL)
+        return self.pool.replicas[0].url
+
+    @property
+    def batch_url(self) -> str:
+        return self.pool.replicas[0].batch_url
+
+    def reconfigure(self, other: "ExternalService"):
+        """
+        Reprend la configuration de `other` (services.yml rechargé) sans perdre
+        l'état courant : sessions, requêtes en cours, disjoncteur, mesures de hedging.
+        """
+        self.pool.set_urls([r.url for r in other.pool.replicas], other.pool.batch_url)
+        for attr in (
+            "version", "max_concurrency", "timeout", "deadline", "attempts",
+            "backoff", "max_backoff", "batch_max_size", "batch_max_wait",
+        ):
+            setattr(self, attr, getattr(other, attr))
+        self.breaker.failures = other.breaker.failures
+        self.breaker.reset_s = other.breaker.reset_s
+        if other.hedge is None or self.hedge is None:
+            self.hedge = other.hedge
+        else:
+            for attr in ("percentile", "max_ratio", "burst", "min_samples", "min_delay"):
+                setattr(self.hedge, attr, getattr(other.hedge, attr))
+
+    @property
+    def batching(self) -> bool:
+        return bool(self.batch_max_size and self.batch_max_size > 1)
+
+    # ---------------------------------------------------------
+    # CYCLE DE VIE DES SESSIONS
+    # ---------------------------------------------------------
+    async def open(self, connector: aiohttp.BaseConnector | None = None):
+        """
+        Ouvre la session asynchrone du service. Le connecteur (pool TCP,
+        keep-alive, cache DNS) est en général partagé par tout le registre.
+        """
+        if self._session is not None and not self._session.closed:
+            return
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            connector_owner=connector is None,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        )
+
+    async def probe(self, timeout: float = 2.0):
+        """
+        Sonde GET /health de chaque réplique : une réplique qui ne répond pas
+        200 est écartée du routage jusqu'à la prochaine sonde réussie.
+        """
+        if self._session is None or self._session.closed:
+            return
+
+        async def check(replica: Replica):
+            try:
+                async with self._session.get(
+                    replica.health_url, timeout=aiohttp.ClientTimeout(total=timeout),
+                ) as r:
+                    healthy = r.status == 200
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                healthy = False
+            if healthy != replica.healthy:
+                log.warning("replica restored" if healthy else "replica ejected", extra=fields(
+                    service=self.name, replica=replica.url,
+                ))
+            replica.healthy = healthy
+            REPLICA_HEALTHY.labels(self.name, replica.url).set(1 if healthy else 0)
+
+        await asyncio.gather(*(check(r) for r in self.pool.replicas))
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        if self._sync_session is not None:
+            self._sync_session.close()
+            self._sync_session = None
+
+    def _get_sync_session(self) -> requests.Session:
+        if self._sync_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_concurrency or 10)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self._sync_session = session
+        return self._sync_session
+
+    # ---------------------------------------------------------
+    def run(self, input_path: str, outdir: str = "output", extra: dict | None = None, traceparent: str | None = None):
         payload = {
             "input_path": input_path,
             "outdir": outdir,
             "extra": extra,
+            "traceparent": traceparent,
         }
-        r = requests.post(self.url, json=payload, timeout=60)
-        r.raise_for_status()
-        return r.json()
-    
-    async def arun(self, input_path: str, outdir: str = "output", extra: dict | None = None):
+        headers = {"traceparent": traceparent} if traceparent else None
+        session = self._get_sync_session()
+
+        def post(url, timeout):
+            for attempt in range(OVERLOAD_RETRIES + 1):
+                r = session.post(url, json=payload, headers=headers, timeout=timeout)
+                if r.status_code != 429 or attempt == OVERLOAD_RETRIES:
+                    break
+                # service saturé : on attend le délai qu'il demande
+                time.sleep(parse_retry_after(r.headers.get("Retry-After")))
+            r.raise_for_status()
+            return r.json()
+
+        deadline = time.monotonic() + self.deadline if self.deadline else None
+        for attempt in range(self.attempts):
+            timeout = self._attempt_timeout(deadline)
+            try:
+                replica = self.pool.pick()
+                with self.pool.track(replica):
+                    result = check_fragment(self.name, post(replica.url, timeout))
+            except Exception as e:
+                delay = self._on_failure(e, attempt, deadline)
+                time.sleep(delay)
+                continue
+            self.breaker.record_success()
+            return result
+
+    # ---------------------------------------------------------
+    # NOUVELLES TENTATIVES / ÉCHÉANCE / DISJONCTEUR
+    # ---------------------------------------------------------
+    def _attempt_timeout(self, deadline: float | None) -> float:
+        """Timeout de l'essai suivant ; lève CircuitOpen / DeadlineExceeded si on ne doit pas l'envoyer."""
+        # échéance d'abord : allow() réserve l'appel d'essai d'un disjoncteur
+        # à demi ouvert, qui doit ensuite partir pour être compté
+        remaining = deadline - time.monotonic() if deadline is not None else None
+        if remaining is not None and remaining <= 0:
+            raise DeadlineExceeded(f"{self.name}: deadline of {self.deadline}s exceeded")
+        if not self.breaker.allow():
+            raise CircuitOpen(f"{self.name}: circuit open, retry in {self.breaker.retry_in():.0f}s")
+        return self.timeout if remaining is None else min(self.timeout, remaining)
+
+    def _on_failure(self, e: Exception, attempt: int, deadline: float | None) -> float:
+        """
+        Comptabilise l'échec d'un essai et renvoie l'attente avant le suivant,
+        ou relève l'erreur si elle est définitive / s'il ne reste ni essai ni temps.
+        """
+        if not is_retryable(e):
+            # le service a répondu (4xx...) : il est joignable
+            self.breaker.record_success()
+            raise e
+        self.breaker.record_failure()
+
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        out_of_time = deadline is not None and time.monotonic() + delay >= deadline
+        if attempt + 1 >= self.attempts or out_of_time or self.breaker.state == CircuitBreaker.OPEN:
+            raise e
+
+        RETRIES.labels(self.name).inc()
+        log.warning("service call failed, retrying", extra=fields(
+            service=self.name, attempt=attempt + 1, delay_s=round(delay, 3), error=repr(e),
+        ))
+        return delay
+
+    async def _acall(self, payload, batch: bool = False, headers: dict | None = None, slot=None):
+        deadline = time.monotonic() + self.deadline if self.deadline else None
+        for attempt in range(self.attempts):
+            timeout = self._attempt_timeout(deadline)
+            try:
+                # couvre aussi les attentes sur 429 de _post
+                if self.hedge is not None and not batch:
+                    call = self._ahedged(payload, headers, slot)
+                else:
+                    call = self._apost_to(self.pool.pick(), payload, headers, batch)
+                result = await asyncio.wait_for(call, timeout)
+                if not batch:
+                    # échec signalé dans un 200 : compté par le disjoncteur, relancé
+                    # (les erreurs par item d'un lot restent dans la liste renvoyée)
+                    check_fragment(self.name, result)
+            except asyncio.CancelledError:
+                self.breaker.abandon()
+                raise
+            except Exception as e:
+                delay = self._on_failure(e, attempt, deadline)
+                await asyncio.sleep(delay)
+                continue
+            self.breaker.record_success()
+            return result
+
+    async def _post(self, session: aiohttp.ClientSession, payload, url: str, headers: dict | None = None):
+        for attempt in range(OVERLOAD_RETRIES + 1):
+            async with session.post(url, json=payload, headers=headers) as r:
+                if r.status != 429 or attempt == OVERLOAD_RETRIES:
+                    r.raise_for_status()
+                    return await r.json()
+                delay = parse_retry_after(r.headers.get("Retry-After"))
+            # service saturé : on attend le délai qu'il demande
+            await asyncio.sleep(delay)
+
+    async def _apost(self, payload, url: str, headers: dict | None = None):
+        if self._session is None or self._session.closed:
+            # appel hors cycle de vie de l'orchestrateur : session jetable
+            async with aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            ) as session:
+                return await self._post(session, payload, url, headers)
+
+        return await self._post(self._session, payload, url, headers)
+
+    async def _apost_to(self, replica: Replica, payload, headers: dict | None = None, batch: bool = False):
+        with self.pool.track(replica):
+            return await self._apost(payload, replica.batch_url if batch else replica.url, headers)
+
+    async def _ahedged(self, payload: dict, headers: dict | None = None, slot=None):
+        """
+        Envoie l'appel ; s'il n'a pas répondu après le délai de la politique de
+        hedging (et si le budget le permet), envoie un doublon vers une autre
+        réplique. La première réponse réussie gagne, l'autre requête est annulée.
+        Le doublon écrit dans <outdir>_hedge pour ne pas se mélanger au premier.
+
+        Pas de doublon sans autre réplique (il chargerait le même conteneur),
+        ni sans créneau libre dans `slot` (max_concurrency de l'orchestrateur) :
+        le doublon occupe ce créneau jusqu'à sa fin.
+        """
+        policy = self.hedge
+        policy.earn()
+        t0 = time.monotonic()
+        first = self.pool.pick()
+
+        async def post(replica: Replica, body: dict):
+            # un fragment d'erreur ne gagne pas la course : l'autre requête continue
+            return check_fragment(self.name, await self._apost_to(replica, body, headers))
+
+        primary = asyncio.ensure_future(post(first, payload))
+        tasks = {primary: "primary"}
+        try:
+            delay = policy.delay()
+            if delay is not None:
+                await asyncio.wait({primary}, timeout=delay)
+            second = self._hedge_replica(first, slot) if delay is not None and not primary.done() else None
+            if second is None:
+                result = await primary
+                policy.observe(time.monotonic() - t0)
+                return result
+
+            hedge_payload = {**payload, "outdir": payload["outdir"].rstrip("/\\") + "_hedge"}
+            hedge = asyncio.ensure_future(post(second, hedge_payload))
+            if slot is not None:
+                hedge.add_done_callback(lambda _: slot.release())
+            tasks[hedge] = "hedge"
+            pending = set(tasks)
+            first_error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        HEDGES.labels(self.name, tasks[task]).inc()
+                        policy.observe(time.monotonic() - t0)
+                        return task.result()
+                    first_error = first_error or task.exception()
+            HEDGES.labels(self.name, "none").inc()
+            raise first_error
+        finally:
+            # la perdante (ou tout ce qui reste si on est annulé) est annulée
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def _hedge_replica(self, first: Replica, slot=None) -> Replica | None:
+        """Réplique du doublon (créneau de `slot` pris), ou None s'il ne doit pas partir."""
+        second = self.pool.pick(exclude=first)
+        if second is first:
+            return None
+        if slot is not None and not slot.try_acquire():
+            # service déjà à max_concurrency, ou des appels attendent leur créneau
+            return None
+        if not self.hedge.spend():
+            if slot is not None:
+                slot.release()
+            return None
+        return second
+
+    async def arun(
+        self, input_path: str, outdir: str = "output", extra: dict | None = None,
+        traceparent: str | None = None, slot=None,
+    ):
+        """
+        slot : créneaux max_concurrency du service (PrioritySemaphore de
+        l'orchestrateur), dont un doublon de hedging doit prendre un créneau libre.
+        """
         payload = {
             "input_path": input_path,
             "outdir": outdir,
             "extra": extra,
+            # contexte de trace W3C (services/tracing.py), aussi en en-tête HTTP
+            "traceparent": traceparent,
         }
+        headers = {"traceparent": traceparent} if traceparent else None
+
+        return await self._acall(payload, headers=headers, slot=slot)
 
-        async with aiohttp.ClientSession() as session:
-            async with session.post(self.url, json=payload, timeout=300) as r:
-                r.raise_for_status()
-                return await r.json()
\ No newline at end of file
+    async def arun_batch(self, requests_: list[dict]) -> list[dict]:
+        """
+        Envoie une liste de {input_path, outdir, extra, traceparent} à /run_batch,
+        renvoie un fragment par requête (même ordre).
+        """
+        results = await self._acall(requests_, batch=True)
+        if not isinstance(results, list) or len(results) != len(requests_):
+            raise ValueError(f"{self.name}: /run_batch returned {len(results)} results for {len(requests_)} requests")
+        return results
@@ -0,0 +1,90 @@
+import os
+import sys
+import json
+import time
+import logging
+import contextvars
+from typing import Any, Dict, Optional
+
+# Logging commun orchestrateur + services (copié dans les images des services).
+#
+# - niveau : LOG_LEVEL (DEBUG, INFO, ...), INFO par défaut
+# - format : LOG_FORMAT = "text" (défaut) ou "json" (une ligne JSON par événement)
+# - id d'item de corrélation : ITEM_ID, posé par l'orchestrateur pour chaque item
+#   et recopié automatiquement dans chaque ligne de log émise dans ce contexte
+# - champs structurés : log.info("service finished", extra=fields(service=..., duration_s=...))
+
+ITEM_ID: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("item_id", default=None)
+
+_configured = False
+
+
+def fields(**kwargs) -> Dict[str, Any]:
+    """Champs structurés d'un événement, à passer en extra=."""
+    return {"fields": kwargs}
+
+
+def _present(record: logging.LogRecord) -> Dict[str, Any]:
+    # les champs à None sont omis
+    return {k: v for k, v in (getattr(record, "fields", None) or {}).items() if v is not None}
+
+
+class _ContextFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "item_id"):
+            record.item_id = ITEM_ID.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "item_id", None):
+            data["item_id"] = record.item_id
+        data.update(_present(record))
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        ts = time.strftime("%H:%M:%S", time.localtime(record.created))
+        line = f"{ts} {record.levelname:<7} {record.name}"
+        if getattr(record, "item_id", None):
+            line += f" [{record.item_id}]"
+        line += f" {record.getMessage()}"
+        extra = _present(record)
+        if extra:
+            line += " " + " ".join(f"{k}={v}" for k, v in extra.items())
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+def setup_logging(level: Optional[str] = None, format: Optional[str] = None):
+    """
+    Configure le logger racine (une seule fois, appelé par main.py, run()
+    et create_service_app). Les variables d'environnement LOG_LEVEL /
+    LOG_FORMAT priment sur les arguments (services.yml).
+    """
+    global _configured
+    if _configured:
+        return
+    _configured = True
+
+    level = os.environ.get("LOG_LEVEL") or level or "INFO"
+    format = os.environ.get("LOG_FORMAT") or format or "text"
+
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(JsonFormatter() if format == "json" else TextFormatter())
+    handler.addFilter(_ContextFilter())
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(level.upper())
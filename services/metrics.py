@@ -0,0 +1,206 @@
+import math
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Métriques au format texte Prometheus (exposition 0.0.4), sans dépendance :
+# ce module est copié tel quel dans les images des services.
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# bornes par défaut des histogrammes de latence, en secondes
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+def _fmt(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels_text(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    inner = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+    return "{" + inner + "}"
+
+
+# ---------------------------------------------------------
+# VALEURS (une par combinaison de labels)
+# ---------------------------------------------------------
+class _CounterValue:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def samples(self):
+        yield "", {}, self.value
+
+
+class _GaugeValue(_CounterValue):
+    def dec(self, amount: float = 1.0):
+        self.inc(-amount)
+
+    def set(self, value: float):
+        with self._lock:
+            self.value = value
+
+    @contextmanager
+    def track_inprogress(self):
+        self.inc()
+        try:
+            yield
+        finally:
+            self.dec()
+
+
+class _HistogramValue:
+    def __init__(self, buckets: Iterable[float]):
+        self._lock = threading.Lock()
+        self.buckets = sorted(buckets)
+        # compteurs NON cumulés par intervalle ; le dernier = au-delà de la plus grande borne
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        with self._lock:
+            self.count += 1
+            self.sum += value
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+                    break
+            else:
+                self.counts[-1] += 1
+
+    def cumulative(self) -> List[Tuple[float, int]]:
+        out, acc = [], 0
+        for bound, c in zip(self.buckets + [math.inf], self.counts):
+            acc += c
+            out.append((bound, acc))
+        return out
+
+    def snapshot(self) -> dict:
+        """Vue JSON (endpoint /stats) : compteurs cumulés par borne."""
+        return {
+            "buckets": {_fmt(b): c for b, c in self.cumulative()[:-1]},
+            "count": self.count,
+            "sum": round(self.sum, 3),
+            "mean": round(self.sum / self.count, 3) if self.count else None,
+        }
+
+    def samples(self):
+        for bound, c in self.cumulative():
+            yield "_bucket", {"le": _fmt(bound)}, c
+        yield "_count", {}, self.count
+        yield "_sum", {}, self.sum
+
+
+# ---------------------------------------------------------
+# MÉTRIQUES
+# ---------------------------------------------------------
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, "_Metric"] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: "_Metric"):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"metric '{metric.name}' already registered")
+            self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for suffix, labels, value in metric.samples():
+                lines.append(f"{metric.name}{suffix}{_labels_text(labels)} {_fmt(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    type = ""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        registry: Optional[Registry] = REGISTRY,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[tuple, object] = {}
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def _new_value(self):
+        raise NotImplementedError
+
+    def labels(self, *values, **kwargs):
+        if kwargs:
+            values = tuple(kwargs[n] for n in self.labelnames)
+        values = tuple(str(v) for v in values)
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name}: expected labels {self.labelnames}")
+        with self._lock:
+            child = self._children.get(values)
+            if child is None:
+                child = self._children[values] = self._new_value()
+            return child
+
+    def samples(self):
+        with self._lock:
+            children = list(self._children.items())
+        for values, child in children:
+            base = dict(zip(self.labelnames, values))
+            for suffix, extra, value in child.samples():
+                yield suffix, {**base, **extra}, value
+
+
+class Counter(_Metric):
+    # par convention le nom d'un compteur se termine par _total
+    type = "counter"
+
+    def _new_value(self):
+        return _CounterValue()
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def _new_value(self):
+        return _GaugeValue()
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS, registry=REGISTRY):
+        self.buckets = tuple(buckets)
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_value(self):
+        return _HistogramValue(self.buckets)
+
+
+def render(registry: Registry = REGISTRY) -> str:
+    return registry.render()
@@ -1,30 +1,230 @@
 import os
 import yaml
+import asyncio
+import logging
+import aiohttp
+from contextlib import asynccontextmanager
 from string import Template
 from services.external_service import ExternalService
+from services.log import fields
 
 #is used to load services.yml and create service instances and tell where they are located
 CONFIG_PATH = "./config/services.yml"
 
+log = logging.getLogger(__name__)
+
+
+# variables ajoutées après coup : valeur par défaut pour que les .env
+# existants restent valides (les autres ${VAR} restent obligatoires)
+CONFIG_DEFAULTS = {
+    "SEMANTIC_BUNDLE_CONTAINER_NAME": "semantic_bundle",
+}
+
 
 def load_service_config(path=CONFIG_PATH):
     """Charge services.yml et remplace les variables d'environnement (${VAR})."""
     with open(path, "r", encoding="utf-8") as f:
         raw = f.read()
-        substituted = Template(raw).substitute(os.environ)
+        substituted = Template(raw).substitute({**CONFIG_DEFAULTS, **os.environ})
     return yaml.safe_load(substituted)
 
 
 SERVICE_CONFIG = load_service_config()
 
-service_registry = {
-    name: ExternalService(name, conf["url"])
-    for name, conf in SERVICE_CONFIG.get("services", {}).items()
-}
+# réglages globaux de l'orchestrateur (section "orchestrator" de services.yml)
+ORCHESTRATOR_CONFIG = SERVICE_CONFIG.get("orchestrator") or {}
+
+# réglages du pool de connexions HTTP partagé (section "http" de services.yml)
+HTTP_CONFIG = SERVICE_CONFIG.get("http") or {}
+
+# niveau / format des logs (section "logging" de services.yml)
+LOGGING_CONFIG = SERVICE_CONFIG.get("logging") or {}
+
+# export des traces (section "tracing" de services.yml)
+TRACING_CONFIG = SERVICE_CONFIG.get("tracing") or {}
+
+# nouvelles tentatives / disjoncteur par défaut (section "resilience"),
+# surchargeables service par service
+RESILIENCE_CONFIG = SERVICE_CONFIG.get("resilience") or {}
+
+# sonde /health des répliques et rechargement à chaud (section "registry")
+REGISTRY_CONFIG = SERVICE_CONFIG.get("registry") or {}
+
+
+def build_service(name: str, conf: dict, resilience: dict) -> ExternalService:
+    def merged(key: str) -> dict:
+        return {**(resilience.get(key) or {}), **(conf.get(key) or {})}
+
+    return ExternalService(
+        name,
+        conf["url"],
+        max_concurrency=conf.get("max_concurrency"),
+        version=conf.get("version"),
+        timeout=conf.get("timeout"),
+        batch=conf.get("batch"),
+        retry=merged("retry"),
+        circuit_breaker=merged("circuit_breaker"),
+        deadline=conf.get("deadline", resilience.get("deadline")),
+        replicas=conf.get("replicas"),
+        hedge=conf.get("hedge"),
+    )
+
+
+def build_registry(config: dict) -> dict:
+    resilience = config.get("resilience") or {}
+    return {
+        name: build_service(name, conf, resilience)
+        for name, conf in (config.get("services") or {}).items()
+    }
+
+
+service_registry = build_registry(SERVICE_CONFIG)
 
 
 def get_service(name: str):
     service = service_registry.get(name)
     if service:
         return service
-    raise ValueError(f"Service '{name}' non trouvé ou désactivé")
\ No newline at end of file
+    raise ValueError(f"Service '{name}' non trouvé ou désactivé")
+
+
+# ---------------------------------------------------------
+# RECHARGEMENT À CHAUD
+# ---------------------------------------------------------
+_config_mtime = os.path.getmtime(CONFIG_PATH) if os.path.exists(CONFIG_PATH) else None
+
+
+async def reload_registry(path: str = CONFIG_PATH) -> bool:
+    """
+    Relit la section services de services.yml et met le registre à jour en
+    place : les services existants gardent sessions, requêtes en cours et
+    disjoncteur (reconfigure), les nouveaux sont ouverts, les retirés fermés.
+    Les autres sections (orchestrator, http, logging...) demandent un redémarrage.
+    Un fichier invalide est ignoré : le registre courant reste en service.
+    """
+    try:
+        config = load_service_config(path)
+        fresh = build_registry(config)
+    except Exception as e:
+        log.error("services.yml reload failed, keeping current registry", extra=fields(path=path, error=repr(e)))
+        return False
+
+    for name, service in fresh.items():
+        current = service_registry.get(name)
+        if current is not None:
+            current.reconfigure(service)
+            continue
+        service_registry[name] = service
+        if _connector is not None:
+            await service.open(_connector)
+
+    removed = [name for name in service_registry if name not in fresh]
+    for name in removed:
+        service = service_registry.pop(name)
+        if _connector is not None:
+            asyncio.create_task(_close_later(service))
+
+    log.info("services.yml reloaded", extra=fields(
+        services=len(service_registry),
+        replicas=sum(len(s.pool.replicas) for s in service_registry.values()),
+        removed=removed or None,
+    ))
+    return True
+
+
+async def _close_later(service: ExternalService):
+    # les appels déjà partis vers un service retiré se terminent sur sa session
+    await asyncio.sleep(service.timeout)
+    await service.close()
+
+
+async def _maintenance():
+    """
+    Tâche de fond, active tant que les sessions sont ouvertes :
+    - sonde /health de toutes les répliques toutes les health_interval_s
+    - recharge services.yml quand sa date de modification change
+    """
+    global _config_mtime
+    health_interval = REGISTRY_CONFIG.get("health_interval_s", 10)
+    health_timeout = REGISTRY_CONFIG.get("health_timeout_s", 2)
+    reload_interval = REGISTRY_CONFIG.get("reload_interval_s", 5)
+    hot_reload = REGISTRY_CONFIG.get("hot_reload", True)
+
+    loop = asyncio.get_running_loop()
+    next_probe = next_reload = loop.time()
+    while True:
+        now = loop.time()
+        if hot_reload and now >= next_reload:
+            next_reload = now + reload_interval
+            try:
+                mtime = os.path.getmtime(CONFIG_PATH)
+            except OSError:
+                mtime = _config_mtime
+            if mtime != _config_mtime:
+                _config_mtime = mtime
+                await reload_registry()
+        if health_interval and now >= next_probe:
+            next_probe = now + health_interval
+            await asyncio.gather(
+                *(s.probe(health_timeout) for s in list(service_registry.values())),
+                return_exceptions=True,
+            )
+        await asyncio.sleep(max(0.1, min(next_probe, next_reload) - loop.time()))
+
+
+# ---------------------------------------------------------
+# SESSIONS HTTP PARTAGÉES
+# ---------------------------------------------------------
+_connector = None
+_sessions_users = 0
+_maintenance_task = None
+
+
+async def open_sessions():
+    """
+    Ouvre une session keep-alive par service, toutes sur un même connecteur
+    (pool de connexions + cache DNS). Compteur de références : plusieurs runs
+    simultanés partagent les mêmes sessions, fermées avec le dernier.
+    """
+    global _connector, _sessions_users, _maintenance_task
+    _sessions_users += 1
+    if _sessions_users > 1:
+        return
+
+    _connector = aiohttp.TCPConnector(
+        limit=HTTP_CONFIG.get("pool_size", 100),
+        limit_per_host=HTTP_CONFIG.get("pool_size_per_host", 0),
+        keepalive_timeout=HTTP_CONFIG.get("keepalive_timeout", 60),
+        use_dns_cache=True,
+        ttl_dns_cache=HTTP_CONFIG.get("dns_cache_ttl", 300),
+    )
+    for service in service_registry.values():
+        await service.open(_connector)
+    _maintenance_task = asyncio.create_task(_maintenance())
+
+
+async def close_sessions():
+    global _connector, _sessions_users, _maintenance_task
+    _sessions_users = max(0, _sessions_users - 1)
+    if _sessions_users > 0:
+        return
+
+    if _maintenance_task is not None:
+        _maintenance_task.cancel()
+        await asyncio.gather(_maintenance_task, return_exceptions=True)
+        _maintenance_task = None
+
+    for service in service_registry.values():
+        await service.close()
+    if _connector is not None:
+        await _connector.close()
+        _connector = None
+
+
+@asynccontextmanager
+async def service_sessions():
+    await open_sessions()
+    try:
+        yield
+    finally:
+        await close_sessions()
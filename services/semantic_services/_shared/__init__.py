@@ -0,0 +1,2 @@
+# Code commun aux services sémantiques (copié dans /app/semantic_shared par
+# l'image raffinerie-semantic-base) : client LLM partagé et serveur unifié.
@@ -0,0 +1,204 @@
+import os
+import re
+import asyncio
+from collections import Counter as Occurrences
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Generator, List, Optional
+
+# Découpage map-reduce des textes longs (summary, keywords) : au lieu d'un
+# seul prompt avec tout le texte (contexte, latence et mémoire du backend
+# qui explosent), le texte est coupé en morceaux de LLM_CHUNK_TOKENS tokens,
+# traités en parallèle, puis fusionnés :
+# - summary : résumé des résumés, par niveaux, jusqu'à tenir dans un morceau
+# - keywords : union des listes, classée par nombre de morceaux où le mot apparaît
+#
+# Pas de tokenizer côté client : estimation à ~4 caractères par token.
+# Un texte qui tient dans un morceau part en un seul appel, comme avant.
+
+CHUNK_TOKENS = int(os.environ.get("LLM_CHUNK_TOKENS", 2000))
+# appels simultanés des scripts run.py (le serveur unifié a ses propres créneaux)
+CHUNK_CONCURRENCY = int(os.environ.get("LLM_CHUNK_CONCURRENCY") or os.environ.get("OLLAMA_NUM_PARALLEL") or 4)
+CHARS_PER_TOKEN = 4
+# niveaux de résumé au-delà desquels on n'essaie plus de réduire
+MAX_DEPTH = 4
+
+_PARAGRAPHS = re.compile(r"\n\s*\n")
+_SENTENCES = re.compile(r"(?<=[.!?。！？])\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def needs_chunking(text: str, max_tokens: int = CHUNK_TOKENS) -> bool:
+    return max_tokens > 0 and estimate_tokens(text) > max_tokens
+
+
+# ---------------------------------------------------------
+# DÉCOUPAGE
+# ---------------------------------------------------------
+def _pieces(text: str, max_chars: int) -> List[str]:
+    """Paragraphes, sinon phrases, sinon mots : chaque morceau ≤ max_chars (sauf mot géant)."""
+    out = []
+    for para in _PARAGRAPHS.split(text):
+        para = para.strip()
+        if not para:
+            continue
+        if len(para) <= max_chars:
+            out.append(para)
+            continue
+        for sentence in _SENTENCES.split(para):
+            if len(sentence) <= max_chars:
+                out.append(sentence)
+                continue
+            words, current = sentence.split(), ""
+            for word in words:
+                if current and len(current) + 1 + len(word) > max_chars:
+                    out.append(current)
+                    current = word
+                else:
+                    current = f"{current} {word}" if current else word
+            if current:
+                out.append(current)
+    return out
+
+
+def split_text(text: str, max_tokens: int = CHUNK_TOKENS) -> List[str]:
+    """Morceaux d'au plus max_tokens (estimés), coupés aux paragraphes / phrases."""
+    if not needs_chunking(text, max_tokens):
+        return [text]
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    sep = "\n\n" if "\n" in text else " "
+    chunks: List[str] = []
+    current = ""
+    for piece in _pieces(text, max_chars):
+        if current and len(current) + len(sep) + len(piece) > max_chars:
+            chunks.append(current)
+            current = piece
+        else:
+            current = f"{current}{sep}{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+# ---------------------------------------------------------
+# FUSION
+# ---------------------------------------------------------
+def rank_keywords(lists: List[List[str]], limit: Optional[int] = None) -> List[str]:
+    """
+    Union des mots-clés des morceaux, sans doublon (casse ignorée), classée
+    par nombre de morceaux où ils apparaissent, puis par ordre d'apparition.
+    limit par défaut : la plus longue liste d'un morceau (taille d'un appel seul).
+    """
+    counts: Occurrences = Occurrences()
+    # forme normalisée → forme de la première occurrence (dans l'ordre d'apparition)
+    originals = {}
+    for keywords in lists:
+        seen = set()
+        for k in keywords:
+            norm = k.strip().lower()
+            if not norm or norm in seen:
+                continue
+            seen.add(norm)
+            counts[norm] += 1
+            originals.setdefault(norm, k.strip())
+    order = {kw: i for i, kw in enumerate(originals)}
+    ranked = sorted(originals, key=lambda kw: (-counts[kw], order[kw]))
+    if limit is None:
+        limit = max((len(x) for x in lists), default=0)
+    return [originals[kw] for kw in ranked[:limit]]
+
+
+def _joined(parts: List[str]) -> str:
+    return "\n\n".join(p.strip() for p in parts if p and p.strip())
+
+
+# ---------------------------------------------------------
+# MAP-REDUCE
+# ---------------------------------------------------------
+# Une seule implémentation du découpage et de la fusion, écrite comme un
+# générateur : chaque `yield` envoie une liste de morceaux à traiter et
+# reçoit leurs résultats (même ordre). Les deux pilotes ne font que ces
+# appels : en threads (scripts run.py) ou en coroutines (serveur unifié).
+Plan = Generator[List[str], list, Any]
+
+
+def _summary_plan(text: str, max_tokens: int) -> Plan:
+    """Résumé des résumés, par niveaux, jusqu'à tenir dans un morceau."""
+    for _ in range(MAX_DEPTH):
+        chunks = split_text(text, max_tokens)
+        if len(chunks) == 1:
+            break
+        joined = _joined((yield chunks))
+        shorter = estimate_tokens(joined) < estimate_tokens(text)
+        text = joined
+        if not shorter:
+            # les résumés ne raccourcissent plus : un dernier appel sur leur ensemble
+            break
+    return (yield [text])[0]
+
+
+def _keywords_plan(text: str, max_tokens: int) -> Plan:
+    """Mots-clés par morceau, union classée par nombre de morceaux (rank_keywords)."""
+    chunks = split_text(text, max_tokens)
+    results = yield chunks
+    return results[0] if len(chunks) == 1 else rank_keywords(results)
+
+
+def _drive(plan: Plan, run_chunks: Callable[[List[str]], list]):
+    try:
+        chunks = next(plan)
+        while True:
+            chunks = plan.send(run_chunks(chunks))
+    except StopIteration as done:
+        return done.value
+
+
+async def _adrive(plan: Plan, run_chunks: Callable[[List[str]], Awaitable[list]]):
+    try:
+        chunks = next(plan)
+        while True:
+            chunks = plan.send(await run_chunks(chunks))
+    except StopIteration as done:
+        return done.value
+
+
+# ---------------------------------------------------------
+# scripts run.py : appels synchrones en threads
+# ---------------------------------------------------------
+def map_chunks(call: Callable[[str], object], chunks: List[str], concurrency: int = CHUNK_CONCURRENCY) -> list:
+    if len(chunks) == 1:
+        return [call(chunks[0])]
+    with ThreadPoolExecutor(max(1, min(concurrency, len(chunks)))) as pool:
+        return list(pool.map(call, chunks))
+
+
+def summarize(
+    call: Callable[[str], str], text: str, max_tokens: int = CHUNK_TOKENS, concurrency: int = CHUNK_CONCURRENCY,
+) -> str:
+    return _drive(_summary_plan(text, max_tokens), lambda chunks: map_chunks(call, chunks, concurrency))
+
+
+def extract_keywords(
+    call: Callable[[str], List[str]], text: str, max_tokens: int = CHUNK_TOKENS,
+    concurrency: int = CHUNK_CONCURRENCY,
+) -> List[str]:
+    return _drive(_keywords_plan(text, max_tokens), lambda chunks: map_chunks(call, chunks, concurrency))
+
+
+# ---------------------------------------------------------
+# serveur unifié : concurrence bornée par les créneaux du client LLM
+# ---------------------------------------------------------
+async def amap_chunks(call: Callable[[str], Awaitable[object]], chunks: List[str]) -> list:
+    return list(await asyncio.gather(*(call(c) for c in chunks)))
+
+
+async def asummarize(call: Callable[[str], Awaitable[str]], text: str, max_tokens: int = CHUNK_TOKENS) -> str:
+    return await _adrive(_summary_plan(text, max_tokens), lambda chunks: amap_chunks(call, chunks))
+
+
+async def aextract_keywords(
+    call: Callable[[str], Awaitable[List[str]]], text: str, max_tokens: int = CHUNK_TOKENS,
+) -> List[str]:
+    return await _adrive(_keywords_plan(text, max_tokens), lambda chunks: amap_chunks(call, chunks))
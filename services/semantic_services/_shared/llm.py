@@ -0,0 +1,107 @@
+import os
+import time
+import asyncio
+from typing import Any, Callable, Dict, List, Optional, Type
+
+from pydantic import BaseModel
+
+from services.metrics import Counter, Gauge, Histogram
+
+from .llm_cache import LLMCache, open_cache
+
+# Client Ollama partagé par toutes les tâches du serveur sémantique.
+# - un seul AsyncClient (pool HTTP keep-alive) pour tout le process
+# - au plus LLM_PARALLEL appels simultanés, à régler sur les créneaux
+#   parallèles du backend (OLLAMA_NUM_PARALLEL côté Ollama)
+# - réponses servies par le cache disque (llm_cache) quand l'appel a une clé :
+#   un hit ne prend pas de créneau
+
+LLM_MODEL = os.environ.get("LLM_MODEL", "llama3.1:8b")
+LLM_PARALLEL = int(os.environ.get("LLM_PARALLEL") or os.environ.get("OLLAMA_NUM_PARALLEL") or 4)
+
+LLM_CALLS = Counter("llm_calls_total", "Appels au backend LLM, par tâche et statut (ok, error)", ["task", "status"])
+LLM_LATENCY = Histogram("llm_call_duration_seconds", "Durée d'un appel LLM (attente de créneau exclue)", ["task"])
+LLM_WAITING = Gauge("llm_waiting", "Appels en attente d'un créneau du backend LLM")
+
+
+class LLMClient:
+    def __init__(
+        self, model: str = LLM_MODEL, host: Optional[str] = None, parallel: int = LLM_PARALLEL,
+        cache: Optional[LLMCache] = None,
+    ):
+        self.model = model
+        # None → OLLAMA_HOST, sinon http://localhost:11434
+        self.host = host
+        self.parallel = max(1, parallel)
+        # None → cache par défaut (LLM_CACHE_PATH) ouvert au démarrage
+        self.cache = cache
+        self._client = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    async def start(self):
+        # import ici : le module reste importable sans ollama (tests, banc d'essai)
+        from ollama import AsyncClient
+
+        self._client = AsyncClient(host=self.host)
+        self._slots = asyncio.Semaphore(self.parallel)
+        if self.cache is None:
+            self.cache = open_cache()
+
+    async def close(self):
+        self._client = None
+        if self.cache is not None:
+            self.cache.close()
+            self.cache = None
+
+    # ---------------------------------------------------------
+    async def chat(
+        self, messages: List[Dict[str, Any]], schema: Dict[str, Any], task: str = "",
+        key: Optional[str] = None, validate: Optional[Callable[[str], Any]] = None,
+    ) -> str:
+        """
+        Un appel en sortie structurée (format=schema JSON) ; renvoie le contenu brut.
+        key (llm_cache.make_key) : réponse lue / gardée dans le cache ; seules
+        les réponses acceptées par validate (ValueError sinon) sont gardées.
+        """
+        cache = self.cache if key is not None else None
+        if cache is not None:
+            # sqlite bloquant : hors de la boucle, comme le put plus bas
+            hit = await asyncio.to_thread(cache.get, key, task)
+            if hit is not None:
+                return hit
+        if self._client is None:
+            raise RuntimeError("LLM client not started")
+
+        LLM_WAITING.labels().inc()
+        try:
+            await self._slots.acquire()
+        finally:
+            LLM_WAITING.labels().dec()
+        t0 = time.monotonic()
+        try:
+            response = await self._client.chat(model=self.model, messages=messages, format=schema)
+        except Exception:
+            LLM_CALLS.labels(task, "error").inc()
+            raise
+        finally:
+            self._slots.release()
+            LLM_LATENCY.labels(task).observe(time.monotonic() - t0)
+        LLM_CALLS.labels(task, "ok").inc()
+        content = response.message.content
+        if cache is not None:
+            try:
+                if validate is not None:
+                    validate(content)
+            except ValueError:
+                # réponse hors schéma : pas gardée, le prochain appel retentera
+                return content
+            await asyncio.to_thread(cache.put, key, content, task)
+        return content
+
+    async def chat_model(
+        self, prompt: str, output: Type[BaseModel], schema: Dict[str, Any], task: str = "", key: Optional[str] = None,
+    ) -> BaseModel:
+        content = await self.chat(
+            [{"role": "user", "content": prompt}], schema, task, key=key, validate=output.model_validate_json,
+        )
+        return output.model_validate_json(content)
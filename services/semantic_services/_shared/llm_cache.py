@@ -0,0 +1,219 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Callable, Dict, Optional, Type
+
+from pydantic import BaseModel
+
+from services.metrics import Counter
+
+# Cache disque des réponses LLM, devant les appels Ollama (serveur sémantique
+# unifié et scripts run.py des tâches).
+#
+# - clé = modèle + hash du template de prompt + hash du texte + hash du schéma
+#   de sortie (+ variables du prompt, ex: langue) : modifier un prompt.txt
+#   n'invalide que les entrées de cette tâche
+# - une seule base SQLite (WAL) partagée par les process d'un conteneur ou
+#   d'un volume ; éviction LRU quand la taille dépasse max_bytes
+# - seules les réponses valides (schéma respecté) sont gardées
+#
+# LLM_CACHE_PATH="" désactive le cache ; LLM_CACHE_MAX_MB borne sa taille.
+
+LLM_CACHE_PATH = os.environ.get("LLM_CACHE_PATH", "/shared/llm_cache/responses.sqlite")
+LLM_CACHE_MAX_MB = float(os.environ.get("LLM_CACHE_MAX_MB", 512))
+
+LLM_CACHE_REQUESTS = Counter(
+    "llm_cache_requests_total", "Consultations du cache de réponses LLM, par tâche et résultat (hit, miss)",
+    ["task", "result"],
+)
+LLM_CACHE_EVICTIONS = Counter("llm_cache_evictions_total", "Réponses LLM évincées du cache (LRU)")
+
+
+def hash_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def hash_schema(schema: Dict[str, Any]) -> str:
+    return hash_text(json.dumps(schema, sort_keys=True))
+
+
+def make_key(
+    model: str, template_hash: str, text: str, schema_hash: str, variables: Optional[Dict[str, Any]] = None,
+) -> str:
+    parts = [model, template_hash, hash_text(text), schema_hash, json.dumps(variables or {}, sort_keys=True)]
+    return hash_text("\x1f".join(parts))
+
+
+# ---------------------------------------------------------
+# CACHE
+# ---------------------------------------------------------
+class LLMCache:
+    """
+    Réponses brutes (contenu JSON) du LLM par clé, dans une base SQLite.
+    hits / misses : compteurs du process (aussi exportés en métriques).
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, task TEXT, content TEXT NOT NULL,"
+            " size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_used)")
+        # taille totale tenue à jour à chaque écriture (pas de SUM sur toute la table)
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._db.execute(
+            "INSERT OR IGNORE INTO meta (name, value) SELECT 'bytes', COALESCE(SUM(size), 0) FROM responses"
+        )
+
+    # ---------------------------------------------------------
+    def get(self, key: str, task: str = "") -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT content FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+        if row is None:
+            self.misses += 1
+            LLM_CACHE_REQUESTS.labels(task, "miss").inc()
+            return None
+        self.hits += 1
+        LLM_CACHE_REQUESTS.labels(task, "hit").inc()
+        return row[0]
+
+    def put(self, key: str, content: str, task: str = ""):
+        size = len(content.encode("utf-8"))
+        with self._lock:
+            # transaction : d'autres process écrivent dans la même base
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                old = self._db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, task, content, size, last_used) VALUES (?, ?, ?, ?, ?)",
+                    (key, task, content, size, time.time()),
+                )
+                self._add_bytes(size - (old[0] if old else 0))
+                self._evict()
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def _add_bytes(self, delta: int):
+        self._db.execute("UPDATE meta SET value = value + ? WHERE name = 'bytes'", (delta,))
+
+    def _total(self) -> int:
+        return self._db.execute("SELECT value FROM meta WHERE name = 'bytes'").fetchone()[0]
+
+    def _evict(self):
+        total = self._total()
+        if total <= self.max_bytes:
+            return
+        # plus anciennes d'abord, jusqu'à repasser sous 90 % de la limite
+        excess = total - int(self.max_bytes * 0.9)
+        freed, keys = 0, []
+        for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY last_used"):
+            if freed >= excess:
+                break
+            keys.append((key,))
+            freed += size
+        self._db.executemany("DELETE FROM responses WHERE key = ?", keys)
+        self._add_bytes(-freed)
+        LLM_CACHE_EVICTIONS.labels().inc(len(keys))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            size = self._total()
+        return {"entries": entries, "bytes": size, "hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def open_cache(path: Optional[str] = LLM_CACHE_PATH, max_mb: float = LLM_CACHE_MAX_MB) -> Optional[LLMCache]:
+    """Cache configuré, ou None (désactivé, ou base inaccessible : appels directs)."""
+    if not path:
+        return None
+    try:
+        return LLMCache(path, int(max_mb * 2**20))
+    except (OSError, sqlite3.Error) as e:
+        print(f"LLM cache disabled ({path}): {e!r}", file=sys.stderr)
+        return None
+
+
+# ---------------------------------------------------------
+# APPELS AVEC CACHE (scripts run.py)
+# ---------------------------------------------------------
+def render(template: str, text: str, variables: Dict[str, Any]) -> str:
+    prompt = template.replace("{{TEXT}}", text)
+    for key, value in variables.items():
+        prompt = prompt.replace("{{" + key.upper() + "}}", str(value))
+    return prompt
+
+
+def _key(model: str, template: str, text: str, schema: Dict[str, Any], variables: Dict[str, Any]) -> str:
+    return make_key(model, hash_text(template), text, hash_schema(schema), variables)
+
+
+_CACHE: Dict[str, Optional[LLMCache]] = {}
+_CACHE_LOCK = threading.Lock()
+
+
+def default_cache() -> Optional[LLMCache]:
+    # appels en threads (morceaux d'un texte long) : une seule connexion
+    with _CACHE_LOCK:
+        if "default" not in _CACHE:
+            _CACHE["default"] = open_cache()
+        return _CACHE["default"]
+
+
+def cached_chat(
+    chat: Callable, model: str, task: str, template: str, text: str, output: Type[BaseModel], **variables: Any,
+) -> str:
+    """
+    ollama.chat en sortie structurée (schéma de `output`) derrière le cache :
+    un texte déjà traité avec le même prompt et le même schéma n'est pas
+    renvoyé au modèle. Renvoie le contenu JSON de la réponse.
+    (Côté asynchrone, LLMClient.chat fait la même chose avec ses créneaux.)
+    """
+    schema = output.model_json_schema()
+    cache = default_cache()
+    key = _key(model, template, text, schema, variables) if cache is not None else None
+    if key is not None:
+        hit = cache.get(key, task)
+        if hit is not None:
+            return hit
+
+    response = chat(
+        model=model,
+        messages=[{"role": "user", "content": render(template, text, variables)}],
+        format=schema,
+    )
+    content = response.message.content
+    if key is not None:
+        store_if_valid(cache, key, content, output, task)
+    return content
+
+
+def store_if_valid(cache: LLMCache, key: str, content: str, output: Type[BaseModel], task: str = ""):
+    try:
+        output.model_validate_json(content)
+    except ValueError:
+        # réponse hors schéma : pas de cache, le prochain appel retentera
+        return
+    cache.put(key, content, task)
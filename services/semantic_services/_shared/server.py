@@ -0,0 +1,178 @@
+import os
+import json
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Any, Dict, Iterable, Optional, Tuple, Union
+
+from fastapi import FastAPI
+
+from services.docker_api_server import InProcessModel, create_service_app
+from services.mapping import SERVICE_MAPPING
+
+from .llm import LLMClient
+from .tasks import BUNDLE, TASKS, BundleTask, SemanticTask
+
+# Serveur sémantique unifié : toutes les tâches texte dans UN process,
+# un seul client Ollama asynchrone partagé.
+#
+#   uvicorn semantic_shared.server:app --host 0.0.0.0 --port 8080
+#
+# Chaque tâche garde sa propre app create_service_app (file de travail,
+# /run, /run_batch, /health, /metrics) :
+# - montée sous /<tâche> (http://semantic:8080/emotions/run)
+# - ou choisie par l'en-tête Host : avec un alias réseau par tâche, les URLs
+#   de services.yml (http://emotions:8080/run) restent inchangées
+#
+# /semantic_bundle remplit plusieurs champs en un appel (tasks.BundleTask).
+#
+# SEMANTIC_TASKS=emotions,keywords limite les tâches servies (défaut : toutes).
+
+
+def read_input(input_path: str) -> Tuple[str, Dict[str, Any]]:
+    """
+    (texte, champs déjà connus) : fichier texte brut, ou tmp.json de
+    l'orchestrateur (clé "text" + fragment EnrichedData en cours).
+    """
+    with open(input_path, "r", encoding="utf-8") as f:
+        content = f.read()
+    if input_path.endswith(".json"):
+        data = json.loads(content)
+        if not isinstance(data, dict) or not data.get("text"):
+            raise ValueError(f"{input_path}: no 'text' field")
+        return data["text"], data
+    return content, {}
+
+
+def fragment(values: Dict[str, Any]) -> Dict[str, Any]:
+    """Fragment EnrichedData de plusieurs tâches (chemins de SERVICE_MAPPING)."""
+    out: Dict[str, Any] = {}
+    for task, value in values.items():
+        section, fld = SERVICE_MAPPING[task]["enriched_path"]
+        out.setdefault(section, {})[fld] = value
+    return out
+
+
+def write_output(task: str, outdir: str, value):
+    """Fichier attendu par SERVICE_MAPPING[task], relu par collect_fragment."""
+    mapping = SERVICE_MAPPING[task]
+    path = os.path.join(outdir, mapping["files"][0])
+    with open(path, "w", encoding="utf-8") as f:
+        if mapping["json_loader"] == "json":
+            json.dump(value, f, ensure_ascii=False)
+        else:
+            f.write(str(value))
+
+
+# ---------------------------------------------------------
+# MODÈLE (une tâche sur le client partagé)
+# ---------------------------------------------------------
+class SemanticTaskModel(InProcessModel):
+    is_async = True
+
+    def __init__(self, task: Union[SemanticTask, BundleTask], llm: LLMClient):
+        self.task = task
+        self.llm = llm
+
+    def load(self):
+        # prompt et schéma JSON préparés une fois pour toutes
+        self.task.load()
+
+    async def ainfer(self, req):
+        text, known = read_input(req.input_path)
+        extra = dict(req.extra or {})
+        language = (known.get("semantic") or {}).get("language")
+        if language:
+            # langue source déjà détectée (ex: traductions : pas d'appel pour elle)
+            extra.setdefault("source_language", language)
+        value = await self.task.run(self.llm, text, extra)
+        if isinstance(self.task, BundleTask):
+            # plusieurs tâches : un fichier chacune, fragment renvoyé directement
+            for task, v in value.items():
+                write_output(task, req.outdir, v)
+            return fragment(value)
+        write_output(self.task.name, req.outdir, value)
+        return None
+
+
+# ---------------------------------------------------------
+# ROUTAGE PAR EN-TÊTE HOST
+# ---------------------------------------------------------
+class HostRouter:
+    """
+    Envoie la requête à l'app de la tâche nommée dans l'en-tête Host
+    (nom exact, sinon le plus long nom de tâche contenu dans l'hôte :
+    "raffinerie-emotions" → emotions). À défaut, app parente (/<tâche>/...).
+    """
+
+    def __init__(self, parent: FastAPI, apps: Dict[str, FastAPI]):
+        self.parent = parent
+        self.apps = apps
+        self._by_length = sorted(apps, key=len, reverse=True)
+
+    def _match(self, host: str) -> Optional[FastAPI]:
+        # noms de conteneur avec tirets : narrative-type → narrative_type
+        host = host.split(":", 1)[0].lower().replace("-", "_")
+        if host in self.apps:
+            return self.apps[host]
+        for task in self._by_length:
+            if task in host:
+                return self.apps[task]
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] in ("http", "websocket"):
+            host = dict(scope.get("headers") or []).get(b"host", b"").decode("latin-1")
+            target = self._match(host)
+            if target is not None:
+                return await target(scope, receive, send)
+        return await self.parent(scope, receive, send)
+
+
+# ---------------------------------------------------------
+# APPLICATION
+# ---------------------------------------------------------
+def selected_tasks() -> Iterable[str]:
+    names = os.environ.get("SEMANTIC_TASKS")
+    if not names:
+        return [*TASKS, BUNDLE.name]
+    unknown = [n for n in names.split(",") if n.strip() and n.strip() not in TASKS and n.strip() != BUNDLE.name]
+    if unknown:
+        raise ValueError(f"unknown semantic tasks: {unknown}")
+    return [n.strip() for n in names.split(",") if n.strip()]
+
+
+def create_semantic_app(tasks: Optional[Iterable[str]] = None, llm: Optional[LLMClient] = None) -> HostRouter:
+    llm = llm or LLMClient()
+    apps = {
+        name: create_service_app(
+            name,
+            model=SemanticTaskModel(BUNDLE if name == BUNDLE.name else TASKS[name], llm),
+            # créneaux = appels parallèles du backend : pas de file cachée côté Ollama
+            slots=llm.parallel,
+            max_queue=int(os.environ.get("SEMANTIC_MAX_QUEUE", 256)),
+        )
+        for name in (tasks or selected_tasks())
+    }
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        await llm.start()
+        try:
+            async with AsyncExitStack() as stack:
+                for sub in apps.values():
+                    await stack.enter_async_context(sub.router.lifespan_context(sub))
+                yield
+        finally:
+            await llm.close()
+
+    parent = FastAPI(title="semantic", lifespan=lifespan)
+    for name, sub in apps.items():
+        parent.mount(f"/{name}", sub)
+
+    @parent.get("/health")
+    def health():
+        return {"status": "ok", "tasks": sorted(apps), "model": llm.model, "parallel": llm.parallel}
+
+    return HostRouter(parent, apps)
+
+
+app = create_semantic_app()
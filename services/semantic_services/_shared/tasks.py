@@ -0,0 +1,411 @@
+import os
+import json
+import asyncio
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+from pydantic import BaseModel, ValidationError, create_model
+
+from services.metrics import Counter
+
+from .llm import LLMClient
+from .chunking import aextract_keywords, asummarize, needs_chunking
+from .llm_cache import hash_schema, hash_text, make_key
+
+# Tâches texte du serveur sémantique unifié. Chacune reprend le prompt.txt de
+# sa tâche ; les schémas ci-dessous suivent EnrichedData et sont aussi ceux
+# des run.py qui en ont besoin (key_entities, translations), importés d'ici.
+# Prompt et schéma JSON sont préparés une seule fois au démarrage (load),
+# puis chaque requête ne fait que l'appel LLM.
+# Les appels passent par le cache de réponses (llm_cache) : clé = modèle,
+# hash du prompt.txt, hash du texte, hash du schéma (+ variables).
+#
+# value() met la sortie du modèle à la forme attendue par SERVICE_MAPPING /
+# EnrichedData (le fichier écrit est relu par create_service_app).
+
+def _prompts_dir() -> Path:
+    # dépôt : services/semantic_services/<tâche>/prompt.txt
+    # image : /app/semantic_services/<tâche>/prompt.txt
+    env = os.environ.get("SEMANTIC_PROMPTS_DIR")
+    if env:
+        return Path(env)
+    repo = Path(__file__).resolve().parent.parent
+    return repo if (repo / "emotions").is_dir() else Path("/app/semantic_services")
+
+
+# ---------------------------------------------------------
+# SCHÉMAS (sorties structurées)
+# ---------------------------------------------------------
+class EmotionOutput(BaseModel):
+    emotions: list[str]
+
+
+class KeyEntitiesOutput(BaseModel):
+    # champs de EnrichedData.semantic.key_entities
+    persons: list[str]
+    objects: list[str]
+    locations: list[str]
+
+
+class KeywordsOutput(BaseModel):
+    keywords: list[str]
+
+
+class LanguageOutput(BaseModel):
+    language: str
+
+
+class NarrativeTypeOutput(BaseModel):
+    narrative_type: str
+
+
+class StyleOutput(BaseModel):
+    style: str
+
+
+class SummaryOutput(BaseModel):
+    summary: str
+
+
+class TopicClassificationOutput(BaseModel):
+    topic: str
+
+
+class TranslationPair(BaseModel):
+    language: str
+    translation: str
+
+
+class TranslationsOutput(BaseModel):
+    translations: list[TranslationPair]
+
+
+# ---------------------------------------------------------
+# TÂCHES
+# ---------------------------------------------------------
+class SemanticTask:
+    def __init__(self, name: str, output: Type[BaseModel], field: str):
+        self.name = name
+        self.output = output
+        # champ du schéma qui porte la valeur
+        self.field = field
+        self.prompt: Optional[str] = None
+        self.schema: Optional[Dict[str, Any]] = None
+        self.prompt_hash = ""
+        self.schema_hash = ""
+
+    def load(self, prompts_dir: Optional[Path] = None):
+        path = (prompts_dir or _prompts_dir()) / self.name / "prompt.txt"
+        self.prompt = path.read_text(encoding="utf-8")
+        self.schema = self.output.model_json_schema()
+        self.prompt_hash = hash_text(self.prompt)
+        self.schema_hash = hash_schema(self.schema)
+
+    def key(self, llm: LLMClient, text: str, schema_hash: Optional[str] = None, **variables: Any) -> Optional[str]:
+        if llm.cache is None:
+            return None
+        return make_key(llm.model, self.prompt_hash, text, schema_hash or self.schema_hash, variables)
+
+    def instructions(self) -> str:
+        """Consignes du prompt sans le texte (pour semantic_bundle)."""
+        head = self.prompt.split("{{TEXT}}", 1)[0].rstrip()
+        if head.endswith("Text:"):
+            head = head[: -len("Text:")].rstrip()
+        return head
+
+    def render(self, text: str, **variables: str) -> str:
+        prompt = self.prompt.replace("{{TEXT}}", text)
+        for key, value in variables.items():
+            prompt = prompt.replace("{{" + key.upper() + "}}", value)
+        return prompt
+
+    def value(self, parsed: BaseModel) -> Any:
+        return getattr(parsed, self.field)
+
+    def needs_chunking(self, text: str) -> bool:
+        return False
+
+    async def run(self, llm: LLMClient, text: str, extra: Optional[dict] = None) -> Any:
+        parsed = await llm.chat_model(self.render(text), self.output, self.schema, self.name, self.key(llm, text))
+        return self.value(parsed)
+
+
+class SummaryTask(SemanticTask):
+    """Texte long : morceaux résumés en parallèle, puis résumé des résumés (chunking.py)."""
+
+    def needs_chunking(self, text: str) -> bool:
+        return needs_chunking(text)
+
+    async def run(self, llm: LLMClient, text: str, extra: Optional[dict] = None) -> str:
+        return await asummarize(lambda chunk: SemanticTask.run(self, llm, chunk, extra), text)
+
+
+class KeywordsTask(SemanticTask):
+    """Texte long : mots-clés par morceau en parallèle, classés par fréquence (chunking.py)."""
+
+    def needs_chunking(self, text: str) -> bool:
+        return needs_chunking(text)
+
+    async def run(self, llm: LLMClient, text: str, extra: Optional[dict] = None) -> List[str]:
+        return await aextract_keywords(lambda chunk: SemanticTask.run(self, llm, chunk, extra), text)
+
+
+class KeyEntitiesTask(SemanticTask):
+    def value(self, parsed: KeyEntitiesOutput) -> Dict[str, List[str]]:
+        return parsed.model_dump()
+
+
+class TopicClassificationTask(SemanticTask):
+    def value(self, parsed: TopicClassificationOutput) -> List[str]:
+        # EnrichedData.semantic.topic_classification est une liste
+        return [parsed.topic]
+
+
+# langues par défaut (comme translations/api_server.py)
+DEFAULT_LANGUAGES = ["english", "french", "spanish", "german", "italian", "japanese"]
+
+# codes ISO → nom (semantic.language peut valoir "en" comme "English")
+LANGUAGE_NAMES = {
+    "en": "english", "fr": "french", "es": "spanish", "de": "german",
+    "it": "italian", "ja": "japanese", "pt": "portuguese", "nl": "dutch",
+    "zh": "chinese", "ko": "korean", "ru": "russian", "ar": "arabic",
+}
+
+
+def normalize_language(name: Optional[str]) -> str:
+    key = (name or "").strip().lower()
+    return LANGUAGE_NAMES.get(key, key)
+
+
+def requested_languages(extra: Optional[dict]) -> List[str]:
+    languages = (extra or {}).get("languages")
+    if isinstance(languages, str):
+        languages = languages.split(",")
+    if not isinstance(languages, list):
+        return list(DEFAULT_LANGUAGES)
+    # une langue demandée deux fois n'est traduite qu'une fois
+    return list(dict.fromkeys(str(x).strip() for x in languages if str(x).strip()))
+
+
+def translation_items(languages: List[str], done: Dict[str, str]) -> List[Dict[str, str]]:
+    """
+    Valeur de EnrichedData.semantic.translations (TranslationItem : language, text),
+    la même pour le serveur unifié et translations/run.py ; langue forcée à
+    celle demandée, dans l'ordre demandé.
+    """
+    return [{"language": lang, "text": done[lang]} for lang in languages if lang in done]
+
+
+class TranslationsTask(SemanticTask):
+    """
+    Une langue par appel, tous en parallèle (bornés par les créneaux du
+    client LLM) ; extra["mode"] == "multi" : un seul appel pour toutes les
+    langues, les manquantes refaites une par une. La langue source
+    (extra["source_language"]) reprend le texte tel quel.
+    """
+
+    def load(self, prompts_dir: Optional[Path] = None):
+        super().load(prompts_dir)
+        self.multi_schema = TranslationsOutput.model_json_schema()
+        self.multi_schema_hash = hash_schema(self.multi_schema)
+
+    async def translate(self, llm: LLMClient, text: str, language: str) -> str:
+        pair = await llm.chat_model(
+            self.render(text, language=language), self.output, self.schema, self.name,
+            self.key(llm, text, language=language),
+        )
+        return pair.translation
+
+    async def translate_multi(self, llm: LLMClient, text: str, languages: List[str]) -> Dict[str, str]:
+        target = ", ".join(languages) + " (one translation per language)"
+        out = await llm.chat_model(
+            self.render(text, language=target), TranslationsOutput, self.multi_schema, self.name,
+            self.key(llm, text, self.multi_schema_hash, language=target),
+        )
+        wanted = {normalize_language(lang): lang for lang in languages}
+        return {
+            wanted[normalize_language(p.language)]: p.translation
+            for p in out.translations if normalize_language(p.language) in wanted
+        }
+
+    async def run(self, llm: LLMClient, text: str, extra: Optional[dict] = None) -> List[Dict[str, str]]:
+        extra = extra or {}
+        languages = requested_languages(extra)
+        source = normalize_language(extra.get("source_language"))
+        done = {lang: text for lang in languages if source and normalize_language(lang) == source}
+
+        todo = [lang for lang in languages if lang not in done]
+        if extra.get("mode") == "multi" and todo:
+            try:
+                done.update(await self.translate_multi(llm, text, todo))
+            except ValueError:
+                # sortie groupée invalide : tout est refait langue par langue
+                pass
+            todo = [lang for lang in todo if lang not in done]
+
+        results = await asyncio.gather(*(self.translate(llm, text, lang) for lang in todo), return_exceptions=True)
+        errors = []
+        for lang, res in zip(todo, results):
+            if isinstance(res, Exception):
+                errors.append(res)
+            else:
+                done[lang] = res
+        if errors and not done:
+            raise errors[0]
+        return translation_items(languages, done)
+
+
+TASKS: Dict[str, SemanticTask] = {
+    t.name: t for t in [
+        SemanticTask("emotions", EmotionOutput, "emotions"),
+        KeyEntitiesTask("key_entities", KeyEntitiesOutput, "persons"),
+        KeywordsTask("keywords", KeywordsOutput, "keywords"),
+        SemanticTask("language", LanguageOutput, "language"),
+        SemanticTask("narrative_type", NarrativeTypeOutput, "narrative_type"),
+        SemanticTask("style", StyleOutput, "style"),
+        SummaryTask("summary", SummaryOutput, "summary"),
+        TopicClassificationTask("topic_classification", TopicClassificationOutput, "topic"),
+        TranslationsTask("translations", TranslationPair, "translation"),
+    ]
+}
+
+
+# ---------------------------------------------------------
+# APPEL GROUPÉ (semantic_bundle)
+# ---------------------------------------------------------
+BUNDLE_FALLBACKS = Counter(
+    "semantic_bundle_fallbacks_total",
+    "Champs de semantic_bundle refaits en appel séparé (sortie groupée invalide)",
+    ["task"],
+)
+
+
+class BundleTask:
+    """
+    Plusieurs tâches en UN appel LLM : le texte (et son préremplissage) n'est
+    envoyé qu'une fois, avec un schéma qui regroupe les sorties des tâches
+    (un champ par tâche). Un champ absent ou invalide est refait par l'appel
+    de sa tâche seule ; les autres sont gardés.
+
+    req.extra["fields"] : champs EnrichedData demandés ("semantic.emotions"...),
+    défaut : toutes les tâches groupables.
+    """
+
+    name = "semantic_bundle"
+
+    def __init__(self, tasks: Dict[str, SemanticTask]):
+        self.tasks = tasks
+        self.prompt: Optional[str] = None
+        # (tâches) → (prompt, schéma, hash prompt, hash schéma) : composé une fois par combinaison
+        self._compiled: Dict[Tuple[str, ...], Tuple[str, Dict[str, Any], str, str]] = {}
+
+    def load(self, prompts_dir: Optional[Path] = None):
+        path = (prompts_dir or _prompts_dir()) / self.name / "prompt.txt"
+        self.prompt = path.read_text(encoding="utf-8")
+        for task in self.tasks.values():
+            if task.prompt is None:
+                task.load(prompts_dir)
+        self.compile(tuple(self.tasks))
+
+    def requested(self, extra: Optional[dict]) -> Tuple[str, ...]:
+        wanted = (extra or {}).get("fields")
+        if not wanted:
+            return tuple(self.tasks)
+        names = {f.rsplit(".", 1)[-1] for f in wanted}
+        return tuple(n for n in self.tasks if n in names)
+
+    @staticmethod
+    def field_type(task: SemanticTask) -> Any:
+        # schéma à un seul champ : on garde son type, sinon le modèle entier
+        model_fields = task.output.model_fields
+        if len(model_fields) == 1:
+            return model_fields[task.field].annotation
+        return task.output
+
+    def compile(self, names: Tuple[str, ...]) -> Tuple[str, Dict[str, Any], str, str]:
+        if names not in self._compiled:
+            sections = "\n\n".join(f"## {n}\n{self.tasks[n].instructions()}" for n in names)
+            output = create_model(
+                "SemanticBundle", **{n: (self.field_type(self.tasks[n]), ...) for n in names},
+            )
+            prompt, schema = self.prompt.replace("{{FIELDS}}", sections), output.model_json_schema()
+            # le prompt groupé contient les consignes de chaque tâche : modifier
+            # un prompt.txt invalide aussi les réponses groupées qui l'incluent
+            self._compiled[names] = (prompt, schema, hash_text(prompt), hash_schema(schema))
+        return self._compiled[names]
+
+    def parse_one(self, task: SemanticTask, raw: Any) -> Any:
+        if len(task.output.model_fields) == 1:
+            raw = {task.field: raw}
+        return task.value(task.output.model_validate(raw))
+
+    async def run(self, llm: LLMClient, text: str, extra: Optional[dict] = None) -> Dict[str, Any]:
+        names = self.requested(extra)
+        # texte long : les tâches découpées (summary, keywords) partent à part,
+        # en même temps que l'appel groupé des autres
+        separate = [n for n in names if self.tasks[n].needs_chunking(text)]
+        grouped = tuple(n for n in names if n not in separate)
+        results = await asyncio.gather(
+            self.run_grouped(llm, text, grouped, extra),
+            *(self.tasks[n].run(llm, text, extra) for n in separate),
+            return_exceptions=True,
+        )
+        values = {} if isinstance(results[0], Exception) else dict(results[0])
+        for name, res in zip(separate, results[1:]):
+            if not isinstance(res, Exception):
+                values[name] = res
+        errors = [r for r in results if isinstance(r, Exception)]
+        if errors and not values:
+            raise errors[0]
+        return values
+
+    async def run_grouped(
+        self, llm: LLMClient, text: str, names: Tuple[str, ...], extra: Optional[dict] = None,
+    ) -> Dict[str, Any]:
+        if not names:
+            return {}
+        prompt, schema, prompt_hash, schema_hash = self.compile(names)
+        key = make_key(llm.model, prompt_hash, text, schema_hash) if llm.cache is not None else None
+
+        def validate(content: str):
+            # gardée en cache seulement si tous les champs sont valides
+            data = json.loads(content)
+            for name in names:
+                if not isinstance(data, dict) or name not in data:
+                    raise ValueError(f"missing field '{name}'")
+                self.parse_one(self.tasks[name], data[name])
+
+        try:
+            content = await llm.chat(
+                [{"role": "user", "content": prompt.replace("{{TEXT}}", text)}], schema, self.name,
+                key=key, validate=validate,
+            )
+            data = json.loads(content)
+        except (ValueError, TypeError):
+            data = {}
+        if not isinstance(data, dict):
+            data = {}
+
+        values: Dict[str, Any] = {}
+        retry = []
+        for name in names:
+            try:
+                values[name] = self.parse_one(self.tasks[name], data[name])
+            except (KeyError, ValidationError):
+                BUNDLE_FALLBACKS.labels(name).inc()
+                retry.append(name)
+
+        # repli : une requête par champ manquant, en parallèle
+        results = await asyncio.gather(
+            *(self.tasks[n].run(llm, text, extra) for n in retry), return_exceptions=True,
+        )
+        for name, res in zip(retry, results):
+            if not isinstance(res, Exception):
+                values[name] = res
+        if not values and results:
+            raise results[0]
+        return values
+
+
+# les traductions (un appel par langue) restent hors du groupe
+BUNDLE = BundleTask({n: t for n, t in TASKS.items() if n != "translations"})
@@ -26,4 +26,4 @@ def build_description_command(req) -> list[str]:
 
     return cmd
 
-app = create_service_app("description", build_description_command)
\ No newline at end of file
+app = create_service_app("description", build_description_command, slots=2)
\ No newline at end of file
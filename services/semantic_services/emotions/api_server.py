@@ -26,4 +26,4 @@ def build_emotion_command(req) -> list[str]:
 
     return cmd
 
-app = create_service_app("emotion", build_emotion_command)
\ No newline at end of file
+app = create_service_app("emotion", build_emotion_command, slots=4)
\ No newline at end of file
@@ -6,7 +6,7 @@ from services.docker_api_server import create_service_app
 def build_key_entities_command(req) -> list[str]:
     """
     - source: req.input_path
-    - sortie: req.outdir/key_entities.json
+    - sortie: req.outdir/entities.json ({persons, objects, locations})
     """
     input_path = req.input_path
     outdir = req.outdir
@@ -26,4 +26,4 @@ def build_key_entities_command(req) -> list[str]:
 
     return cmd
 
-app = create_service_app("key_entities", build_key_entities_command)
\ No newline at end of file
+app = create_service_app("key_entities", build_key_entities_command, slots=4)
\ No newline at end of file
@@ -5,11 +5,11 @@ import json
 from pathlib import Path
 
 from ollama import chat
-from pydantic import BaseModel
 
-
-class key_entitiesOutput(BaseModel):
-    key_entities: list[str]
+# /app/semantic_shared (image raffinerie-semantic-base, PYTHONPATH=/app)
+from semantic_shared.llm_cache import cached_chat
+# même schéma que le serveur unifié : EnrichedData.semantic.key_entities
+from semantic_shared.tasks import KeyEntitiesOutput
 
 
 PROMPT_PATH = Path(__file__).parent / "prompt.txt"
@@ -24,20 +24,12 @@ def main(input_path: str, output_dir: str) -> None:
     text = input_path.read_text(encoding="utf-8")
     prompt = PROMPT_PATH.read_text(encoding="utf-8")
 
-    response = chat(
-        model=MODEL,
-        messages=[
-            {
-                "role": "user",
-                "content": prompt.replace("{{TEXT}}", text),
-            }
-        ],
-        format=key_entitiesOutput.model_json_schema(),
-    )
+    content = cached_chat(chat, MODEL, "key_entities", prompt, text, KeyEntitiesOutput)
 
-    key_entities = key_entitiesOutput.model_validate_json(response.message.content)
+    key_entities = KeyEntitiesOutput.model_validate_json(content)
 
-    out_file = output_dir / "key_entities.json"
+    # fichier attendu par SERVICE_MAPPING["key_entities"]
+    out_file = output_dir / "entities.json"
     out_file.write_text(
         key_entities.model_dump_json(indent=2),
         encoding="utf-8",
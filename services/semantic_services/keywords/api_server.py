@@ -26,4 +26,4 @@ def build_keywords_command(req) -> list[str]:
 
     return cmd
 
-app = create_service_app("keywords", build_keywords_command)
\ No newline at end of file
+app = create_service_app("keywords", build_keywords_command, slots=8)
\ No newline at end of file
@@ -26,4 +26,4 @@ def build_language_command(req) -> list[str]:
 
     return cmd
 
-app = create_service_app("language", build_language_command)
\ No newline at end of file
+app = create_service_app("language", build_language_command, slots=4)
\ No newline at end of file
@@ -26,4 +26,4 @@ def build_narrative_type_command(req) -> list[str]:
 
     return cmd
 
-app = create_service_app("narrative_type", build_narrative_type_command)
\ No newline at end of file
+app = create_service_app("narrative_type", build_narrative_type_command, slots=4)
\ No newline at end of file
@@ -7,6 +7,9 @@ from pathlib import Path
 from ollama import chat
 from pydantic import BaseModel
 
+# /app/semantic_shared (image raffinerie-semantic-base, PYTHONPATH=/app)
+from semantic_shared.llm_cache import cached_chat
+
 
 class NarrativeTypeOutput(BaseModel):
     narrative_type: str
@@ -24,18 +27,9 @@ def main(input_path: str, output_dir: str) -> None:
     text = input_path.read_text(encoding="utf-8")
     prompt = PROMPT_PATH.read_text(encoding="utf-8")
 
-    response = chat(
-        model=MODEL,
-        messages=[
-            {
-                "role": "user",
-                "content": prompt.replace("{{TEXT}}", text),
-            }
-        ],
-        format=NarrativeTypeOutput.model_json_schema(),
-    )
+    content = cached_chat(chat, MODEL, "narrative_type", prompt, text, NarrativeTypeOutput)
 
-    narrative_type = NarrativeTypeOutput.model_validate_json(response.message.content)
+    narrative_type = NarrativeTypeOutput.model_validate_json(content)
 
     out_file = output_dir / "narrative_type.json"
     out_file.write_text(
@@ -26,4 +26,4 @@ def build_style_command(req) -> list[str]:
 
     return cmd
 
-app = create_service_app("style", build_style_command)
\ No newline at end of file
+app = create_service_app("style", build_style_command, slots=4)
\ No newline at end of file
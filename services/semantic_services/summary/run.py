@@ -7,6 +7,10 @@ from pathlib import Path
 from ollama import chat
 from pydantic import BaseModel
 
+# /app/semantic_shared (image raffinerie-semantic-base, PYTHONPATH=/app)
+from semantic_shared.chunking import CHUNK_TOKENS, summarize
+from semantic_shared.llm_cache import cached_chat
+
 
 class SummaryOutput(BaseModel):
     summary: str
@@ -16,7 +20,7 @@ PROMPT_PATH = Path(__file__).parent / "prompt.txt"
 MODEL = "llama3.1:8b" # à ajuster selon le modèle disponible
 
 
-def main(input_path: str, output_dir: str) -> None:
+def main(input_path: str, output_dir: str, chunk_tokens: int = CHUNK_TOKENS) -> None:
     input_path = Path(input_path)
     output_dir = Path(output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
@@ -24,18 +28,12 @@ def main(input_path: str, output_dir: str) -> None:
     text = input_path.read_text(encoding="utf-8")
     prompt = PROMPT_PATH.read_text(encoding="utf-8")
 
-    response = chat(
-        model=MODEL,
-        messages=[
-            {
-                "role": "user",
-                "content": prompt.replace("{{TEXT}}", text),
-            }
-        ],
-        format=SummaryOutput.model_json_schema(),
-    )
+    def summarize_one(chunk: str) -> str:
+        content = cached_chat(chat, MODEL, "summary", prompt, chunk, SummaryOutput)
+        return SummaryOutput.model_validate_json(content).summary
 
-    summary = SummaryOutput.model_validate_json(response.message.content)
+    # texte long : morceaux résumés en parallèle, puis résumé des résumés
+    summary = SummaryOutput(summary=summarize(summarize_one, text, chunk_tokens))
     out_file = output_dir / "summary.json"
     out_file.write_text(
         summary.model_dump_json(indent=2),
@@ -47,6 +45,8 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Language detected")
     parser.add_argument("--input", required=True, help="Path to input text file")
     parser.add_argument("--output", required=True, help="Output directory")
+    parser.add_argument("--chunk-tokens", type=int, default=CHUNK_TOKENS,
+                        help="split longer texts into chunks of this size (0 = never)")
 
     args = parser.parse_args()
-    main(args.input, args.output)
+    main(args.input, args.output, args.chunk_tokens)
@@ -26,4 +26,4 @@ def build_topic_classification_command(req) -> list[str]:
 
     return cmd
 
-app = create_service_app("topic_classification", build_topic_classification_command)
\ No newline at end of file
+app = create_service_app("topic_classification", build_topic_classification_command, slots=4)
\ No newline at end of file
@@ -9,6 +9,9 @@ def build_translations_command(req) -> list[str]:
     - source: req.input_path
     - sortie: req.outdir/translations.json
     - args: --languages (comma-separated) taken from req.extra["languages"]
+    - req.extra["mode"] == "multi" : un seul appel pour toutes les langues
+    - --timeout (TRANSLATION_TIMEOUT, secondes) : sous le timeout de l'orchestrateur,
+      pour rendre les langues déjà traduites plutôt que rien
     """
     input_path = req.input_path
     outdir = req.outdir
@@ -36,8 +39,13 @@ def build_translations_command(req) -> list[str]:
         "--languages",
         languages_arg,
     ]
+    if extra.get("mode") == "multi":
+        cmd.append("--multi")
+    timeout = os.environ.get("TRANSLATION_TIMEOUT", "100")
+    if timeout:
+        cmd += ["--timeout", timeout]
 
     return cmd
 
 
-app = create_service_app("translations", build_translations_command)
+app = create_service_app("translations", build_translations_command, slots=4)
@@ -1,72 +1,147 @@
+import os
+import sys
+import json
+import asyncio
 import argparse
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 
-from ollama import chat
-from pydantic import BaseModel
+# /app/semantic_shared (image raffinerie-semantic-base, PYTHONPATH=/app) :
+# appels, schémas et langues partagés avec le serveur sémantique unifié,
+# ce script n'est que l'enveloppe CLI (écriture au fil de l'eau, timeout)
+from semantic_shared.llm import LLMClient
+from semantic_shared.tasks import TASKS, normalize_language, translation_items
 
-
-class TranslationPair(BaseModel):
-    language: str  # e.g. "english", "french" or "japanese"
-    translation: str
-
-
-class TranslationsOutput(BaseModel):
-    translations: list[TranslationPair]
-
-
-PROMPT_PATH = Path(__file__).parent / "prompt.txt"
 MODEL = "llama3.1:8b"  # à ajuster selon le modèle disponible
 
-
-def translate_one(prompt: str, text: str, language: str) -> str:
-    prompt_filled = (
-        prompt.replace("{{TEXT}}", text)
-              .replace("{{LANGUAGE}}", language)
-    )
-
-    # Structured output for a single translation
-    response = chat(
-        model=MODEL,
-        messages=[{"role": "user", "content": prompt_filled}],
-        format=TranslationPair.model_json_schema(),
-    )
-
-    pair = TranslationPair.model_validate_json(response.message.content)
-    return pair.translation
-
-
-def main(input_path: str, output_dir: str, languages: list[str]) -> None:
+# appels simultanés vers Ollama (à régler sur OLLAMA_NUM_PARALLEL)
+CONCURRENCY = int(os.environ.get("TRANSLATION_CONCURRENCY") or os.environ.get("OLLAMA_NUM_PARALLEL") or 4)
+
+
+def read_input(input_path: Path) -> Tuple[str, Optional[str]]:
+    """(texte, langue source) ; tmp.json de l'orchestrateur ou texte brut."""
+    content = input_path.read_text(encoding="utf-8")
+    if input_path.suffix != ".json":
+        return content, None
+    data = json.loads(content)
+    semantic = data.get("semantic") or {}
+    return data.get("text") or "", semantic.get("language")
+
+
+# ---------------------------------------------------------
+# ÉCRITURE AU FIL DE L'EAU
+# ---------------------------------------------------------
+class PartialWriter:
+    """
+    Réécrit translations.json (écriture atomique) à chaque langue terminée,
+    dans l'ordre demandé : un timeout ou un arrêt garde ce qui est fait.
+    """
+
+    def __init__(self, out_file: Path, languages: List[str]):
+        self.out_file = out_file
+        self.languages = languages
+        self.done: Dict[str, str] = {}
+
+    def add(self, language: str, translation: str):
+        self.done[language] = translation
+        # même forme que le serveur unifié : [{"language", "text"}]
+        out = translation_items(self.languages, self.done)
+        tmp = self.out_file.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(out, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp, self.out_file)
+
+
+# ---------------------------------------------------------
+# APPELS LLM (TranslationsTask, créneaux du client : `concurrency`)
+# ---------------------------------------------------------
+async def translate_all(
+    llm: LLMClient, text: str, languages: List[str], writer: PartialWriter,
+    multi: bool, timeout: Optional[float],
+) -> List[str]:
+    """Renvoie les langues en échec (erreur ou timeout)."""
+    task = TASKS["translations"]
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout if timeout else None
+
+    def remaining() -> Optional[float]:
+        return max(0.0, deadline - loop.time()) if deadline else None
+
+    todo = list(languages)
+    if multi and todo:
+        try:
+            found = await asyncio.wait_for(task.translate_multi(llm, text, todo), remaining())
+            for language, translation in found.items():
+                writer.add(language, translation)
+        except Exception as e:
+            print(f"multi-language call failed, falling back per language: {e!r}", file=sys.stderr)
+        # langues manquantes ou invalides : appels séparés
+        todo = [lang for lang in todo if lang not in writer.done]
+
+    async def one(language: str) -> Tuple[str, Optional[str]]:
+        try:
+            return language, await task.translate(llm, text, language)
+        except Exception as e:
+            print(f"{language}: translation failed: {e!r}", file=sys.stderr)
+            return language, None
+
+    tasks = [asyncio.create_task(one(lang)) for lang in todo]
+    try:
+        for fut in asyncio.as_completed(tasks, timeout=remaining()):
+            language, translation = await fut
+            if translation is not None:
+                writer.add(language, translation)
+    except asyncio.TimeoutError:
+        print(f"timeout after {timeout}s, keeping {len(writer.done)}/{len(writer.languages)} languages", file=sys.stderr)
+    finally:
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    return [lang for lang in languages if lang not in writer.done]
+
+
+async def amain(
+    input_path: str, output_dir: str, languages: List[str],
+    concurrency: int = CONCURRENCY, multi: bool = False, timeout: Optional[float] = None,
+) -> int:
     input_path = Path(input_path)
     output_dir = Path(output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    text = input_path.read_text(encoding="utf-8")
-    prompt = PROMPT_PATH.read_text(encoding="utf-8")
+    text, source_language = read_input(input_path)
+    # prompt.txt de ce dossier
+    TASKS["translations"].load(Path(__file__).resolve().parent.parent)
 
-    results: list[TranslationPair] = []
+    # une langue demandée deux fois n'est traduite qu'une fois
+    languages = list(dict.fromkeys(languages))
+    writer = PartialWriter(output_dir / "translations.json", languages)
 
+    source = normalize_language(source_language)
     for lang in languages:
-        # Ask the model for {language, translation} for THIS language only
-        response = chat(
-            model=MODEL,
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt.replace("{{TEXT}}", text).replace("{{LANGUAGE}}", lang),
-                }
-            ],
-            format=TranslationPair.model_json_schema(),
-        )
+        if source and normalize_language(lang) == source:
+            # langue du texte : pas de traduction, le texte source est repris
+            writer.add(lang, text)
+
+    todo = [lang for lang in languages if lang not in writer.done]
+    llm = LLMClient(model=MODEL, parallel=concurrency)
+    await llm.start()
+    try:
+        failed = await translate_all(llm, text, todo, writer, multi, timeout)
+    finally:
+        await llm.close()
 
-        pair = TranslationPair.model_validate_json(response.message.content)
-        # Force language to the requested one (defensive, but minimal)
-        pair.language = lang
-        results.append(pair)
+    if failed and len(failed) == len(languages):
+        return 1
+    if failed:
+        print(f"missing translations: {', '.join(failed)}", file=sys.stderr)
+    return 0
 
-    out = TranslationsOutput(translations=results)
 
-    out_file = output_dir / "translations.json"
-    out_file.write_text(out.model_dump_json(indent=2), encoding="utf-8")
+def main(
+    input_path: str, output_dir: str, languages: List[str],
+    concurrency: int = CONCURRENCY, multi: bool = False, timeout: Optional[float] = None,
+) -> int:
+    return asyncio.run(amain(input_path, output_dir, languages, concurrency, multi, timeout))
 
 
 if __name__ == "__main__":
@@ -78,8 +153,11 @@ if __name__ == "__main__":
         required=True,
         help="Comma-separated list of target languages (e.g. english,french,japanese)",
     )
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY, help="simultaneous LLM calls")
+    parser.add_argument("--multi", action="store_true", help="one structured call for all languages")
+    parser.add_argument("--timeout", type=float, default=None, help="seconds; partial results are kept")
 
     args = parser.parse_args()
     languages = [lang.strip() for lang in args.languages.split(",") if lang.strip()]
 
-    main(args.input, args.output, languages)
+    sys.exit(main(args.input, args.output, languages, args.concurrency, args.multi, args.timeout))
@@ -0,0 +1,234 @@
+import os
+import json
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+# Traces distribuées orchestrateur → services (copié dans les images des services).
+#
+# - un trace id par item, un span par appel de service (côté orchestrateur),
+#   puis request / queue / exec / build_output côté service
+# - propagation au format W3C traceparent ("00-<trace_id>-<span_id>-01"),
+#   dans le champ traceparent de RunRequest et l'en-tête HTTP du même nom
+# - export dans un fichier local, une ligne OTLP-JSON (resourceSpans) par lot :
+#   relisible par un collector OpenTelemetry (receiver otlpjsonfile) ou un script
+#
+# Sans fichier configuré (TRACE_FILE / section tracing de services.yml), les
+# ids sont quand même générés et propagés mais rien n'est écrit.
+
+TRACE_FILE = os.environ.get("TRACE_FILE")
+
+# SpanKind OTLP
+INTERNAL = 1
+SERVER = 2
+CLIENT = 3
+
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_CURRENT: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+def new_trace_id() -> str:
+    return os.urandom(16).hex()
+
+
+def new_span_id() -> str:
+    return os.urandom(8).hex()
+
+
+def format_traceparent(trace_id: str, span_id: str) -> str:
+    return f"00-{trace_id}-{span_id}-01"
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[Tuple[str, str]]:
+    """(trace_id, span_id) ou None si l'en-tête est absent / invalide."""
+    if not value:
+        return None
+    parts = value.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16)
+        int(parts[2], 16)
+    except ValueError:
+        return None
+    return parts[1], parts[2]
+
+
+def current_span() -> Optional["Span"]:
+    return _CURRENT.get()
+
+
+def _attr_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+# ---------------------------------------------------------
+# SPAN
+# ---------------------------------------------------------
+class Span:
+    def __init__(
+        self,
+        tracer: "Tracer",
+        name: str,
+        trace_id: str,
+        parent_id: Optional[str] = None,
+        kind: int = INTERNAL,
+        attributes: Optional[Dict[str, Any]] = None,
+        start_ns: Optional[int] = None,
+    ):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = new_span_id()
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = {k: v for k, v in (attributes or {}).items() if v is not None}
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.status = STATUS_OK
+        self.status_message: Optional[str] = None
+
+    @property
+    def traceparent(self) -> str:
+        return format_traceparent(self.trace_id, self.span_id)
+
+    def set_attribute(self, key: str, value: Any):
+        if value is not None:
+            self.attributes[key] = value
+
+    def set_error(self, message: str):
+        self.status = STATUS_ERROR
+        self.status_message = message
+
+    def end(self, end_ns: Optional[int] = None):
+        if self.end_ns is not None:
+            return
+        self.end_ns = end_ns or time.time_ns()
+        self.tracer.export(self)
+
+    def to_otlp(self) -> Dict[str, Any]:
+        data = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [{"key": k, "value": _attr_value(v)} for k, v in self.attributes.items()],
+            "status": {"code": self.status},
+        }
+        if self.parent_id:
+            data["parentSpanId"] = self.parent_id
+        if self.status_message:
+            data["status"]["message"] = self.status_message
+        return data
+
+
+# ---------------------------------------------------------
+# TRACER
+# ---------------------------------------------------------
+class Tracer:
+    """
+    Crée les spans d'un process et les exporte par lots dans `path`
+    (une ligne OTLP-JSON par lot). path=None → rien n'est écrit.
+    """
+
+    def __init__(self, service_name: str, path: Optional[str] = None, flush_every: int = 64, flush_interval: float = 2.0):
+        self.service_name = service_name
+        self.path = path
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+
+        self._lock = threading.Lock()
+        self._buffer: List[Span] = []
+        self._last_flush = time.monotonic()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    # ---------------------------------------------------------
+    def start_span(
+        self,
+        name: str,
+        parent: Any = None,
+        kind: int = INTERNAL,
+        attributes: Optional[Dict[str, Any]] = None,
+        new_trace: bool = False,
+        start_ns: Optional[int] = None,
+    ) -> Span:
+        """
+        parent : Span, traceparent (str), (trace_id, span_id) ou None
+        (None → span courant du contexte, sinon nouvelle trace).
+        """
+        if isinstance(parent, str):
+            parent = parse_traceparent(parent)
+        if parent is None and not new_trace:
+            parent = current_span()
+
+        if isinstance(parent, Span):
+            trace_id, parent_id = parent.trace_id, parent.span_id
+        elif parent:
+            trace_id, parent_id = parent
+        else:
+            trace_id, parent_id = new_trace_id(), None
+
+        return Span(self, name, trace_id, parent_id, kind, attributes, start_ns)
+
+    @contextmanager
+    def span(self, name: str, **kwargs):
+        span = self.start_span(name, **kwargs)
+        token = _CURRENT.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.set_error(repr(e))
+            raise
+        finally:
+            _CURRENT.reset(token)
+            span.end()
+
+    # ---------------------------------------------------------
+    def export(self, span: Span):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._buffer.append(span)
+            due = (
+                len(self._buffer) >= self.flush_every
+                or time.monotonic() - self._last_flush >= self.flush_interval
+            )
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            spans, self._buffer = self._buffer, []
+            self._last_flush = time.monotonic()
+            if not spans or not self.enabled:
+                return
+
+            record = {
+                "resourceSpans": [{
+                    "resource": {"attributes": [
+                        {"key": "service.name", "value": {"stringValue": self.service_name}},
+                    ]},
+                    "scopeSpans": [{
+                        "scope": {"name": "raffinerie"},
+                        "spans": [s.to_otlp() for s in spans],
+                    }],
+                }]
+            }
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
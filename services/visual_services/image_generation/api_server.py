@@ -1,5 +1,5 @@
 import os
-from services.docker_api_server import create_service_app
+from services.docker_api_server import create_service_app, InProcessModel
 
 
 def build_image_generation_command(req) -> list[str]:
@@ -19,4 +19,23 @@ def build_image_generation_command(req) -> list[str]:
     return cmd
 
 
-app = create_service_app("image_generation", build_image_generation_command)
+class ImageGenerationModel(InProcessModel):
+    """
+    Stable Diffusion + Real-ESRGAN gardés en mémoire GPU entre les requêtes.
+    """
+
+    def load(self):
+        import run_image
+
+        self.run_image = run_image
+        self.pipe, self.upsampler = run_image.load_models()
+
+    def infer(self, req):
+        self.run_image.run_generation(self.pipe, self.upsampler, req.input_path, req.outdir)
+
+
+app = create_service_app(
+    "image_generation",
+    build_image_generation_command,
+    model=ImageGenerationModel(),
+)
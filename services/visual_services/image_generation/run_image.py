@@ -42,23 +42,10 @@ def upscale_realesrgan(upsampler: RealESRGANer, img: Image.Image) -> Image.Image
     return Image.fromarray(output_rgb, mode="RGB")
 
 
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--input-path", type=str, required=True)
-    parser.add_argument("--outdir", type=str, required=True)
-    args = parser.parse_args()
-
-    os.makedirs(args.outdir, exist_ok=True)
-
-    # ---------------------------------------------------------
-    # Load prompt
-    # ---------------------------------------------------------
-    with open(args.input_path, "r") as f:
-        prompt = f.read().rstrip("\n")
-
-    # ---------------------------------------------------------
-    # Load Stable Diffusion
-    # ---------------------------------------------------------
+# -------------------------------------------------------------
+# Chargement des modèles (une fois par process)
+# -------------------------------------------------------------
+def load_models():
     print("Loading Stable Diffusion...")
     pipe = StableDiffusionPipeline.from_single_file(
         "/app/models/sd15/v1-5-pruned-emaonly.safetensors",
@@ -66,9 +53,6 @@ def main():
         safety_checker=None,
     ).to("cuda")
 
-    # ---------------------------------------------------------
-    # Load Real-ESRGAN (x4plus)
-    # ---------------------------------------------------------
     print("Loading Real-ESRGAN...")
 
     model = RRDBNet(
@@ -92,23 +76,39 @@ def main():
     )
 
     print("Models loaded.")
+    return pipe, upsampler
+
+
+# -------------------------------------------------------------
+# Prompt → image upscalée dans outdir/base_image.png
+# -------------------------------------------------------------
+def run_generation(pipe, upsampler, input_path: str, outdir: str) -> str:
+    os.makedirs(outdir, exist_ok=True)
+
+    with open(input_path, "r") as f:
+        prompt = f.read().rstrip("\n")
 
-    # ---------------------------------------------------------
-    # Generate + Upscale
-    # ---------------------------------------------------------
     print("Generating image...")
     img_512 = generate(pipe, prompt)
 
     print("Upscaling image...")
     img_up = upscale_realesrgan(upsampler, img_512)
 
-    # ---------------------------------------------------------
-    # Save
-    # ---------------------------------------------------------
-    outpath = os.path.join(args.outdir, "base_image.png")
+    outpath = os.path.join(outdir, "base_image.png")
     img_up.save(outpath)
 
     print("Saved:", outpath)
+    return outpath
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input-path", type=str, required=True)
+    parser.add_argument("--outdir", type=str, required=True)
+    args = parser.parse_args()
+
+    pipe, upsampler = load_models()
+    run_generation(pipe, upsampler, args.input_path, args.outdir)
 
 
 if __name__ == "__main__":
@@ -1,7 +1,8 @@
 # services/visual_services/object_detection/api_server.py
 
 import os
-from services.docker_api_server import create_service_app
+import json
+from services.docker_api_server import create_service_app, InProcessModel
 
 
 def build_object_detection_command(req) -> list[str]:
@@ -28,4 +29,64 @@ def build_object_detection_command(req) -> list[str]:
     return cmd
 
 
-app = create_service_app("object_detection", build_object_detection_command)
\ No newline at end of file
+def build_object_detection_batch_command(reqs) -> list[str]:
+    """
+    Un seul process (et un seul chargement de Mask R-CNN) pour tout le lot.
+    """
+    jobs = []
+    for req in reqs:
+        os.makedirs(req.outdir, exist_ok=True)
+        jobs.append({"input": req.input_path, "outdir": req.outdir})
+
+    return [
+        "python3",
+        "/app/run_object_detection.py",
+        "--batch",
+        json.dumps(jobs),
+    ]
+
+
+class ObjectDetectionModel(InProcessModel):
+    """
+    Mask R-CNN chargé une fois au démarrage du serveur.
+    Mêmes sorties que run_object_detection.py (objects.json + PNG).
+    """
+
+    def load(self):
+        # import ici : detectron2/torch ne sont chargés qu'au démarrage du serveur
+        import run_object_detection as rod
+
+        self.rod = rod
+        self.weights_path = rod.DEFAULT_WEIGHTS_PATH
+        self.predictor, self.cfg = rod.load_predictor(self.weights_path)
+
+    def infer(self, req):
+        objects = self.rod.run_inference(
+            req.input_path, req.outdir, self.weights_path, self.predictor, self.cfg
+        )
+        self.rod.write_objects(req.outdir, objects)
+
+    def infer_batch(self, reqs):
+        # un seul forward pour le lot (micro-batching, /run_batch)
+        results = self.rod.run_inference_batch(
+            [req.input_path for req in reqs], [req.outdir for req in reqs], self.predictor, self.cfg
+        )
+        out = []
+        for req, objects in zip(reqs, results):
+            if isinstance(objects, Exception):
+                out.append(objects)
+                continue
+            try:
+                self.rod.write_objects(req.outdir, objects)
+                out.append(None)
+            except Exception as e:
+                out.append(e)
+        return out
+
+
+app = create_service_app(
+    "object_detection",
+    build_object_detection_command,
+    batch_command_builder=build_object_detection_batch_command,
+    model=ObjectDetectionModel(),
+)
\ No newline at end of file
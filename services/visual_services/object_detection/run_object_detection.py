@@ -6,6 +6,7 @@ import os
 
 import cv2 # type: ignore
 import numpy as np # type: ignore
+import torch # type: ignore
 from PIL import Image # type: ignore
 
 from detectron2.config import get_cfg # type: ignore
@@ -86,15 +87,69 @@ def save_mask_and_crop(
     return mask_path, crop_path
 
 
-def run_inference(input_path: str, outdir: str, weights_path: str):
+def read_image(input_path: str) -> np.ndarray:
     image_bgr = cv2.imread(input_path)
     if image_bgr is None:
         raise ValueError(f"Cannot read image: {input_path}")
+    return image_bgr
 
-    h, w = image_bgr.shape[:2]
 
-    predictor, cfg = load_predictor(weights_path)
+def run_inference(input_path: str, outdir: str, weights_path: str, predictor=None, cfg=None):
+    image_bgr = read_image(input_path)
+
+    # predictor déjà chargé (mode batch) ou chargé pour cette seule image
+    if predictor is None:
+        predictor, cfg = load_predictor(weights_path)
     outputs = predictor(image_bgr)
+    return outputs_to_objects(outputs, image_bgr, outdir, cfg)
+
+
+def predict_batch(predictor, images_bgr):
+    """
+    Un seul forward Mask R-CNN pour plusieurs images, avec le même
+    prétraitement que DefaultPredictor.__call__ (une sortie par image).
+    """
+    inputs = []
+    for image_bgr in images_bgr:
+        h, w = image_bgr.shape[:2]
+        image = image_bgr[:, :, ::-1] if predictor.input_format == "RGB" else image_bgr
+        image = predictor.aug.get_transform(image).apply_image(image)
+        image = torch.as_tensor(image.astype("float32").transpose(2, 0, 1))
+        inputs.append({"image": image, "height": h, "width": w})
+    with torch.no_grad():
+        return predictor.model(inputs)
+
+
+def run_inference_batch(input_paths, outdirs, predictor, cfg) -> list:
+    """
+    Lot d'images en un forward ; renvoie, par image, la liste des objets
+    ou l'Exception de cette image (image illisible, post-traitement en échec).
+    """
+    results: list = [None] * len(input_paths)
+    images = {}
+    for i, path in enumerate(input_paths):
+        try:
+            images[i] = read_image(path)
+        except Exception as e:
+            results[i] = e
+
+    try:
+        outputs = predict_batch(predictor, list(images.values())) if images else []
+    except Exception:
+        # lot en échec (ex: mémoire GPU) : on repasse image par image
+        outputs = None
+
+    for n, (i, image_bgr) in enumerate(images.items()):
+        try:
+            out = outputs[n] if outputs is not None else predictor(image_bgr)
+            results[i] = outputs_to_objects(out, image_bgr, outdirs[i], cfg)
+        except Exception as e:
+            results[i] = e
+    return results
+
+
+def outputs_to_objects(outputs, image_bgr: np.ndarray, outdir: str, cfg):
+    h, w = image_bgr.shape[:2]
 
     instances = outputs["instances"].to("cpu")
     num_instances = len(instances)
@@ -153,20 +208,59 @@ def run_inference(input_path: str, outdir: str, weights_path: str):
     return objects
 
 
+def write_objects(outdir: str, objects) -> None:
+    output_json = os.path.join(outdir, "objects.json")
+    with open(output_json, "w", encoding="utf-8") as f:
+        json.dump(objects, f, indent=2, ensure_ascii=False)
+
+
+def remove_objects(outdir: str) -> None:
+    try:
+        os.remove(os.path.join(outdir, "objects.json"))
+    except FileNotFoundError:
+        pass
+
+
+def run_batch(jobs, weights_path: str) -> int:
+    """
+    Traite plusieurs images avec un seul chargement du modèle.
+    jobs = [{"input": ..., "outdir": ...}, ...]
+    Une image en échec n'arrête pas le lot ; renvoie le nombre d'échecs.
+    """
+    predictor, cfg = load_predictor(weights_path)
+    failures = 0
+    for job in jobs:
+        try:
+            os.makedirs(job["outdir"], exist_ok=True)
+            # pas de objects.json d'un run précédent : un échec reste un échec
+            # (collect_fragment renverrait sinon l'ancien résultat)
+            remove_objects(job["outdir"])
+            objects = run_inference(job["input"], job["outdir"], weights_path, predictor, cfg)
+            write_objects(job["outdir"], objects)
+        except Exception as e:
+            failures += 1
+            print(f"[object_detection] failed on {job.get('input')}: {e!r}")
+    return failures
+
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument(
         "--input",
         type=str,
-        required=True,
         help="Chemin de l'image d'entrée",
     )
     parser.add_argument(
         "--outdir",
         type=str,
-        required=True,
         help="Dossier de sortie (contiendra objects.json et les PNG)",
     )
+    parser.add_argument(
+        "--batch",
+        type=str,
+        default=None,
+        help='Lot JSON [{"input": ..., "outdir": ...}] traité avec un seul chargement du modèle',
+    )
     parser.add_argument(
         "--weights",
         type=str,
@@ -175,12 +269,16 @@ def main():
     )
     args = parser.parse_args()
 
+    if args.batch:
+        run_batch(json.loads(args.batch), args.weights)
+        return
+
+    if not args.input or not args.outdir:
+        parser.error("--input et --outdir sont requis hors mode --batch")
+
     os.makedirs(args.outdir, exist_ok=True)
     objects = run_inference(args.input, args.outdir, args.weights)
-
-    output_json = os.path.join(args.outdir, "objects.json")
-    with open(output_json, "w", encoding="utf-8") as f:
-        json.dump(objects, f, indent=2, ensure_ascii=False)
+    write_objects(args.outdir, objects)
 
 
 if __name__ == "__main__":
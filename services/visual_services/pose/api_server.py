@@ -1,7 +1,10 @@
 # services/visual_services/pose/api_server.py
 
 import os
-from services.docker_api_server import create_service_app
+import json
+from services.docker_api_server import create_service_app, InProcessModel
+
+POSE_MODEL_PATH = "/models/pose/yolov8n-pose.pt"
 
 def build_pose_command(req) -> list[str]:
     """
@@ -28,9 +31,69 @@ def build_pose_command(req) -> list[str]:
         "--output",
         output_path,
         "--model",
-        "/models/pose/yolov8n-pose.pt"
+        POSE_MODEL_PATH
     ]
 
     return cmd
 
-app = create_service_app("pose", build_pose_command)
\ No newline at end of file
+def build_pose_batch_command(reqs) -> list[str]:
+    """
+    Un seul process pour tout le lot : YOLO est chargé une fois et
+    l'inférence est faite en batch.
+    """
+    jobs = []
+    for req in reqs:
+        os.makedirs(req.outdir, exist_ok=True)
+        jobs.append({
+            "input": req.input_path,
+            "output": os.path.join(req.outdir, "pose_skeleton.png"),
+        })
+
+    return [
+        "python3",
+        "/app/pose/pose_skeleton_only.py",
+        "--batch",
+        json.dumps(jobs),
+        "--model",
+        POSE_MODEL_PATH
+    ]
+
+class PoseModel(InProcessModel):
+    """
+    YOLOv8 pose résident : chargé au démarrage, une inférence YOLO par lot.
+    """
+
+    def load(self):
+        from ultralytics import YOLO # type: ignore
+        import pose_skeleton_only
+
+        self.pose = pose_skeleton_only
+        self.model = YOLO(POSE_MODEL_PATH)
+
+    def infer(self, req):
+        results = self.model(req.input_path)[0]
+        self.pose.save_skeleton(results, req.input_path, os.path.join(req.outdir, "pose_skeleton.png"))
+
+    def infer_batch(self, reqs):
+        try:
+            results = self.model([req.input_path for req in reqs])
+        except Exception:
+            # une image illisible fait échouer le lot : on repasse image par image
+            return super().infer_batch(reqs)
+
+        out = []
+        for req, res in zip(reqs, results):
+            try:
+                self.pose.save_skeleton(res, req.input_path, os.path.join(req.outdir, "pose_skeleton.png"))
+                out.append(None)
+            except Exception as e:
+                out.append(e)
+        return out
+
+
+app = create_service_app(
+    "pose",
+    build_pose_command,
+    batch_command_builder=build_pose_batch_command,
+    model=PoseModel(),
+)
\ No newline at end of file
@@ -1,6 +1,7 @@
 # /app/pose/pose_skeleton_only.py
 
 import argparse
+import json
 import os
 
 import numpy as np # type: ignore
@@ -50,31 +51,15 @@ def draw_skeletons_on_blank(kpts_xy: np.ndarray, size: tuple[int, int]) -> Image
     return img
 
 
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--input", type=str, required=True, help="Chemin de l'image d'entrée")
-    parser.add_argument("--output", type=str, required=True, help="Chemin de l'image de sortie (squelettes)")
-    parser.add_argument("--model", type=str, default="/models/yolov8n-pose.pt", help="Chemin ou nom du modèle YOLOv8 pose")
-    args = parser.parse_args()
-
-    input_path = args.input
-    output_path = args.output
-
-    print("EXISTS:", os.path.exists(input_path))
-    print("LS /shared/input:", os.listdir("/shared/input"))
-
+def save_skeleton(results, input_path: str, output_path: str) -> None:
     outdir = os.path.dirname(output_path)
     if outdir:
         os.makedirs(outdir, exist_ok=True)
 
-    model = YOLO(args.model)
-
     with Image.open(input_path) as im:
         im = im.convert("RGB")
         w, h = im.size
 
-    results = model(input_path)[0]
-
     if results.keypoints is None:
         blank = Image.new("RGB", (w, h), (0, 0, 0))
         blank.save(output_path)
@@ -86,5 +71,42 @@ def main():
     out_img.save(output_path)
 
 
+def run_batch(model, jobs) -> None:
+    """
+    jobs = [{"input": ..., "output": ...}, ...]
+    Une seule inférence YOLO sur toutes les images du lot.
+    """
+    results = model([job["input"] for job in jobs])
+    for job, res in zip(jobs, results):
+        save_skeleton(res, job["input"], job["output"])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", type=str, help="Chemin de l'image d'entrée")
+    parser.add_argument("--output", type=str, help="Chemin de l'image de sortie (squelettes)")
+    parser.add_argument("--model", type=str, default="/models/yolov8n-pose.pt", help="Chemin ou nom du modèle YOLOv8 pose")
+    parser.add_argument("--batch", type=str, default=None, help='Lot JSON [{"input": ..., "output": ...}] (un seul chargement du modèle)')
+    args = parser.parse_args()
+
+    if args.batch:
+        run_batch(YOLO(args.model), json.loads(args.batch))
+        return
+
+    if not args.input or not args.output:
+        parser.error("--input et --output sont requis hors mode --batch")
+
+    input_path = args.input
+    output_path = args.output
+
+    print("EXISTS:", os.path.exists(input_path))
+    print("LS /shared/input:", os.listdir("/shared/input"))
+
+    model = YOLO(args.model)
+
+    results = model(input_path)[0]
+    save_skeleton(results, input_path, output_path)
+
+
 if __name__ == "__main__":
     main()